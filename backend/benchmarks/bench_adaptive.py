@@ -0,0 +1,78 @@
+"""
+Fixed 1 FPS sampling vs a plain coarse pass vs adaptive sampling
+(tasks/adaptive.py): frames OCR'd, OCR time and how well each recovers the
+board's real on-screen time in the synthetic fixture, whose courtside
+board is lit in bursts (--on seconds every --on + --off seconds).
+
+    cd backend
+    python -m benchmarks.bench_adaptive --seconds 300
+    python -m benchmarks.bench_adaptive --on 5 --off 5 --coarse 5 --ocr-cost-ms 60
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.fixtures import board_visible, make_synthetic_video, StubOCR
+from tasks.adaptive import run_adaptive_ocr
+from tasks.analytics import analyze, load_analysis
+from tasks.count import count_brands
+from tasks.download_and_extract_frames import iter_frames
+from tasks.matching import get_matcher
+from tasks.ocr import run_ocr_on_stream
+
+BRANDS = {"StateFarm": ["state", "statefarm", "astatefarm"]}
+
+def exposure(label, work_dir, ocr_dir):
+    count_brands(ocr_dir, os.path.join(work_dir, label), BRANDS)
+    stats = analyze(load_analysis(os.path.join(work_dir, label, "brand_analysis.csv")))
+    return float(stats["detection_seconds"]["StateFarm"])
+
+def run(label, work_dir, sample):
+    ocr_dir = os.path.join(work_dir, label, "paddle_output")
+    start = time.perf_counter()
+    stats = sample(ocr_dir)
+    seconds = time.perf_counter() - start
+    return {"label": label, "frames": stats["frames"], "seconds": seconds,
+            "exposure": exposure(label, work_dir, ocr_dir)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=300, help="Length of the fixture video")
+    parser.add_argument("--on", type=int, default=10, help="Seconds the board is lit per burst")
+    parser.add_argument("--off", type=int, default=50, help="Seconds between bursts")
+    parser.add_argument("--coarse", type=float, default=4, help="Seconds between coarse-pass frames")
+    parser.add_argument("--dense-fps", type=float, default=2, help="Sampling rate inside dense windows")
+    parser.add_argument("--ocr-cost-ms", type=float, default=40, help="Stub OCR cost per frame")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_adaptive_")
+    try:
+        video = make_synthetic_video(os.path.join(tmp, "fixture.mp4"), seconds=args.seconds,
+                                     on_seconds=args.on, off_seconds=args.off)
+        ocr = StubOCR(cost_ms=args.ocr_cost_ms)
+        matcher = get_matcher(BRANDS)
+        truth = sum(board_visible(second, args.on, args.off) for second in range(args.seconds))
+
+        results = [
+            run("fixed 1 FPS", tmp, lambda out: run_ocr_on_stream(
+                iter_frames(video, fps=1), out, None, ocr=ocr, save_frames="none")),
+            run(f"coarse {args.coarse:g}s", tmp, lambda out: run_ocr_on_stream(
+                iter_frames(video, fps=1 / args.coarse), out, None, ocr=ocr, save_frames="none")),
+            run("adaptive", tmp, lambda out: run_adaptive_ocr(
+                video, out, None, matcher, coarse_seconds=args.coarse, dense_fps=args.dense_fps,
+                ocr=ocr, save_frames="none")),
+        ]
+
+        fixed = results[0]
+        print(f"\nBoard on screen for {truth}s of {args.seconds}s")
+        print(f"{'sampling':<14}{'frames':>8}{'OCR (s)':>9}{'speedup':>9}{'exposure (s)':>14}{'error':>8}")
+        for r in results:
+            print(f"{r['label']:<14}{r['frames']:>8}{r['seconds']:>9.2f}{fixed['seconds'] / r['seconds']:>8.2f}x"
+                  f"{r['exposure']:>14.1f}{(r['exposure'] - truth) / truth:>+8.0%}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compare the shared analytics module (tasks/analytics.py) with the per-row
+loops it replaced in visual.py and report.py, on a synthetic
+brand_analysis.csv, and check that both produce the same aggregates.
+
+    cd backend
+    python -m benchmarks.bench_analytics --frames 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from pipeline import brand_keywords
+from tasks.analytics import analyze, load_analysis
+
+def write_synthetic_analysis(path, frames, brands, seed=0):
+    """brand_analysis.csv with bursty, mostly-zero detection counts per brand."""
+    rng = np.random.default_rng(seed)
+    data = {"Frame": [f"frame_{i:04d}_result" for i in range(frames)]}
+    for brand in brands:
+        visible = rng.random(frames) < rng.uniform(0.05, 0.4)
+        data[brand] = np.where(visible, rng.poisson(1.5, frames) + 1, 0)
+    pd.DataFrame(data).to_csv(path, index=False)
+
+def legacy_analytics(df, brand_columns, window_size=30):
+    """The original heatmap windows, iterrows co-occurrence and insights loops."""
+    max_time = df["TimeSeconds"].max()
+    time_windows = range(0, int(max_time) + window_size, window_size)
+    heatmap_data, window_labels = [], []
+    for i in range(len(time_windows) - 1):
+        start_time, end_time = time_windows[i], time_windows[i + 1]
+        window_data = df[(df["TimeSeconds"] >= start_time) & (df["TimeSeconds"] < end_time)]
+        if not window_data.empty:
+            heatmap_data.append(window_data[brand_columns].sum().values)
+            window_labels.append(f"{start_time}-{end_time}s")
+    windows = pd.DataFrame(heatmap_data, columns=brand_columns, index=window_labels)
+
+    co_occurrence_frames = []
+    for idx, row in df.iterrows():
+        active_brands = [brand for brand in brand_columns if row[brand] > 0]
+        if len(active_brands) > 1:
+            co_occurrence_frames.append({
+                'time': row['TimeSeconds'],
+                'brands': ', '.join(active_brands),
+                'count': len(active_brands)
+            })
+    co_df = pd.DataFrame(co_occurrence_frames)
+
+    co_occur_count = 0
+    for _, row in df.iterrows():
+        active_brands = sum(1 for brand in brand_columns if row[brand] > 0)
+        if active_brands > 1:
+            co_occur_count += 1
+    detection_rates = {brand: (df[brand] > 0).mean() * 100 for brand in brand_columns}
+    return windows, co_df, co_occur_count / len(df) * 100, detection_rates
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=10000)
+    args = parser.parse_args()
+
+    brands = list(brand_keywords)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "brand_analysis.csv")
+        write_synthetic_analysis(path, args.frames, brands)
+        df = load_analysis(path)
+
+    print(f"{args.frames} frames ({args.frames / 3600:.1f}h at 1 FPS), {len(brands)} brands")
+
+    start = time.perf_counter()
+    windows, co_df, co_rate, rates = legacy_analytics(df, brands)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats = analyze(df, brands)
+    analytics_seconds = time.perf_counter() - start
+
+    print(f"legacy loops: {legacy_seconds:8.3f}s")
+    print(f"analytics:    {analytics_seconds:8.3f}s  ({legacy_seconds / analytics_seconds:.1f}x)")
+
+    identical = (
+        windows.index.equals(stats["windows"].index)
+        and np.allclose(windows.to_numpy(), stats["windows"].to_numpy())
+        and np.array_equal(co_df["time"].to_numpy(), stats["co_occurrence"]["time"].to_numpy())
+        and co_df["brands"].tolist() == stats["co_occurrence"]["brands"].tolist()
+        and np.array_equal(co_df["count"].to_numpy(), stats["co_occurrence"]["count"].to_numpy())
+        and np.isclose(co_rate, stats["co_occurrence_rate"])
+        and np.allclose(list(rates.values()), stats["detection_rates"].to_numpy())
+    )
+    print(f"identical output: {identical}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Load test of the status-polling path, GET /result/{task_id}: p50/p99
+latency and throughput with many clients polling at once.
+
+By default it starts the API in a subprocess with an in-memory result
+backend whose lookups take --backend-latency-ms (a Redis round trip), and
+compares the endpoint against the previous handler, which did the lookup
+inside the event loop. With --url it load-tests a running server instead.
+
+    cd backend
+    python -m benchmarks.bench_api --clients 20 --requests 2000
+    python -m benchmarks.bench_api --url http://localhost:8000 --task-id <task_id>
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+def serve(port, backend_latency_ms):
+    os.environ["CELERY_ALWAYS_EAGER"] = "1"
+    import uvicorn
+    import main
+    from tasks.progress import JobProgress
+    from worker import celery_app
+
+    get_task_meta = celery_app.backend.get_task_meta
+
+    def slow_get_task_meta(*args, **kwargs):
+        time.sleep(backend_latency_ms / 1000)
+        return get_task_meta(*args, **kwargs)
+
+    celery_app.backend.get_task_meta = slow_get_task_meta
+
+    @main.app.get("/bench/blocking-result/{task_id}")
+    async def blocking_result(task_id: str):
+        # The previous handler: backend round trip on the event loop
+        task = celery_app.AsyncResult(task_id)
+        if not task.ready():
+            return {"status": "processing", **JobProgress(task_id).snapshot()}
+        return {"status": task.state}
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+async def poll(url, clients, requests):
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def client(http):
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await http.get(url)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(clients)))
+        seconds = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    return {"p50": np.percentile(ms, 50), "p99": np.percentile(ms, 99), "rps": len(ms) / seconds}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running API (default: start one)")
+    parser.add_argument("--task-id", default=str(uuid.uuid4()), help="Task to poll (default: a pending one)")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent pollers")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint")
+    parser.add_argument("--backend-latency-ms", type=float, default=5, help="Result backend round trip")
+    args = parser.parse_args()
+
+    endpoints = [("/result (threadpool)", f"/result/{args.task_id}")]
+    server = None
+    if args.url:
+        base = args.url.rstrip("/")
+    else:
+        port = free_port()
+        base = f"http://127.0.0.1:{port}"
+        server = multiprocessing.Process(target=serve, args=(port, args.backend_latency_ms), daemon=True)
+        server.start()
+        endpoints.insert(0, ("previous (event loop)", f"/bench/blocking-result/{args.task_id}"))
+    try:
+        wait_for(base + "/")
+        print(f"\n{args.clients} clients, {args.requests} requests per endpoint"
+              + ("" if args.url else f", backend round trip {args.backend_latency_ms:g} ms"))
+        print(f"{'endpoint':<24}{'p50 (ms)':>10}{'p99 (ms)':>10}{'req/s':>9}")
+        for label, path in endpoints:
+            asyncio.run(poll(base + path, args.clients, min(args.requests, 100)))  # warm up
+            r = asyncio.run(poll(base + path, args.clients, args.requests))
+            print(f"{label:<24}{r['p50']:>10.1f}{r['p99']:>10.1f}{r['rps']:>9.0f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+if __name__ == "__main__":
+    main()
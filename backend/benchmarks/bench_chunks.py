@@ -0,0 +1,80 @@
+"""
+Chunked OCR (PIPELINE_CHUNK_SECONDS) against one pass over the whole video:
+the fixture is cut into time chunks like the stand-in downloader does, each
+chunk is OCR'd with the stub OCR at its broadcast offset, and the chunk
+stores are merged (tasks/ocr_store.merge_stores). Fails unless the merged
+store has a frame in every sampling slot (frame id) the single pass has, and
+no others, e.g. on NTSC sources (29.97 / 59.94 fps) whose sampling interval
+is not a whole number of frames per second. A chunk samples from its own
+first frame, so its timestamps may sit up to one interval off the single
+pass's.
+
+    cd backend
+    python -m benchmarks.bench_chunks
+    python -m benchmarks.bench_chunks --video-fps 59.94 --seconds 90 --chunk-seconds 20
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import make_synthetic_video, StubOCR
+from tasks.download_and_extract_frames import chunk_spans, iter_frames
+from tasks.ocr import run_ocr_on_stream
+from tasks.ocr_store import OCRStore, merge_stores
+from tasks.video_cache import transcode_video
+
+def frames_of(ocr_dir):
+    store = OCRStore(ocr_dir)
+    return {int(f["frame"]): float(f["timestamp"]) for f in store.frames}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60, help="Length of the fixture video")
+    parser.add_argument("--video-fps", type=float, default=29.97, help="Frame rate of the fixture video")
+    parser.add_argument("--chunk-seconds", type=float, default=15, help="Chunk length")
+    parser.add_argument("--fps", type=float, default=1, help="Frames sampled per second")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_chunks_")
+    try:
+        video = make_synthetic_video(os.path.join(tmp, "game.mp4"), seconds=args.seconds, fps=args.video_fps,
+                                     size=(640, 360))
+        ocr = StubOCR()
+        whole_dir = os.path.join(tmp, "whole", "paddle_output")
+        start = time.perf_counter()
+        run_ocr_on_stream(iter_frames(video, fps=args.fps), whole_dir, None, ocr=ocr, save_frames="none")
+        whole_seconds = time.perf_counter() - start
+
+        chunk_dirs = []
+        start = time.perf_counter()
+        for chunk in chunk_spans(0, args.seconds, args.chunk_seconds):
+            chunk_video = os.path.join(tmp, f"chunk_{chunk[0]:g}.mp4")
+            transcode_video(video, chunk_video, span=chunk)
+            chunk_dir = os.path.join(tmp, f"chunk_{chunk[0]:g}", "paddle_output")
+            run_ocr_on_stream(iter_frames(chunk_video, fps=args.fps, start_offset=chunk[0]), chunk_dir, None,
+                              ocr=ocr, save_frames="none")
+            chunk_dirs.append(chunk_dir)
+        merged_dir = os.path.join(tmp, "merged", "paddle_output")
+        merge_stores(chunk_dirs, merged_dir)
+        chunk_seconds = time.perf_counter() - start
+
+        whole, merged = frames_of(whole_dir), frames_of(merged_dir)
+        missing = sorted(set(whole) - set(merged))
+        extra = sorted(set(merged) - set(whole))
+        drift = max((abs(merged[i] - whole[i]) for i in set(whole) & set(merged)), default=0.0)
+        print(f"\n{args.video_fps:g} fps source, {args.seconds}s in {len(chunk_dirs)} chunks of {args.chunk_seconds:g}s")
+        print(f"Single pass: {len(whole)} frames ({whole_seconds:.2f}s); merged chunks: {len(merged)} frames "
+              f"({chunk_seconds:.2f}s), timestamps within {drift:.3f}s")
+        if missing or extra:
+            print(f"❌ Merged store differs: {len(missing)} frame(s) missing {missing[:5]}, "
+                  f"{len(extra)} extra {extra[:5]}")
+            sys.exit(1)
+        print("✅ Merged chunks cover the same sampling slots as the single pass")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
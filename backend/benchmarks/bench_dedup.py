@@ -0,0 +1,84 @@
+"""
+Near-duplicate suppression (tasks/dedup.py) on a static shot whose small
+scorebug board changes text every few seconds (fixtures.make_static_shot).
+
+Every sampled frame goes through a FrameDeduper. Frames flagged as
+duplicates of a frame showing different board text would have that
+frame's OCR results copied forward, i.e. the wrong brand counted: the run
+fails if there is any. Also reports the OCR calls saved on the static
+stretches, against the old whole-frame dHash for reference.
+
+    cd backend
+    python -m benchmarks.bench_dedup
+    python -m benchmarks.bench_dedup --seconds 120 --fps 2 --threshold 0.95
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmarks.fixtures import make_static_shot
+from tasks.dedup import DEDUP_THRESHOLD, FrameDeduper, difference_hash
+from tasks.download_and_extract_frames import iter_frames
+
+def run(frames, board_texts, check):
+    """(skipped, wrong) for a dedup `check(frame, text)` returning the text of the frame it duplicates or None."""
+    skipped = wrong = 0
+    for _, timestamp, frame in frames:
+        text = board_texts[min(int(timestamp), len(board_texts) - 1)]
+        ref = check(frame, text)
+        if ref is not None:
+            skipped += 1
+            wrong += ref != text
+    return skipped, wrong
+
+def whole_frame_check(threshold):
+    """The original single 16x16 dHash over the whole frame."""
+    last = {"hash": None, "text": None}
+
+    def check(frame, text):
+        frame_hash = difference_hash(frame)
+        if last["hash"] is not None and np.count_nonzero(frame_hash == last["hash"]) / frame_hash.size >= threshold:
+            return last["text"]
+        last["hash"], last["text"] = frame_hash, text
+        return None
+    return check
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60, help="Length of the static shot")
+    parser.add_argument("--hold-seconds", type=int, default=4, help="Seconds the board keeps each text")
+    parser.add_argument("--fps", type=float, default=2, help="Frames sampled per second")
+    parser.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD, help="Dedup similarity threshold")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_dedup_")
+    try:
+        video = os.path.join(tmp, "static.mp4")
+        board_texts = make_static_shot(video, seconds=args.seconds, hold_seconds=args.hold_seconds)
+        frames = list(iter_frames(video, fps=args.fps))
+        changes = sum(a != b for a, b in zip(board_texts, board_texts[1:]))
+        print(f"{len(frames)} frames sampled, board text changes {changes} times")
+
+        deduper = FrameDeduper(threshold=args.threshold)
+        results = {
+            "block dedup": run(frames, board_texts, deduper.check),
+            "whole-frame dHash": run(frames, board_texts, whole_frame_check(args.threshold)),
+        }
+        print(f"{'':<20}{'skipped':>10}{'wrong':>10}")
+        for label, (skipped, wrong) in results.items():
+            print(f"{label:<20}{skipped:>10}{wrong:>10}")
+
+        skipped, wrong = results["block dedup"]
+        if wrong:
+            print(f"❌ {wrong} frame(s) with new board text were treated as duplicates")
+            sys.exit(1)
+        print(f"✅ Every board change was OCR'd; {skipped} of {len(frames)} OCR calls saved")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Report delivery (utils/emailer.py) against a local SMTP stand-in: a new
+connection + login per report, as before, vs the pooled SMTP session; then
+redelivery with backoff through a throttling server, and a report too large
+to attach going out as a link.
+
+--handshake-ms stands in for a real provider's connect + STARTTLS + login,
+--latency-ms for the round trip of every SMTP command.
+
+    cd backend
+    python -m benchmarks.bench_email --reports 20
+    python -m benchmarks.bench_email --handshake-ms 300 --latency-ms 20
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.fixtures import LocalSMTPServer
+from utils.emailer import SMTPPool, build_report_message, is_transient, retry_delay, send_report_email
+
+def make_pdf(path, size_kb):
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n" + os.urandom(size_kb * 1024))
+    return path
+
+def deliver(label, pool, server, pdf_path, reports):
+    start = time.perf_counter()
+    for i in range(reports):
+        pool.send([build_report_message(f"user{i}@example.com", pdf_path)])
+    seconds = time.perf_counter() - start
+    pool.close()
+    return {"label": label, "seconds": seconds, "sent": len(server.messages), "connections": server.connections}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=20, help="Reports finishing together")
+    parser.add_argument("--pdf-kb", type=int, default=300, help="Size of each report")
+    parser.add_argument("--handshake-ms", type=float, default=150, help="Session setup cost")
+    parser.add_argument("--latency-ms", type=float, default=5, help="Delay of every SMTP reply")
+    parser.add_argument("--fail-first", type=int, default=2, help="Messages the throttling server rejects")
+    args = parser.parse_args()
+    server_args = dict(latency_ms=args.latency_ms, handshake_ms=args.handshake_ms)
+
+    tmp = tempfile.mkdtemp(prefix="bench_email_")
+    try:
+        pdf_path = make_pdf(os.path.join(tmp, "brand_report_enhanced.pdf"), args.pdf_kb)
+
+        results = []
+        for label, max_messages in (("connection per report", 1), ("pooled session", 100)):
+            with LocalSMTPServer(**server_args) as server:
+                pool = SMTPPool("127.0.0.1", server.port, user="bench", password="bench", starttls=False,
+                                max_messages=max_messages)
+                results.append(deliver(label, pool, server, pdf_path, args.reports))
+
+        base = results[0]
+        print(f"\n{args.reports} reports of {args.pdf_kb} KB")
+        print(f"{'delivery':<24}{'sent':>6}{'sessions':>10}{'seconds':>9}{'per report':>12}{'speedup':>9}")
+        for r in results:
+            print(f"{r['label']:<24}{r['sent']:>6}{r['connections']:>10}{r['seconds']:>9.2f}"
+                  f"{r['seconds'] / args.reports * 1000:>10.0f}ms{base['seconds'] / r['seconds']:>8.2f}x")
+
+        # Redelivery: the first messages are refused with 421, as a
+        # throttling provider would; the email task retries with backoff.
+        with LocalSMTPServer(fail_first=args.fail_first, **server_args) as server:
+            pool = SMTPPool("127.0.0.1", server.port, starttls=False)
+            attempts = 0
+            while True:
+                attempts += 1
+                try:
+                    send_report_email("retry@example.com", pdf_path, pool=pool, raise_transient=True)
+                    break
+                except Exception as e:
+                    assert is_transient(e), e
+                    time.sleep(retry_delay(attempts - 1, backoff=0.05))
+            pool.close()
+            print(f"\nThrottled delivery: sent after {attempts} attempt(s), {len(server.messages)} message(s) "
+                  f"received")
+
+        # A report above the attachment limit goes out as a link
+        big = build_report_message("big@example.com", pdf_path, link="http://localhost:8000/result/<task_id>",
+                                   max_attachment_mb=args.pdf_kb / 2048)
+        small = build_report_message("small@example.com", pdf_path)
+        print(f"Large report: {len(big.as_bytes()) / 1024:.1f} KB email with a link "
+              f"(vs {len(small.as_bytes()) / 1024:.1f} KB attached)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Bytes downloaded and end-to-end ingest time (download -> sample -> OCR) per
+ingest profile and time range, using a local 1080p fixture video served by
+the stand-in downloader instead of YouTube.
+
+Download time is modelled from the bytes at --mbps; the fixture's 720p
+variant is encoded up front, like YouTube's pre-encoded formats, and the
+stand-in's local re-encoding for time ranges is not counted. Locally,
+"full" and "video" are the same file (the fixture has no audio track);
+against YouTube, "video" also drops the audio stream.
+
+    cd backend
+    python -m benchmarks.bench_ingest --seconds 60
+    python -m benchmarks.bench_ingest --start 20 --end 40 --ocr-cost-ms 40 --mbps 50
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.fixtures import make_synthetic_video, StubOCR
+from tasks.download_and_extract_frames import INGEST_PROFILES, OCR_MAX_HEIGHT, iter_frames, time_range
+from tasks.ocr import run_ocr_on_stream
+from tasks.ocr_store import OCRStore
+from tasks.video_cache import VideoCache, transcode_video, local_downloader
+
+VIDEO_ID = "fixture"
+
+def run(label, profile, span, source_dir, work_dir, ocr, mbps):
+    cache = VideoCache(os.path.join(work_dir, "videos"), downloader=local_downloader(source_dir))
+    video_path = cache.get(f"https://www.youtube.com/watch?v={VIDEO_ID}", VIDEO_ID, profile=profile, span=span)
+    download_seconds = os.path.getsize(video_path) * 8 / (mbps * 1e6)
+
+    ocr_dir = os.path.join(work_dir, label, "paddle_output")
+    start = time.perf_counter()
+    stats = run_ocr_on_stream(iter_frames(video_path, fps=1, start_offset=span[0] if span else 0),
+                              ocr_dir, None, ocr=ocr, save_frames="none")
+    ocr_seconds = time.perf_counter() - start
+
+    timestamps = list(OCRStore(ocr_dir).timestamps().values())
+    return {
+        "label": label,
+        "bytes": os.path.getsize(video_path),
+        "download": download_seconds,
+        "ocr": ocr_seconds,
+        "total": download_seconds + ocr_seconds,
+        "frames": stats["frames"],
+        "first": timestamps[0] if timestamps else None,
+        "last": timestamps[-1] if timestamps else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60, help="Length of the fixture video")
+    parser.add_argument("--start", default="20", help="Start of the time-range run")
+    parser.add_argument("--end", default="40", help="End of the time-range run")
+    parser.add_argument("--ocr-cost-ms", type=float, default=20,
+                        help="Stub OCR cost per megapixel, to mimic detector cost growing with resolution")
+    parser.add_argument("--mbps", type=float, default=100, help="Modelled download bandwidth")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        source_dir = os.path.join(tmp, "source")
+        source = make_synthetic_video(os.path.join(source_dir, f"{VIDEO_ID}.mp4"), seconds=args.seconds,
+                                      size=(1920, 1080))
+        transcode_video(source, os.path.join(source_dir, f"{VIDEO_ID}.ocr.mp4"), max_height=OCR_MAX_HEIGHT)
+        ocr = StubOCR(cost_ms=args.ocr_cost_ms, per_megapixel=True)
+        span = time_range(args.start, args.end)
+
+        runs = [(profile, profile, None) for profile in INGEST_PROFILES]
+        runs.append((f"ocr {args.start}-{args.end}s", "ocr", span))
+        results = [run(f"run{i}", profile, run_span, source_dir, tmp, ocr, args.mbps) | {"label": label}
+                   for i, (label, profile, run_span) in enumerate(runs)]
+
+        print(f"\n{'profile':<16}{'bytes':>14}{'download (s)':>14}{'OCR (s)':>10}{'total (s)':>11}{'frames':>8}{'timestamps':>16}")
+        for r in results:
+            stamps = f"{r['first']:g}-{r['last']:g}s" if r["first"] is not None else "-"
+            print(f"{r['label']:<16}{r['bytes']:>14,}{r['download']:>14.2f}{r['ocr']:>10.2f}"
+                  f"{r['total']:>11.2f}{r['frames']:>8}{stamps:>16}")
+        full = results[0]
+        for r in results[1:]:
+            print(f"{r['label']}: {r['bytes'] / full['bytes']:.0%} of the bytes, "
+                  f"{full['total'] / r['total']:.2f}x faster end to end than full")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
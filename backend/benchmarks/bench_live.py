@@ -0,0 +1,109 @@
+"""
+Live ingest: a synthetic broadcast (fixtures.make_broadcast_video) "airs"
+at --speed times real time as HLS-style segments on a playlist, segments
+dropped in a directory, or a growing MKV file, while tasks/live.py
+follows it with BarcodeOCR. Reports how long after airing each frame was
+counted (p50/p95/max, against the whole broadcast's length for the VOD
+path) and checks the final live counts against the ground truth and the
+live scores against brand_totals.csv of the same OCR store.
+
+    cd backend
+    python -m benchmarks.bench_live
+    python -m benchmarks.bench_live --mode file --seconds 120 --speed 2
+    python -m benchmarks.bench_live --mode directory --segment-seconds 2 --ocr-cost-ms 200
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import (
+    BarcodeOCR, expected_sightings, grow_file, make_broadcast_video, publish_segments, split_segments
+)
+from benchmarks.suite import brand_set
+from pipeline import BRAND_MATCH_THRESHOLD
+from tasks.count import count_brands
+from tasks.live import run_live_ingest
+from tasks.matching import get_matcher
+
+MODES = ("playlist", "directory", "file")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=MODES, default="playlist", help="How the broadcast is published")
+    parser.add_argument("--seconds", type=int, default=60, help="Length of the broadcast")
+    parser.add_argument("--brands", type=int, default=4, help="Brands on the boards")
+    parser.add_argument("--speed", type=float, default=4, help="Air the broadcast this many times faster than real time")
+    parser.add_argument("--segment-seconds", type=float, default=4, help="Segment length (playlist, directory)")
+    parser.add_argument("--video-fps", type=int, default=10, help="Frame rate of the synthetic video")
+    parser.add_argument("--ocr-cost-ms", type=float, default=0, help="CPU time BarcodeOCR burns per frame")
+    parser.add_argument("--poll", type=float, default=0.25, help="Seconds between checks of the source")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_live_")
+    try:
+        keywords, texts = brand_set(args.brands)
+        video = os.path.join(tmp, "broadcast.mkv" if args.mode == "file" else "broadcast.mp4")
+        manifest = make_broadcast_video(video, args.seconds, texts, fps=args.video_fps)
+        live_dir = os.path.join(tmp, "live")
+        os.makedirs(live_dir)
+        if args.mode == "file":
+            source = os.path.join(live_dir, "broadcast.mkv")
+            air = lambda: grow_file(video, source, speed=args.speed)
+        else:
+            segments = split_segments(video, os.path.join(tmp, "staging"), args.segment_seconds)
+            source = os.path.join(live_dir, "index.m3u8") if args.mode == "playlist" else live_dir
+            air = lambda: publish_segments(segments, live_dir, speed=args.speed, playlist=args.mode == "playlist")
+
+        # Counted wall time of every frame, against when its second aired
+        counted = {}
+        aired = {}
+        publisher = threading.Thread(target=lambda: aired.update(started=air()), daemon=True)
+        started = time.time()
+        publisher.start()
+        # Idle timeout: a few segments' worth, in sped-up time
+        stats = run_live_ingest(
+            source, os.path.join(tmp, "paddle_output"), tmp, keywords,
+            get_matcher(keywords, BRAND_MATCH_THRESHOLD), "stub", fps=1, report_seconds=0,
+            on_counted=lambda frame_id, timestamp: counted.setdefault(frame_id, (timestamp, time.time())),
+            poll=args.poll, idle_timeout=max(3 * args.segment_seconds / args.speed, 2.0),
+            ocr=BarcodeOCR(manifest, cost_ms=args.ocr_cost_ms), save_frames="none")
+        publisher.join()
+        started = aired.get("started", started)
+
+        # A frame at t seconds is on air at started + t / speed; delays are in broadcast seconds
+        delays = np.array([(wall - started) * args.speed - timestamp for timestamp, wall in counted.values()])
+        snapshot = stats["snapshot"]
+        expected = expected_sightings(manifest, fps=1)
+        found = {entry["brand"]: entry["mentions"] for entry in snapshot["brands"]}
+        exact = all(found.get(brand) == expected[text] for brand, text in zip(keywords, manifest["texts"]))
+        count_brands(os.path.join(tmp, "paddle_output"), tmp, keywords, threshold=BRAND_MATCH_THRESHOLD)
+        totals = dict(pd.read_csv(os.path.join(tmp, "brand_totals.csv")).values)
+        scores = {entry["brand"]: entry["total_score"] for entry in snapshot["brands"]}
+        consistent = all(abs(scores.get(brand, 0) - totals[brand]) < 1e-2 for brand in keywords)
+
+        print(f"\nMode {args.mode}, {args.seconds}s broadcast at {args.speed:g}x, {len(counted)} frames counted")
+        print(f"On air to counted (broadcast seconds): p50 {np.percentile(delays, 50):.2f}s, "
+              f"p95 {np.percentile(delays, 95):.2f}s, max {delays.max():.2f}s")
+        print(f"VOD path: nothing is counted until the whole {args.seconds}s broadcast is downloaded")
+        latency = snapshot["latency_seconds"] or {}
+        print(f"Arrival to counted (wall seconds): p50 {latency.get('p50')}s, p95 {latency.get('p95')}s")
+        print(f"{'brand':<18}{'expected':>10}{'counted':>10}")
+        for brand, text in zip(keywords, manifest["texts"]):
+            print(f"{brand:<18}{expected[text]:>10}{found.get(brand, 0):>10}")
+        print("✅ Live counts match the ground truth" if exact else "❌ Live counts differ from the ground truth")
+        print("✅ Live scores match brand_totals.csv" if consistent else
+              f"❌ Live scores {scores} differ from brand_totals.csv {totals}")
+        if not (exact and consistent):
+            sys.exit(1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compare the vectorized brand matcher (tasks/matching.py) with the original
+frames x brands x words x variants loop from count_brands, and check that
+both produce identical counts and match logs.
+
+    cd backend
+    python -m benchmarks.bench_matching --frames 3000
+"""
+import argparse
+import random
+import time
+
+from rapidfuzz import fuzz
+
+from pipeline import brand_keywords
+from tasks.matching import score_frames
+
+NOISE_WORDS = ["the", "nba", "playoffs", "thunder", "nuggets", "4th", "qtr", "2:31", "foul",
+               "timeout", "replay", "shot", "clock", "bonus", "okc", "den", "live", "final"]
+
+def legacy_score_frames(frame_texts, brand_keywords, threshold=80):
+    """The original nested loop from count_brands."""
+    results, match_log = [], {}
+    for frame, lines in frame_texts.items():
+        row = {"Frame": frame}
+        match_log[frame] = []
+        for brand, variants in brand_keywords.items():
+            count = 0
+            for line in lines:
+                words = line.lower().split()
+                for word in words:
+                    for variant in variants:
+                        score = fuzz.ratio(variant, word)
+                        if score >= threshold:
+                            count += 1
+                            match_log[frame].append({
+                                "brand": brand,
+                                "word": word,
+                                "matched_variant": variant,
+                                "score": score
+                            })
+                            break
+            row[brand] = count
+        results.append(row)
+    return results, match_log
+
+def synthetic_frame_texts(frames, seed=0):
+    """OCR-like text: recurring brand tokens with typos mixed with broadcast noise."""
+    rng = random.Random(seed)
+    brand_words = [v.upper() for variants in brand_keywords.values() for v in variants]
+
+    def typo(word):
+        if len(word) > 3 and rng.random() < 0.3:
+            i = rng.randrange(len(word))
+            return word[:i] + rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") + word[i + 1:]
+        return word
+
+    frame_texts = {}
+    for i in range(frames):
+        lines = []
+        for _ in range(rng.randint(0, 8)):
+            words = [typo(rng.choice(brand_words)) if rng.random() < 0.3 else rng.choice(NOISE_WORDS)
+                     for _ in range(rng.randint(1, 4))]
+            lines.append(" ".join(words))
+        frame_texts[f"frame_{i:04d}_result"] = lines
+    return frame_texts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--threshold", type=int, default=80)
+    args = parser.parse_args()
+
+    frame_texts = synthetic_frame_texts(args.frames)
+    words = sum(len(line.split()) for lines in frame_texts.values() for line in lines)
+    print(f"{args.frames} frames, {words} words, {len(brand_keywords)} brands")
+
+    start = time.perf_counter()
+    legacy = legacy_score_frames(frame_texts, brand_keywords, args.threshold)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = score_frames(frame_texts, brand_keywords, args.threshold)
+    vectorized_seconds = time.perf_counter() - start
+
+    # A second job in the same worker process reuses the compiled matcher's token cache.
+    next_job = synthetic_frame_texts(args.frames, seed=1)
+    start = time.perf_counter()
+    warm = score_frames(next_job, brand_keywords, args.threshold)
+    warm_seconds = time.perf_counter() - start
+
+    print(f"legacy loop:        {legacy_seconds:8.3f}s")
+    print(f"vectorized (cold):  {vectorized_seconds:8.3f}s  ({legacy_seconds / vectorized_seconds:.1f}x)")
+    print(f"vectorized (warm):  {warm_seconds:8.3f}s  ({legacy_seconds / warm_seconds:.1f}x, next job in same worker)")
+    identical = legacy == vectorized and legacy_score_frames(next_job, brand_keywords, args.threshold) == warm
+    print(f"identical output: {identical}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+OCR engine throughput (frames/s and frames/s per core) across worker counts
+and batch sizes.
+
+    cd backend
+    python -m benchmarks.bench_ocr_engine --frames 120 --workers 1 2 4 --batch-sizes 1 8
+    python -m benchmarks.bench_ocr_engine --model PP-OCRv5_mobile   # real PaddleOCR
+
+With the stub, --stub-cost-ms simulates per-frame inference cost.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from benchmarks.fixtures import make_synthetic_video, stub_ocr_factory
+from tasks.download_and_extract_frames import extract_frames
+from tasks.ocr_engine import OCREngine, shutdown_pools
+from tasks.ocr_models import build_ocr
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=60, help="Number of 1 FPS frames to OCR")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--model", default=None, help="Use real PaddleOCR with this model instead of the stub")
+    parser.add_argument("--stub-cost-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    os.environ["STUB_OCR_COST_MS"] = str(args.stub_cost_ms)
+    factory = build_ocr if args.model else stub_ocr_factory
+
+    tmp = tempfile.mkdtemp(prefix="bench_ocr_engine_")
+    try:
+        video = make_synthetic_video(os.path.join(tmp, "video.mp4"), seconds=args.frames, fps=10)
+        frames_dir = extract_frames(video, os.path.join(tmp, "frames"))
+        paths = sorted(os.path.join(frames_dir, f) for f in os.listdir(frames_dir))
+
+        rows = []
+        for workers in args.workers:
+            for batch_size in args.batch_sizes:
+                with OCREngine(args.model, workers=workers, batch_size=batch_size, ocr_factory=factory) as engine:
+                    # Warm up so model construction isn't counted.
+                    list(engine.run(paths[:workers * batch_size]))
+                    engine.frames, engine.seconds = 0, 0.0
+                    for _ in engine.run(paths):
+                        pass
+                    fps, per_core = engine.throughput()
+                    rows.append((workers, batch_size, engine.cores, fps, per_core))
+
+        print(f"\n{'workers':>8}{'batch':>7}{'cores':>7}{'frames/s':>10}{'fps/core':>10}{'game (48 min) @1fps':>22}")
+        for workers, batch_size, cores, fps, per_core in rows:
+            game_minutes = 48 * 60 / fps / 60 if fps else float("inf")
+            print(f"{workers:>8}{batch_size:>7}{cores:>7}{fps:>10.2f}{per_core:>10.3f}{game_minutes:>18.1f} min")
+    finally:
+        shutdown_pools()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
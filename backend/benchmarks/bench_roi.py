@@ -0,0 +1,87 @@
+"""
+OCR time and brand hit rate with region-of-interest cropping (tasks/roi.py)
+against whole-frame OCR, on the synthetic broadcast fixture.
+
+Runs whole-frame OCR, each built-in ROI profile, and a profile learned from
+the whole-frame run's detections. The stub OCR's cost scales with the pixels
+it sees (--ocr-cost-ms per megapixel), like a text detector; it only reads
+board text fully inside its crop, so a region that cuts the board shows up as
+lost hits. Hit rate is the share of whole-frame brand detections kept.
+
+    cd backend
+    python -m benchmarks.bench_roi --seconds 60
+    python -m benchmarks.bench_roi --ocr-cost-ms 80 --size 1920x1080
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.fixtures import BOARD_REGION, make_synthetic_video, StubOCR
+from tasks.count import count_brands
+from tasks.download_and_extract_frames import iter_frames
+from tasks.ocr import run_ocr_on_stream
+from tasks.ocr_store import OCRStore
+from tasks.matching import get_matcher
+from tasks.roi import ROI_PROFILES, detection_heatmap, frame_share, regions_from_heatmap
+
+BRANDS = {"StateFarm": ["state", "statefarm", "astatefarm"]}
+
+def run(label, regions, frames, work_dir, ocr):
+    ocr_dir = os.path.join(work_dir, label, "paddle_output")
+    start = time.perf_counter()
+    run_ocr_on_stream(iter(frames), ocr_dir, None, ocr=ocr, save_frames="none", regions=regions)
+    seconds = time.perf_counter() - start
+
+    count_brands(ocr_dir, os.path.join(work_dir, label), BRANDS)
+    df = pd.read_csv(os.path.join(work_dir, label, "brand_analysis.csv"))
+    hits = set(df.loc[df["StateFarm"] > 0, "Frame"])
+
+    # Boxes must come back in frame coordinates, i.e. on the courtside board
+    store = OCRStore(ocr_dir)
+    width, height = store.frame_size
+    bx0, by0, bx1, by1 = (BOARD_REGION[0] * width, BOARD_REGION[1] * height,
+                          BOARD_REGION[2] * width, BOARD_REGION[3] * height)
+    boxes = store.detections["box"]
+    on_board = bool(((boxes[:, 0] >= bx0) & (boxes[:, 1] >= by0) &
+                     (boxes[:, 2] <= bx1) & (boxes[:, 3] <= by1)).all()) if len(boxes) else True
+    return {"label": label, "share": frame_share(regions), "regions": len(regions or []),
+            "seconds": seconds, "hits": hits, "on_board": on_board, "ocr_dir": ocr_dir}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60, help="Length of the fixture video")
+    parser.add_argument("--size", default="1280x720", help="Fixture frame size, WIDTHxHEIGHT")
+    parser.add_argument("--ocr-cost-ms", type=float, default=40, help="Stub OCR cost per megapixel")
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+
+    tmp = tempfile.mkdtemp(prefix="bench_roi_")
+    try:
+        video = make_synthetic_video(os.path.join(tmp, "fixture.mp4"), seconds=args.seconds, size=size)
+        frames = list(iter_frames(video, fps=1))
+        ocr = StubOCR(cost_ms=args.ocr_cost_ms, per_megapixel=True, locate=True)
+
+        results = [run("full", None, frames, tmp, ocr)]
+        for name, regions in ROI_PROFILES.items():
+            if regions:
+                results.append(run(name, regions, frames, tmp, ocr))
+        heat, _ = detection_heatmap([results[0]["ocr_dir"]], matcher=get_matcher(BRANDS))
+        results.append(run("learned", regions_from_heatmap(heat), frames, tmp, ocr))
+
+        full = results[0]
+        print(f"\n{'profile':<14}{'regions':>8}{'pixels':>8}{'OCR (s)':>9}{'speedup':>9}"
+              f"{'hits':>6}{'hit rate':>10}{'boxes on board':>16}")
+        for r in results:
+            hit_rate = len(r["hits"] & full["hits"]) / len(full["hits"]) if full["hits"] else 1.0
+            print(f"{r['label']:<14}{r['regions']:>8}{r['share']:>8.0%}{r['seconds']:>9.2f}"
+                  f"{full['seconds'] / r['seconds']:>8.2f}x{len(r['hits']):>6}{hit_rate:>10.0%}"
+                  f"{'yes' if r['on_board'] else 'NO':>16}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
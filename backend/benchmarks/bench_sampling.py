@@ -0,0 +1,56 @@
+"""
+Compare frame sampling backends (tasks.sampling) on a synthetic video.
+"read" is the original decode-everything loop; "same" tells whether a
+backend returned exactly its frames (ffmpeg's fps filter may pick
+neighbouring ones, see sample_frames).
+
+    cd backend
+    python -m benchmarks.bench_sampling --seconds 120 --video-fps 60
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.fixtures import make_synthetic_video
+from tasks.sampling import sample_frames, SAMPLING_BACKENDS
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--video-fps", type=int, default=60)
+    parser.add_argument("--fps", type=float, default=1, help="Sampling rate")
+    parser.add_argument("--backends", nargs="+", default=list(SAMPLING_BACKENDS), choices=SAMPLING_BACKENDS)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_sampling_")
+    try:
+        video = make_synthetic_video(os.path.join(tmp, "video.mp4"), seconds=args.seconds, fps=args.video_fps)
+
+        rows = []
+        for backend in args.backends:
+            if backend == "ffmpeg" and not shutil.which("ffmpeg"):
+                print("Skipping ffmpeg backend: ffmpeg binary not found on PATH.")
+                continue
+            start = time.perf_counter()
+            timestamps, digests = [], []
+            for _, ts, frame in sample_frames(video, fps=args.fps, backend=backend):
+                timestamps.append(ts)
+                digests.append(hashlib.md5(frame.tobytes()).digest())
+            elapsed = time.perf_counter() - start
+            rows.append((backend, len(timestamps), elapsed, timestamps[:3], digests))
+
+        baseline = next((r[2] for r in rows if r[0] == "read"), None)
+        reference = next((r[4] for r in rows if r[0] == "read"), None)
+        print(f"\n{'backend':<8}{'frames':>8}{'wall (s)':>10}{'speedup':>9}{'same':>6}  first timestamps")
+        for backend, count, elapsed, first, digests in rows:
+            speedup = f"{baseline / elapsed:.2f}x" if baseline else "-"
+            same = "-" if reference is None else "yes" if digests == reference else "no"
+            print(f"{backend:<8}{count:>8}{elapsed:>10.3f}{speedup:>9}{same:>6}  {first}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
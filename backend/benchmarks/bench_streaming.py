@@ -0,0 +1,87 @@
+"""
+Compare the disk round-trip path (extract_frames -> JPEGs -> run_ocr_on_frames)
+against the streaming path (iter_frames -> queue -> run_ocr_on_stream).
+
+    cd backend
+    python -m benchmarks.bench_streaming --seconds 120
+    python -m benchmarks.bench_streaming --model PP-OCRv5_mobile   # real PaddleOCR
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import psutil
+
+from benchmarks.fixtures import make_synthetic_video, StubOCR
+from tasks.download_and_extract_frames import extract_frames, iter_frames
+from tasks.ocr import run_ocr_on_frames, run_ocr_on_stream
+from tasks.ocr_models import get_ocr
+
+def dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def io_snapshot():
+    try:
+        io = psutil.Process().io_counters()
+        return io.read_bytes, io.write_bytes
+    except (AttributeError, psutil.Error):
+        return 0, 0
+
+def measure(label, fn, work_dir):
+    read0, write0 = io_snapshot()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    read1, write1 = io_snapshot()
+    return {
+        "mode": label,
+        "seconds": round(elapsed, 3),
+        "bytes_on_disk": dir_bytes(work_dir),
+        "io_read_bytes": read1 - read0,
+        "io_write_bytes": write1 - write0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=60, help="Length of the synthetic video")
+    parser.add_argument("--video-fps", type=int, default=30)
+    parser.add_argument("--fps", type=float, default=1, help="Sampling rate")
+    parser.add_argument("--model", default=None, help="Use real PaddleOCR with this model instead of the stub")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_streaming_")
+    try:
+        video = make_synthetic_video(os.path.join(tmp, "video.mp4"), seconds=args.seconds, fps=args.video_fps)
+        ocr = get_ocr(args.model) if args.model else StubOCR()
+
+        disk_dir = os.path.join(tmp, "disk")
+        stream_dir = os.path.join(tmp, "stream")
+
+        def disk():
+            frames_dir = os.path.join(disk_dir, "frames")
+            extract_frames(video, frames_dir, fps=args.fps)
+            run_ocr_on_frames(frames_dir, os.path.join(disk_dir, "paddle_output"), args.model, ocr=ocr, max_files=None)
+
+        def stream():
+            run_ocr_on_stream(iter_frames(video, fps=args.fps), os.path.join(stream_dir, "paddle_output"),
+                              args.model, ocr=ocr, frames_dir=os.path.join(stream_dir, "frames"), save_frames="text")
+
+        results = [measure("disk", disk, disk_dir), measure("stream", stream, stream_dir)]
+
+        print(f"\n{'mode':<8}{'wall (s)':>10}{'on disk':>14}{'io read':>14}{'io write':>14}")
+        for r in results:
+            print(f"{r['mode']:<8}{r['seconds']:>10}{r['bytes_on_disk']:>14,}{r['io_read_bytes']:>14,}{r['io_write_bytes']:>14,}")
+        speedup = results[0]["seconds"] / results[1]["seconds"] if results[1]["seconds"] else float("inf")
+        print(f"\nStreaming speedup: {speedup:.2f}x, "
+              f"disk footprint {results[1]['bytes_on_disk'] / max(results[0]['bytes_on_disk'], 1):.0%} of the JPEG path")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
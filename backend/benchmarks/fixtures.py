@@ -0,0 +1,477 @@
+"""
+Offline fixtures for the benchmarks: synthetic "broadcast" videos (one
+with brand boards at known positions and times), live stand-ins that air
+a video as HLS-style segments or a growing file, stub OCR engines and a
+local SMTP server, so nothing needs YouTube, a live stream, PaddleOCR
+weights or a mail provider.
+"""
+import os
+import json
+import time
+import threading
+import socketserver
+from email import message_from_bytes
+from email.policy import default as default_policy
+import cv2
+import numpy as np
+
+from tasks.ocr import save_result_json
+
+BOARD_TEXTS = ["STATE FARM", "COINBASE", "ESPN", "GOOGLE", "KIA", "TISSOT"]
+
+# Courtside board region, relative to frame size (x0, y0, x1, y1)
+BOARD_REGION = (0.1, 0.75, 0.9, 0.9)
+
+def board_visible(second, on_seconds=5, off_seconds=5):
+    """Boards are shown for `on_seconds`, then hidden for `off_seconds`."""
+    return (second % (on_seconds + off_seconds)) < on_seconds
+
+def make_synthetic_video(path, seconds=60, fps=30, size=(1280, 720), on_seconds=5, off_seconds=5):
+    """
+    Render a synthetic broadcast clip with a moving "court" background and a
+    courtside board showing brand text during some seconds (see board_visible).
+    Returns the video path.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        raise RuntimeError(f"Unable to open video writer for {path}")
+
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 40, size=(height, width, 3), dtype=np.uint8)
+    x0, y0, x1, y1 = (int(BOARD_REGION[0] * width), int(BOARD_REGION[1] * height),
+                      int(BOARD_REGION[2] * width), int(BOARD_REGION[3] * height))
+
+    for i in range(int(seconds * fps)):
+        second = int(i // fps)
+        frame = np.full((height, width, 3), (40, 90, 160), dtype=np.uint8)
+        frame = cv2.add(frame, np.roll(noise, i * 4, axis=1))
+        cv2.circle(frame, ((i * 7) % width, height // 2), 30, (20, 120, 230), -1)
+        if board_visible(second, on_seconds, off_seconds):
+            text = BOARD_TEXTS[(second // 10) % len(BOARD_TEXTS)]
+            cv2.rectangle(frame, (x0, y0), (x1, y1), (255, 255, 255), -1)
+            cv2.putText(frame, text, (x0 + 20, y1 - 25), cv2.FONT_HERSHEY_SIMPLEX,
+                        2.0, (0, 0, 0), 4, cv2.LINE_AA)
+        writer.write(frame)
+
+    writer.release()
+    return path
+
+class StubResult:
+    """Mimics the parts of a PaddleOCR result object the pipeline uses."""
+
+    def __init__(self, texts, box):
+        self.json = {"res": {
+            "rec_texts": texts,
+            "rec_scores": [0.99] * len(texts),
+            "rec_boxes": [box] * len(texts),
+        }}
+
+    def save_to_json(self, folder):
+        prefix = os.path.basename(os.path.normpath(folder))[:-len("_result")]
+        save_result_json(self.json["res"], os.path.dirname(os.path.normpath(folder)), prefix)
+
+    def save_to_img(self, folder):
+        pass
+
+class StubOCR:
+    """
+    Cheap stand-in for PaddleOCR: "reads" the board text when the courtside
+    board is lit. Accepts a path, an ndarray or a list of either, like
+    PaddleOCR.predict. `cost_ms` burns CPU per image (or per megapixel) to
+    mimic inference. With `locate`, the board is searched for anywhere in the
+    image (so crops work) and text cut off by the image edge is not read.
+    """
+
+    def __init__(self, cost_ms=0, per_megapixel=False, locate=False):
+        self.cost_ms = cost_ms
+        self.per_megapixel = per_megapixel
+        self.locate = locate
+
+    def _burn(self, pixels):
+        cost_ms = self.cost_ms * pixels / 1e6 if self.per_megapixel else self.cost_ms
+        deadline = time.perf_counter() + cost_ms / 1000
+        while time.perf_counter() < deadline:
+            pass
+
+    def _predict_one(self, img):
+        if isinstance(img, str):
+            img = cv2.imread(img)
+        height, width = img.shape[:2]
+        self._burn(height * width)
+        if self.locate:
+            return self._locate_text(img)
+        x0, y0, x1, y1 = (int(BOARD_REGION[0] * width), int(BOARD_REGION[1] * height),
+                          int(BOARD_REGION[2] * width), int(BOARD_REGION[3] * height))
+        board = cv2.cvtColor(img[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        if board.mean() < 150:
+            return StubResult([], [x0, y0, x1, y1])
+        return StubResult(["STATE", "FARM"], [x0, y0, x1, y1])
+
+    def _locate_text(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape
+        count, _, stats, _ = cv2.connectedComponentsWithStats((gray > 200).astype(np.uint8))
+        for x, y, w, h, area in stats[1:count]:
+            if w < 40 or h < 20:
+                continue
+            ys, xs = np.nonzero(gray[y:y + h, x:x + w] < 80)
+            if not len(xs):
+                continue
+            box = [int(x + xs.min()), int(y + ys.min()), int(x + xs.max()) + 1, int(y + ys.max()) + 1]
+            if box[0] <= 1 or box[1] <= 1 or box[2] >= width - 1 or box[3] >= height - 1:
+                continue  # text cut off by the crop edge is unreadable
+            return StubResult(["STATE", "FARM"], box)
+        return StubResult([], [0, 0, 0, 0])
+
+    def predict(self, img):
+        if isinstance(img, list):
+            return [self._predict_one(i) for i in img]
+        return [self._predict_one(img)]
+
+# Where brand boards appear in a broadcast (make_broadcast_video), relative
+# to frame size (x0, y0, x1, y1)
+BROADCAST_SLOTS = {
+    "courtside": (0.1, 0.78, 0.9, 0.92),
+    "scorebug": (0.03, 0.04, 0.4, 0.13),
+    "midcourt": (0.3, 0.46, 0.7, 0.56),
+}
+# Each board carries its brand number as a row of black/white blocks
+# (BARCODE_BITS bits, BARCODE_BLOCK px wide), which BarcodeOCR decodes.
+BARCODE_BITS = 10
+BARCODE_BLOCK = 8
+
+def _slot_box(slot, size):
+    width, height = size
+    x0, y0, x1, y1 = BROADCAST_SLOTS[slot]
+    return int(x0 * width), int(y0 * height), int(x1 * width), int(y1 * height)
+
+def _barcode_blocks(box):
+    """Centres of a board's barcode blocks, left to right."""
+    x0, y0, _, _ = box
+    return [(x0 + BARCODE_BLOCK * (i + 1) + BARCODE_BLOCK // 2, y0 + 4 + BARCODE_BLOCK // 2)
+            for i in range(BARCODE_BITS)]
+
+def broadcast_schedule(seconds, texts, seed=0, min_on=3, max_on=8, min_off=2, max_off=6):
+    """
+    When each board slot shows which of `texts`: a list of {"slot",
+    "brand" (index into texts), "start", "end"} with whole-second bounds,
+    boards alternating between a brand and nothing. Brands take turns (in
+    a shuffled order), so every brand shows up once the video is long enough.
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(texts))
+    schedule = []
+    for slot in BROADCAST_SLOTS:
+        t = int(rng.integers(0, max_off + 1))
+        while t < seconds:
+            end = min(t + int(rng.integers(min_on, max_on + 1)), seconds)
+            schedule.append({"slot": slot, "brand": int(order[len(schedule) % len(texts)]), "start": t, "end": end})
+            t = end + int(rng.integers(min_off, max_off + 1))
+    return schedule
+
+def make_broadcast_video(path, seconds, texts, fps=10, size=(1280, 720), seed=0):
+    """
+    Render a synthetic broadcast: a moving court background with brand
+    boards (BROADCAST_SLOTS) showing `texts` at the times broadcast_schedule
+    picks, each board tagged with its brand number in a pixel barcode.
+    Writes the video and returns its manifest (also saved next to it as
+    <path>.json): size, fps, seconds, texts and the schedule, the ground
+    truth for BarcodeOCR and expected_sightings.
+    """
+    if len(texts) >= 2 ** BARCODE_BITS:
+        raise ValueError(f"At most {2 ** BARCODE_BITS - 1} brands fit in the barcode")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        raise RuntimeError(f"Unable to open video writer for {path}")
+
+    schedule = broadcast_schedule(seconds, texts, seed=seed)
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 40, size=(height, width, 3), dtype=np.uint8)
+    for i in range(seconds * fps):
+        second = i / fps
+        frame = np.full((height, width, 3), (40, 90, 160), dtype=np.uint8)
+        frame = cv2.add(frame, np.roll(noise, i * 4, axis=1))
+        cv2.circle(frame, ((i * 7) % width, height // 2), 30, (20, 120, 230), -1)
+        for board in schedule:
+            if not board["start"] <= second < board["end"]:
+                continue
+            x0, y0, x1, y1 = box = _slot_box(board["slot"], size)
+            cv2.rectangle(frame, (x0, y0), (x1, y1), (255, 255, 255), -1)
+            code = board["brand"] + 1
+            for bit, (cx, cy) in enumerate(_barcode_blocks(box)):
+                if code >> bit & 1:
+                    half = BARCODE_BLOCK // 2
+                    cv2.rectangle(frame, (cx - half, cy - half), (cx + half - 1, cy + half - 1), (0, 0, 0), -1)
+            scale = (y1 - y0) / 50
+            cv2.putText(frame, texts[board["brand"]], (x0 + BARCODE_BLOCK * (BARCODE_BITS + 2), y1 - (y1 - y0) // 4),
+                        cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), max(int(scale * 2), 1), cv2.LINE_AA)
+        writer.write(frame)
+    writer.release()
+
+    manifest = {"video": os.path.basename(path), "size": list(size), "fps": fps, "seconds": seconds,
+                "texts": list(texts), "schedule": schedule}
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+# A scorebug board in a static shot: 400x70 px on a 1280x720 frame
+SCOREBUG_BOX = (800, 40, 1200, 110)
+
+def make_static_shot(path, seconds=60, fps=10, size=(1280, 720), texts=BOARD_TEXTS, hold_seconds=4, seed=0):
+    """
+    Render a static camera shot (a fixed court background with light sensor
+    noise) whose small scorebug board (SCOREBUG_BOX) cycles every
+    `hold_seconds` through blank and each of `texts`. Returns the board's
+    text per whole second ("" when blank), the ground truth for dedup.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        raise RuntimeError(f"Unable to open video writer for {path}")
+
+    rng = np.random.default_rng(seed)
+    court = cv2.add(np.full((height, width, 3), (40, 90, 160), dtype=np.uint8),
+                    rng.integers(0, 40, size=(height, width, 3), dtype=np.uint8))
+    cycle = [""] + list(texts)
+    board_texts = [cycle[(second // hold_seconds) % len(cycle)] for second in range(seconds)]
+    x0, y0, x1, y1 = SCOREBUG_BOX
+    for i in range(seconds * fps):
+        frame = court.copy()
+        cv2.rectangle(frame, (x0, y0), (x1, y1), (30, 30, 30), -1)
+        text = board_texts[i // fps]
+        if text:
+            cv2.putText(frame, text, (x0 + 15, y1 - 18), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (255, 255, 255), 3,
+                        cv2.LINE_AA)
+        sensor = rng.normal(0, 2, size=frame.shape)
+        writer.write(np.clip(frame + sensor, 0, 255).astype(np.uint8))
+    writer.release()
+    return board_texts
+
+def expected_sightings(manifest, fps=1):
+    """Ground truth: per text, how many frames sampled at `fps` show it (one per board)."""
+    counts = dict.fromkeys(manifest["texts"], 0)
+    for i in range(int(manifest["seconds"] * fps)):
+        second = i / fps
+        for board in manifest["schedule"]:
+            if board["start"] <= second < board["end"]:
+                counts[manifest["texts"][board["brand"]]] += 1
+    return counts
+
+class BarcodeOCR(StubOCR):
+    """
+    Stub OCR for make_broadcast_video clips: "reads" each lit board by
+    decoding its barcode and returns that brand's text, so results are
+    exact without PaddleOCR. `cost_ms` burns CPU per image like StubOCR.
+    """
+
+    def __init__(self, manifest, cost_ms=0, per_megapixel=False):
+        super().__init__(cost_ms=cost_ms, per_megapixel=per_megapixel)
+        self.texts = manifest["texts"]
+        self.boxes = [_slot_box(slot, manifest["size"]) for slot in BROADCAST_SLOTS]
+
+    def _predict_one(self, img):
+        if isinstance(img, str):
+            img = cv2.imread(img)
+        self._burn(img.shape[0] * img.shape[1])
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        texts, boxes = [], []
+        for box in self.boxes:
+            x0, y0, x1, y1 = box
+            if gray[y0 + 2:y0 + 4, x1 - 12:x1 - 4].mean() < 200:
+                continue  # board not lit
+            code = sum(1 << bit for bit, (cx, cy) in enumerate(_barcode_blocks(box))
+                       if gray[cy - 1:cy + 2, cx - 1:cx + 2].mean() < 100)
+            if 0 < code <= len(self.texts):
+                texts.append(self.texts[code - 1])
+                boxes.append(list(box))
+        result = StubResult(texts, [0, 0, 0, 0])
+        result.json["res"]["rec_boxes"] = boxes
+        return result
+
+def split_segments(video_path, out_dir, segment_seconds=4):
+    """
+    Cut a video into consecutive segments of `segment_seconds` (the last
+    may be shorter), written to `out_dir` as seg_NNNNN.mp4. Returns
+    [(path, seconds)] in order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    vidcap = cv2.VideoCapture(video_path)
+    fps = vidcap.get(cv2.CAP_PROP_FPS)
+    per_segment = max(int(round(fps * segment_seconds)), 1)
+    segments, writer, frames = [], None, 0
+    try:
+        while True:
+            success, frame = vidcap.read()
+            if not success:
+                break
+            if frames % per_segment == 0:
+                if writer is not None:
+                    writer.release()
+                path = os.path.join(out_dir, f"seg_{len(segments):05d}.mp4")
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps,
+                                         (frame.shape[1], frame.shape[0]))
+                segments.append([path, 0.0])
+            writer.write(frame)
+            segments[-1][1] += 1 / fps
+            frames += 1
+    finally:
+        vidcap.release()
+        if writer is not None:
+            writer.release()
+    return [(path, round(seconds, 3)) for path, seconds in segments]
+
+def _write_playlist(path, entries, target_seconds, ended=False):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{int(np.ceil(target_seconds))}",
+             "#EXT-X-MEDIA-SEQUENCE:0"]
+    for name, seconds in entries:
+        lines += [f"#EXTINF:{seconds:.3f},", name]
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+def publish_segments(segments, live_dir, speed=1.0, playlist=True):
+    """
+    "Air" segments (from split_segments) like a live HLS stream: each is
+    moved into `live_dir` once its last second has aired, at `speed` times
+    real time, and, with `playlist`, listed in live_dir/index.m3u8, which
+    ends with #EXT-X-ENDLIST after the last one. Blocks until then (run it
+    in a thread); returns the wall time airing started.
+    """
+    os.makedirs(live_dir, exist_ok=True)
+    playlist_path = os.path.join(live_dir, "index.m3u8")
+    target = max(seconds for _, seconds in segments)
+    if playlist:
+        _write_playlist(playlist_path, [], target)
+    started, aired, entries = time.time(), 0.0, []
+    for path, seconds in segments:
+        aired += seconds
+        time.sleep(max(started + aired / speed - time.time(), 0))
+        name = os.path.basename(path)
+        os.replace(path, os.path.join(live_dir, name))
+        entries.append((name, seconds))
+        if playlist:
+            _write_playlist(playlist_path, entries, target)
+    if playlist:
+        _write_playlist(playlist_path, entries, target, ended=True)
+    return started
+
+def grow_file(source, target, speed=1.0, interval=0.25):
+    """
+    Copy a finished recording (e.g. an MKV from make_broadcast_video) to
+    `target` the way a recorder writes a live one: bytes appended in
+    proportion to the time aired, at `speed` times real time. Blocks until
+    done; returns the wall time airing started.
+    """
+    vidcap = cv2.VideoCapture(source)
+    seconds = vidcap.get(cv2.CAP_PROP_FRAME_COUNT) / vidcap.get(cv2.CAP_PROP_FPS)
+    vidcap.release()
+    with open(source, "rb") as f:
+        data = f.read()
+    started, written = time.time(), 0
+    with open(target, "wb") as out:
+        while written < len(data):
+            aired = min((time.time() - started) * speed / seconds, 1.0)
+            upto = int(len(data) * aired)
+            if upto > written:
+                out.write(data[written:upto])
+                out.flush()
+                written = upto
+            time.sleep(interval)
+    return started
+
+def stub_ocr_factory(model=None, cpu_threads=None):
+    """Picklable OCR factory for OCREngine process pools."""
+    return StubOCR(cost_ms=float(os.getenv("STUB_OCR_COST_MS", "0")))
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class LocalSMTPServer:
+    """
+    In-process stand-in for an SMTP provider (like aiosmtpd's debugging
+    server): speaks enough ESMTP for smtplib (EHLO, AUTH PLAIN/LOGIN, MAIL,
+    RCPT, DATA, NOOP, RSET, QUIT) and records delivered messages. Every
+    reply is delayed by `latency_ms` (the network round trip) and the
+    session setup by `handshake_ms` (TLS + login at a real provider). The
+    first `fail_first` messages get a 421 and the connection is dropped,
+    like a throttling server. Use as a context manager; `port` is free.
+    """
+
+    def __init__(self, latency_ms=0, handshake_ms=0, fail_first=0):
+        self.latency_ms = latency_ms
+        self.handshake_ms = handshake_ms
+        self.fail_first = fail_first
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    def __enter__(self):
+        fixture = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                time.sleep(fixture.latency_ms / 1000)
+                self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+            def handle(self):
+                with fixture.lock:
+                    fixture.connections += 1
+                time.sleep(fixture.handshake_ms / 1000)
+                self.reply("220 localhost ESMTP stand-in")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode("ascii", "replace").strip()
+                    verb = command.split(" ", 1)[0].upper()
+                    if verb == "EHLO":
+                        self.reply("250-localhost")
+                        self.reply("250-AUTH PLAIN LOGIN")
+                        self.reply("250 SIZE 104857600")
+                    elif verb == "AUTH":
+                        self.reply("235 2.7.0 Authentication successful")
+                    elif verb == "MAIL":
+                        with fixture.lock:
+                            failing = fixture.fail_first > 0
+                            fixture.fail_first -= failing
+                        if failing:
+                            self.reply("421 4.7.0 Try again later, closing connection")
+                            return
+                        self.reply("250 OK")
+                    elif verb in ("HELO", "RCPT", "NOOP", "RSET"):
+                        self.reply("250 OK")
+                    elif verb == "DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        lines = []
+                        while True:
+                            data = self.rfile.readline()
+                            if data in (b".\r\n", b""):
+                                break
+                            lines.append(data[1:] if data.startswith(b"..") else data)
+                        with fixture.lock:
+                            fixture.messages.append(message_from_bytes(b"".join(lines), policy=default_policy))
+                        self.reply("250 OK queued")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Command not implemented")
+
+        self.server = _SMTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="smtp-stand-in", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,247 @@
+"""
+End-to-end benchmark suite: the pipeline's stages (extract_frames,
+run_ocr_on_frames, count_brands, track_brands, generate_visuals,
+generate_enhanced_report) timed one by one on synthetic broadcasts of
+several lengths and brand-list sizes (fixtures.make_broadcast_video), with
+the brand counts checked against each video's ground truth.
+
+OCR is BarcodeOCR, which reads the boards exactly without model weights
+(--ocr-cost-ms mimics inference time), unless --model names a PaddleOCR
+model. Results (stage seconds, peak RSS, counters, accuracy, plus the git
+commit and machine) are written as JSON; --baseline compares them with an
+earlier results file and exits with status 1 if a stage got slower than
+--tolerance allows or the counts stopped matching the ground truth.
+
+    cd backend
+    python -m benchmarks.suite --output suite.json
+    python -m benchmarks.suite --lengths 60,600 --brands 2,8,32 --repeat 3
+    python -m benchmarks.suite --baseline suite.json --output suite_new.json
+    python -m benchmarks.suite --model PP-OCRv5_mobile --lengths 60 --brands 8
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fixtures import BarcodeOCR, expected_sightings, make_broadcast_video
+from pipeline import BRAND_MATCH_THRESHOLD, brand_keywords
+from tasks.count import count_brands
+from tasks.download_and_extract_frames import extract_frames
+from tasks.ocr import run_ocr_on_frames
+from tasks.ocr_models import get_ocr
+from tasks.report import generate_enhanced_report
+from tasks.tracking import track_brands
+from tasks.visual import generate_visuals
+from utils.metrics import metrics, peak_rss_bytes, reset_peak_rss
+
+STAGES = ("extract_frames", "run_ocr_on_frames", "count_brands", "track_brands", "generate_visuals",
+          "generate_enhanced_report")
+
+def brand_set(size, seed=0):
+    """
+    `size` brands as (brand_keywords, board texts): the pipeline's own
+    brands first, then made-up sponsors with random names, which don't
+    fuzzy-match each other.
+    """
+    keywords = dict(list(brand_keywords.items())[:size])
+    texts = [variants[0].upper() for variants in keywords.values()]
+    rng = np.random.default_rng(seed)
+    while len(keywords) < size:
+        name = "".join(chr(ord("a") + c) for c in rng.integers(0, 26, 7))
+        keywords[name.title()] = [name]
+        texts.append(name.upper())
+    return keywords, texts
+
+def broadcast(work_dir, seconds, size, fps):
+    """The synthetic broadcast for a case and its manifest, rendered once per work dir."""
+    path = os.path.join(work_dir, f"broadcast_{seconds}s_{size}brands.mp4")
+    if os.path.isfile(path) and os.path.isfile(f"{path}.json"):
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            return path, json.load(f)
+    print(f"🎬 Rendering a {seconds}s broadcast with {size} brands...")
+    return path, make_broadcast_video(path, seconds, brand_set(size)[1], fps=fps)
+
+def timed(fn):
+    """Run `fn`; returns its seconds, peak RSS and the counters (utils/metrics.py) it moved."""
+    reset_peak_rss()
+    before = metrics.counter_values()
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    moved = {}
+    for (name, labels), value in metrics.counter_values().items():
+        if value != before.get((name, labels), 0):
+            label = ",".join(f"{k}={v}" for k, v in labels)
+            moved[f"{name}{{{label}}}" if label else name] = value - before.get((name, labels), 0)
+    return {"seconds": seconds, "peak_rss_mb": round(peak_rss_bytes() / 2**20, 1), "counters": moved}
+
+def run_case(video, manifest, keywords, case_dir, ocr, model, plot_profile):
+    """One pass of every stage on `video`, in a fresh job directory."""
+    shutil.rmtree(case_dir, ignore_errors=True)
+    frames_dir = os.path.join(case_dir, "frames")
+    ocr_dir = os.path.join(case_dir, "paddle_output")
+    analysis_csv = os.path.join(case_dir, "brand_analysis.csv")
+    steps = {
+        "extract_frames": lambda: extract_frames(video, frames_dir, fps=1),
+        "run_ocr_on_frames": lambda: run_ocr_on_frames(frames_dir, ocr_dir, model, ocr=ocr, save_images=False),
+        "count_brands": lambda: count_brands(ocr_dir, case_dir, keywords, threshold=BRAND_MATCH_THRESHOLD),
+        "track_brands": lambda: track_brands(ocr_dir, case_dir, keywords, threshold=BRAND_MATCH_THRESHOLD),
+        "generate_visuals": lambda: generate_visuals(analysis_csv, case_dir, profile=plot_profile),
+        "generate_enhanced_report": lambda: generate_enhanced_report(case_dir, keywords),
+    }
+    stages = {stage: timed(steps[stage]) for stage in STAGES}
+    if not os.path.isfile(os.path.join(case_dir, "brand_report_enhanced.pdf")):
+        raise RuntimeError(f"No report was generated in {case_dir}")
+
+    # Accuracy: sightings per brand (one per board per sampled frame) vs the manifest
+    counts = pd.read_csv(analysis_csv)
+    expected = expected_sightings(manifest, fps=1)
+    per_brand = {}
+    for (brand, _), text in zip(keywords.items(), manifest["texts"]):
+        found = int(counts[brand].sum()) if brand in counts else 0
+        per_brand[brand] = {"expected": expected[text], "found": found}
+    return stages, per_brand
+
+def summarize(runs):
+    """Median seconds per stage over repeated runs, the highest peak RSS, the last run's counters."""
+    return {stage: {"seconds": round(statistics.median(run[stage]["seconds"] for run in runs), 4),
+                    "runs": [round(run[stage]["seconds"], 4) for run in runs],
+                    "peak_rss_mb": max(run[stage]["peak_rss_mb"] for run in runs),
+                    "counters": runs[-1][stage]["counters"]}
+            for stage in STAGES}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def case_id(case):
+    return f"{case['seconds']}s/{case['brands']}brands"
+
+def compare(results, baseline, tolerance, min_seconds):
+    """
+    Print each stage's change against `baseline` and return the
+    regressions: stages slower by more than `tolerance` (and `min_seconds`),
+    and cases whose counts matched the ground truth before but not now.
+    """
+    previous = {case_id(case): case for case in baseline["cases"]}
+    regressions = []
+    print(f"\nAgainst baseline {baseline['meta'].get('commit')} ({baseline['meta'].get('created')}):")
+    print(f"{'case':<18}{'stage':<26}{'before':>9}{'after':>9}{'change':>9}")
+    for case in results["cases"]:
+        old = previous.get(case_id(case))
+        if old is None:
+            continue
+        for stage in STAGES:
+            if stage not in old["stages"]:
+                continue
+            before, after = old["stages"][stage]["seconds"], case["stages"][stage]["seconds"]
+            change = after / before - 1 if before else 0.0
+            slower = change > tolerance and after - before > min_seconds
+            print(f"{case_id(case):<18}{stage:<26}{before:>9.3f}{after:>9.3f}{change:>+8.0%}"
+                  + ("  ⚠️ regression" if slower else ""))
+            if slower:
+                regressions.append(f"{case_id(case)} {stage}: {before:.3f}s -> {after:.3f}s")
+        if old["exact"] and not case["exact"]:
+            regressions.append(f"{case_id(case)}: brand counts no longer match the ground truth")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", default="60,300", help="Comma-separated video lengths in seconds")
+    parser.add_argument("--brands", default="2,8,32", help="Comma-separated brand-list sizes")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case (the median is reported)")
+    parser.add_argument("--video-fps", type=int, default=10, help="Frame rate of the synthetic videos")
+    parser.add_argument("--model", default=None, help="Use real PaddleOCR with this model instead of BarcodeOCR")
+    parser.add_argument("--ocr-cost-ms", type=float, default=0, help="CPU time BarcodeOCR burns per frame")
+    parser.add_argument("--plot-profile", default="pdf", help="generate_visuals profile (see tasks/visual.py)")
+    parser.add_argument("--work-dir", default=None, help="Keep videos and outputs here (default: a temp dir)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Results file to write")
+    parser.add_argument("--baseline", default=None, help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown per stage (0.2 = 20%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    lengths = [int(x) for x in args.lengths.split(",")]
+    sizes = [int(x) for x in args.brands.split(",")]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_suite_")
+    os.makedirs(work_dir, exist_ok=True)
+    ocr_name = args.model or f"barcode-stub ({args.ocr_cost_ms:g} ms/frame)"
+
+    cases = []
+    try:
+        for seconds in lengths:
+            for size in sizes:
+                keywords, _ = brand_set(size)
+                video, manifest = broadcast(work_dir, seconds, size, args.video_fps)
+                ocr = get_ocr(args.model) if args.model else BarcodeOCR(manifest, cost_ms=args.ocr_cost_ms)
+                case_dir = os.path.join(work_dir, f"case_{seconds}s_{size}brands")
+                runs = []
+                for _ in range(args.repeat):
+                    stages, per_brand = run_case(video, manifest, keywords, case_dir, ocr, args.model or "stub",
+                                                 args.plot_profile)
+                    runs.append(stages)
+                expected = sum(b["expected"] for b in per_brand.values())
+                found = sum(min(b["found"], b["expected"]) for b in per_brand.values())
+                cases.append({
+                    "seconds": seconds,
+                    "brands": size,
+                    "frames": int(seconds),
+                    "stages": summarize(runs),
+                    "total_seconds": round(sum(statistics.median(run[s]["seconds"] for run in runs)
+                                               for s in STAGES), 4),
+                    "recall": round(found / expected, 4) if expected else 1.0,
+                    "exact": all(b["found"] == b["expected"] for b in per_brand.values()),
+                    "per_brand": per_brand,
+                })
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ocr": ocr_name,
+            "args": vars(args),
+        },
+        "stages": list(STAGES),
+        "cases": cases,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\nOCR: {ocr_name}; median of {args.repeat} run(s), seconds per stage")
+    header = "".join(f"{stage.replace('generate_', '').replace('run_ocr_on_frames', 'ocr'):>16}" for stage in STAGES)
+    print(f"{'case':<18}{header}{'total':>9}{'recall':>8}")
+    for case in cases:
+        row = "".join(f"{case['stages'][stage]['seconds']:>16.3f}" for stage in STAGES)
+        print(f"{case_id(case):<18}{row}{case['total_seconds']:>9.2f}{case['recall']:>8.1%}"
+              + ("" if case["exact"] else "  (counts differ from ground truth)"))
+    print(f"\n📄 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_seconds)
+        if regressions:
+            print("\n❌ Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+if __name__ == "__main__":
+    main()
@@ -5,5 +5,27 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-CELERY_BROKER_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-CELERY_RESULT_BACKEND = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Run tasks in-process instead of on workers (tests, local runs without Redis)
+CELERY_ALWAYS_EAGER = os.getenv("CELERY_ALWAYS_EAGER", "0") == "1"
+
+CELERY_BROKER_URL = os.getenv("REDIS_URL", "memory://" if CELERY_ALWAYS_EAGER else "redis://localhost:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("REDIS_URL", "cache+memory://" if CELERY_ALWAYS_EAGER else "redis://localhost:6379/0")
+
+# One queue per pipeline stage, so OCR can run on dedicated CPU-heavy workers
+# (-Q ocr) and rendering/email on light ones. A worker started without -Q
+# consumes all of them.
+CELERY_TASK_ROUTES = {
+    "download_video": {"queue": "download"},
+    "extract_frames": {"queue": "extract"},
+    "run_ocr": {"queue": "ocr"},
+    "ocr_chunk": {"queue": "ocr"},
+    "merge_chunks": {"queue": "merge"},
+    # Follows a broadcast for its whole length: give it its own workers
+    "live_ingest": {"queue": "live"},
+    "count_brands": {"queue": "count"},
+    "track_brands": {"queue": "track"},
+    "generate_visuals": {"queue": "visuals"},
+    "generate_report": {"queue": "report"},
+    "send_report": {"queue": "email"},
+}
+CELERY_QUEUES = ["celery"] + list(dict.fromkeys(route["queue"] for route in CELERY_TASK_ROUTES.values()))
@@ -1,22 +1,48 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
-from worker import run_pipeline_task
+from worker import celery_app, run_live_task, run_pipeline_task
+from tasks.download_and_extract_frames import DEFAULT_INGEST_PROFILE, INGEST_PROFILES, time_range
+from tasks.live import resolve_live_source
+from tasks.scheduler import (
+    FULL_GAME_PRIORITY, SchedulerUnavailable, get_scheduler, is_highlight, job_priority, request_key
+)
+from pipeline import check_shared_downloads, get_video_id
+from utils.metrics import metrics, prometheus_text
+import hashlib
 import os
 
 app = FastAPI()
 
+@app.on_event("startup")
+def check_downloads_volume():
+    # Reports and result files are read from the workers' downloads/
+    check_shared_downloads()
+
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FRONTEND_DIR = os.path.join(BASE_DIR, "../frontend")
 
 app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
 
+def etag_matches(request, etag):
+    """True if the request's If-None-Match already names `etag` (the client's copy is current)."""
+    tags = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+# The page is static: read it once at startup instead of on every request
+# (a blocking read inside the event loop). Restart to pick up edits.
+with open(os.path.join(FRONTEND_DIR, "index.html"), "r", encoding="utf-8") as f:
+    INDEX_HTML = f.read()
+INDEX_ETAG = f'"{hashlib.md5(INDEX_HTML.encode("utf-8")).hexdigest()}"'
+
 @app.get("/", response_class=HTMLResponse)
-async def home():
-    index_path = os.path.join(FRONTEND_DIR, "index.html")
-    with open(index_path, "r", encoding="utf-8") as f:
-        return HTMLResponse(f.read())
+async def home(request: Request):
+    headers = {"ETag": INDEX_ETAG, "Cache-Control": "no-cache"}
+    if etag_matches(request, INDEX_ETAG):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(INDEX_HTML, headers=headers)
 
 
 @app.post("/analyze")
@@ -27,29 +53,179 @@ async def analyze(request: Request):
     model = data.get("model")
     brands = data.get("brands")
     timestamp = data.get("timestamp")
+    # Optional: ingest profile ("full", "video", "ocr") and the part of the game to analyse
+    ingest_profile = data.get("ingestProfile")
+    start = data.get("start")
+    end = data.get("end")
 
     if not youtube_url or not email or not brands:
         return JSONResponse(status_code=400, content={"error": "Missing required fields"})
+    if ingest_profile and ingest_profile not in INGEST_PROFILES:
+        return JSONResponse(status_code=400, content={"error": f"Unknown ingest profile: {ingest_profile}"})
+    try:
+        span = time_range(start, end)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    video_id = get_video_id(youtube_url)
+    if not video_id:
+        return JSONResponse(status_code=400, content={"error": "Invalid YouTube URL — unable to extract video ID."})
+
+    key = request_key(video_id, model, brands, ingest_profile or DEFAULT_INGEST_PROFILE, span)
+    return await schedule_job(run_pipeline_task, key, email, is_highlight(span), job_priority(span),
+                              (youtube_url, brands, model, email, timestamp, ingest_profile, start, end))
+
+@app.post("/live")
+async def live(request: Request):
+    """Follow a live broadcast under LIVE_SOURCE_DIR (growing file, segment directory or .m3u8 playlist)."""
+    data = await request.json()
+    source = data.get("source")
+    email = data.get("email")
+    model = data.get("model")
+    brands = data.get("brands")
+
+    if not source or not email or not brands:
+        return JSONResponse(status_code=400, content={"error": "Missing required fields"})
+    try:
+        path = resolve_live_source(source)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    key = request_key(f"live:{path}", model, brands, "live", None)
+    return await schedule_job(run_live_task, key, email, False, FULL_GAME_PRIORITY, (path, brands, model, email))
+
+async def schedule_job(task, key, email, highlight, priority, args):
+    """
+    Admit a request and enqueue `task` for it. The same analysis already
+    queued or running is joined instead of started again; too many jobs
+    (the user's or overall) are turned away with 429. Scheduler state and
+    the broker are blocking round trips; while the scheduler's Redis is
+    unreachable or its lock busy, requests get 503 with a Retry-After.
+    """
+    try:
+        scheduler = await run_in_threadpool(get_scheduler)
+        admission = await run_in_threadpool(scheduler.admit, key, email, highlight, task_finished)
+    except SchedulerUnavailable as e:
+        print(f"❌ {e}")
+        return JSONResponse(status_code=503, headers={"Retry-After": str(e.retry_after)},
+                            content={"error": "The job scheduler is unavailable, please retry shortly.",
+                                     "retry_after": e.retry_after})
+    if admission["decision"] == "rejected":
+        retry_after = admission["retry_after"]
+        return JSONResponse(status_code=429, headers={"Retry-After": str(retry_after)},
+                            content={"error": admission["reason"], "retry_after": retry_after})
+    task_id = admission["task_id"]
+    if admission["decision"] == "joined":
+        return {"message": "Joined an identical analysis in progress.", "task_id": task_id, "deduplicated": True}
 
-    task = run_pipeline_task.delay(youtube_url, brands, model, email, timestamp)
-    return {"message": "Pipeline triggered!", "task_id": task.id}
+    try:
+        await run_in_threadpool(task.apply_async, task_id=task_id, priority=priority, args=args)
+    except Exception:
+        await run_in_threadpool(get_scheduler().release, task_id)
+        raise
+    return {"message": "Pipeline triggered!", "task_id": task_id, "deduplicated": False}
 from fastapi.responses import FileResponse
-from celery.result import AsyncResult
+from tasks.progress import JobProgress
 import os
 
-@app.get("/result/{task_id}")
-async def get_result(task_id: str):
-    task = AsyncResult(task_id)
+# Files of a finished job served next to the report
+RESULT_FILES = {
+    "brand_analysis.csv": "text/csv",
+    "brand_totals.csv": "text/csv",
+    # Per-brand exposure seconds, screen share and visibility, and the tracks behind them
+    "brand_exposure.csv": "text/csv",
+    "brand_tracks.csv": "text/csv",
+    "brand_match_log.json": "application/json",
+    # Stage timings, counters and peak memory (Chrome trace-event format)
+    "trace.json": "application/json",
+    # A live job's final brand counts
+    "live.json": "application/json",
+}
+
+def task_finished(task_id):
+    """True once the task ended, successfully or not (blocking: result backend)."""
+    return celery_app.AsyncResult(task_id).ready()
+
+def task_status(task_id):
+    """
+    (status, result) of a job: status is the processing/failed payload
+    (with progress, see tasks/progress.py) until the task finished, then
+    None and the task's result. Talks to the result backend and reads
+    progress files, so call it from the threadpool.
+    """
+    # Bound to our app explicitly: the current app is thread-local
+    task = celery_app.AsyncResult(task_id)
 
+    # Percent complete, current stage and per-stage status/timing, as
+    # published by the pipeline's stage tasks
     if not task.ready():
-        return {"status": "processing"}
+        progress = JobProgress(task_id)
+        status = {"status": "processing", **progress.snapshot()}
+        # A live job's rolling brand counts (see tasks/live.py)
+        live = progress.attachment("live")
+        if live:
+            status["live"] = live
+        return status, None
     if task.failed():
-        return {"status": "failed"}
+        return {"status": "failed", "message": str(task.result), **JobProgress(task_id).snapshot()}, None
+    return None, task.result
 
-    result = task.result
-    pdf_path = result.get("report")
+def file_response(request, path, media_type, filename):
+    """
+    A finished job's file with ETag/Last-Modified validators: 304 when the
+    client's If-None-Match is current, otherwise the file, where
+    FileResponse answers Range/If-Range requests with partial content.
+    None if the file is missing. Stats the file: call from the threadpool.
+    """
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    response = FileResponse(path, media_type=media_type, filename=filename, stat_result=stat_result,
+                            headers={"Cache-Control": "private, no-cache"})
+    etag = response.headers["etag"]
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={
+            "ETag": etag, "Last-Modified": response.headers["last-modified"],
+            "Cache-Control": response.headers["cache-control"],
+        })
+    return response
+
+@app.get("/result/{task_id}")
+async def get_result(task_id: str, request: Request):
+    status, result = await run_in_threadpool(task_status, task_id)
+    if status:
+        return status
 
-    if not pdf_path or not os.path.exists(pdf_path):
+    pdf_path = result.get("report")
+    response = pdf_path and await run_in_threadpool(
+        file_response, request, pdf_path, "application/pdf", "brand_analysis_report.pdf")
+    if not response:
         return {"status": "error", "message": "Report not found"}
 
-    return FileResponse(pdf_path, media_type="application/pdf", filename="brand_analysis_report.pdf")
+    return response
+
+@app.get("/result/{task_id}/{filename}")
+async def get_result_file(task_id: str, filename: str, request: Request):
+    """The analysis CSVs, match log and timing trace of a finished job."""
+    if filename not in RESULT_FILES:
+        return JSONResponse(status_code=404, content={"error": f"Unknown result file: {filename}"})
+    status, result = await run_in_threadpool(task_status, task_id)
+    if status:
+        return status
+
+    base_dir = os.path.dirname(result.get("report") or "")
+    response = base_dir and await run_in_threadpool(
+        file_response, request, os.path.join(base_dir, filename), RESULT_FILES[filename], filename)
+    if not response:
+        return {"status": "error", "message": f"{filename} not found"}
+
+    return response
+
+def metrics_text():
+    metrics.flush()
+    return prometheus_text()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Pipeline metrics of the API and every worker process, for Prometheus to scrape."""
+    return PlainTextResponse(await run_in_threadpool(metrics_text), media_type="text/plain; version=0.0.4")
@@ -1,21 +1,76 @@
 import os
-from datetime import datetime
+import time
+import uuid
+from contextlib import contextmanager
 from urllib.parse import urlparse, parse_qs
 
-from tasks.download_and_extract_frames import download_and_extract_frames
-from tasks.ocr import run_ocr_on_frames
+from celery_config import CELERY_ALWAYS_EAGER
+from tasks.download_and_extract_frames import (
+    DEFAULT_INGEST_PROFILE, chunk_spans, extract_frames, iter_frames, sanitize_filename, span_key, time_range
+)
+from tasks.ocr import run_ocr_on_frames, run_ocr_on_stream
+from tasks.ocr_cache import OCRCache
+from tasks.ocr_store import has_ocr_results, merge_stores, store_fingerprint
+from tasks.dedup import make_deduper
 from tasks.count import count_brands
-from tasks.visual import generate_visuals
+from tasks.live import run_live_ingest
+from tasks.tracking import TRACK_IOU_THRESHOLD, TRACK_MAX_GAP_SECONDS, track_brands
+from tasks.matching import get_matcher
+from tasks.adaptive import FIXED_FPS, SAMPLING_MODE, SAMPLING_MODES, run_adaptive_ocr
+from tasks.roi import ROI_PROFILE, cache_namespace, learn_regions, resolve_regions
+from tasks.video_cache import VideoCache, video_duration
+from tasks.sampling import video_length
+from tasks.stages import StageTracker, fingerprint
+from tasks.progress import JobProgress
+from tasks.scheduler import REDIS_URL, get_scheduler
+from tasks.visual import PLOT_JOBS, generate_visuals
 from tasks.report import generate_enhanced_report
-from utils.emailer import send_report_email
+from utils.emailer import REPORT_BASE_URL, send_report_email
+from utils.logger import log
+from utils.metrics import JobTrace, span
 
-def log(message, log_file=None):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_line = f"[{timestamp}] {message}"
-    print(log_line)
-    if log_file:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(log_line + "\n")
+# fuzz.ratio score a word needs to count as a brand mention
+BRAND_MATCH_THRESHOLD = int(os.getenv("BRAND_MATCH_THRESHOLD", "80"))
+# Plot quality profile used for the PDF (see tasks/visual.py)
+REPORT_PLOT_PROFILE = os.getenv("REPORT_PLOT_PROFILE", "pdf")
+
+# Stages hand each other relative paths under downloads/ (videos, OCR
+# stores, CSVs, plots, reports), so every worker and the API must run from
+# the same backend/ directory on one shared volume. The check below refuses
+# to start a process whose downloads/ isn't that volume (0: skip it).
+SHARED_DOWNLOADS_CHECK = os.getenv("SHARED_DOWNLOADS_CHECK", "1") == "1"
+DOWNLOADS_VOLUME_KEY = "downloads:volume"
+
+def check_shared_downloads(downloads_dir="downloads"):
+    """
+    Raise RuntimeError unless `downloads_dir` holds the volume id registered
+    in Redis by the first process to start (after replacing the volume,
+    delete the downloads:volume key). Skipped for eager runs.
+    """
+    if not SHARED_DOWNLOADS_CHECK or CELERY_ALWAYS_EAGER:
+        return
+    os.makedirs(downloads_dir, exist_ok=True)
+    marker = os.path.join(downloads_dir, ".volume")
+    try:
+        with open(marker, "x", encoding="utf-8") as f:
+            f.write(uuid.uuid4().hex)
+    except FileExistsError:
+        pass
+    with open(marker, "r", encoding="utf-8") as f:
+        volume_id = f.read().strip()
+    try:
+        import redis
+        client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+        client.set(DOWNLOADS_VOLUME_KEY, volume_id, nx=True)
+        shared_id = client.get(DOWNLOADS_VOLUME_KEY)
+    except Exception as e:
+        print(f"⚠️ Could not check that {os.path.abspath(downloads_dir)} is shared: Redis unavailable ({e})")
+        return
+    if shared_id != volume_id:
+        raise RuntimeError(
+            f"{os.path.abspath(downloads_dir)} is not the shared downloads volume (id {volume_id}, expected "
+            f"{shared_id}): mount the volume the other workers and the API use, or run from its backend/ directory")
+    print(f"📂 Shared downloads volume {volume_id} at {os.path.abspath(downloads_dir)}")
 
 def get_video_id(youtube_url):
     query = parse_qs(urlparse(youtube_url).query)
@@ -32,67 +87,465 @@ brand_keywords = {
     "Kia": ["kia", "kv"]
 }
 
-def run_full_pipeline(youtube_url, brands, model, email, timestamp=None):
+def prepare_job(youtube_url, brands, model, email, ingest_profile=DEFAULT_INGEST_PROFILE, start=None, end=None,
+                stream=True, job_id=None):
+    """
+    Resolve a request into a job: a JSON-serialisable dict of everything the
+    pipeline stages need (video, selected brands, span, output paths), so it
+    can be handed to Celery subtasks as is. `stream` decodes frames straight
+    into OCR instead of extracting JPEGs first; `job_id` (the Celery task
+    id) is what the job's progress is published under.
+    """
+    # === Extract video ID ===
+    video_id = get_video_id(youtube_url)
+    if not video_id:
+        raise ValueError("Invalid YouTube URL — unable to extract video ID.")
+
+    # Optional part of the broadcast to analyse (seconds or [HH:]MM:SS)
+    span = time_range(start, end)
+
+    # === Define base directory for caching ===
+    job_name = video_id if span is None else f"{video_id}_{span_key(span)}"
+    base_dir = os.path.join("downloads", model, job_name)
+    os.makedirs(base_dir, exist_ok=True)
+
+    # === Prepare brand keywords ===
+    selected_brand_keywords = select_brands(brands)
+
+    return {
+        "job_id": job_id,
+        "youtube_url": youtube_url,
+        "video_id": video_id,
+        "model": model,
+        "email": email,
+        "brands": selected_brand_keywords,
+        "ingest_profile": ingest_profile,
+        "span": list(span) if span else None,
+        "stream": stream,
+        "base_dir": base_dir,
+        "log_file": os.path.join(base_dir, "pipeline.log"),
+        "trace_file": os.path.join(base_dir, "trace.json"),
+        "ocr_output_dir": os.path.join(base_dir, "paddle_output"),
+        "frames_dir": os.path.join(base_dir, "frames"),
+    }
+
+def select_brands(brands):
+    """The keyword variants of the requested brands that we know."""
+    return {brand: brand_keywords[brand] for brand in brands if brand in brand_keywords}
+
+def prepare_live_job(source, brands, model, email, job_id=None):
+    """
+    A job following a live source (a growing file, segment directory or
+    playlist, see tasks/live.py) instead of downloading a video: the same
+    fields as prepare_job plus "live_source". Each run starts its OCR store
+    afresh.
+    """
+    source = os.path.normpath(source)
+    name = os.path.splitext(os.path.basename(source))[0]
+    if source.lower().endswith(".m3u8"):
+        name = f"{os.path.basename(os.path.dirname(source))}_{name}"  # e.g. game1/index.m3u8
+    name = "live_" + sanitize_filename(name)
+    base_dir = os.path.join("downloads", model, name)
+    os.makedirs(base_dir, exist_ok=True)
+    return {
+        "job_id": job_id,
+        "youtube_url": None,
+        "video_id": name,
+        "live_source": source,
+        "model": model,
+        "email": email,
+        "brands": select_brands(brands),
+        "ingest_profile": None,
+        "span": None,
+        "stream": True,
+        "base_dir": base_dir,
+        "log_file": os.path.join(base_dir, "pipeline.log"),
+        "trace_file": os.path.join(base_dir, "trace.json"),
+        "ocr_output_dir": os.path.join(base_dir, "paddle_output"),
+        "frames_dir": os.path.join(base_dir, "frames"),
+    }
+
+
+def job_span(job):
+    return tuple(job["span"]) if job["span"] else None
+
+@contextmanager
+def job_stage(job, stage, part=None):
+    """Run one stage of a job with progress, metrics and logging; yields the job's JobProgress."""
+    progress = JobProgress(job.get("job_id"))
+    label = stage if part is None else f"{stage} {part}"
+    labels = {} if part is None else {"part": part}
+    start = time.perf_counter()
     try:
-        # === Extract video ID ===
-        video_id = get_video_id(youtube_url)
-        if not video_id:
-            raise ValueError("Invalid YouTube URL — unable to extract video ID.")
+        with span(stage, trace_file=job.get("trace_file"), **labels), progress.track(stage, part=part):
+            yield progress
+    except Exception as e:
+        log(f"❌ Stage {label} failed: {e}", job["log_file"])
+        raise
+    log(f"⏱️ Stage {label} took {time.perf_counter() - start:.1f}s", job["log_file"])
 
-        # === Define base directory for caching ===
-        base_dir = os.path.join("downloads", model, video_id)
-        os.makedirs(base_dir, exist_ok=True)
-        log_file = os.path.join(base_dir, "pipeline.log")
+def plan_stages(job, chunks=1):
+    """The stages a job runs, in order, recorded for its progress (its trace starts afresh)."""
+    if job.get("live_source"):
+        stages = ["live"]
+    elif has_ocr_results(job["ocr_output_dir"]):
+        stages = []
+    elif chunks > 1:
+        stages = ["download", "ocr", "merge"]
+    else:
+        stages = ["download"] + ([] if job["stream"] else ["extract"]) + ["ocr"]
+    stages += ["count", "track", "visuals", "report", "email"]
+    JobProgress(job.get("job_id")).plan(stages, parts={"download": chunks, "ocr": chunks} if chunks > 1 else None)
+    JobTrace(job.get("trace_file")).reset()
+    return stages
 
-        log("[0/6] Task received. Checking cache...", log_file)
+def ocr_video(video_path, ocr_output_dir, frames_dir, model, regions=None, start_offset=0, log_file=None,
+              chunk_tail=False, progress=None):
+    """
+    Stream a downloaded video (or a part of the broadcast starting at
+    `start_offset`) into OCR with the configured sampling mode.
+    Only frames with detected text are written to disk (for the report).
+    `chunk_tail` marks a chunk followed by another one (see run_adaptive_ocr).
+    `progress(done, total=None)` is called as frames complete.
+    Returns the OCR statistics.
+    """
+    if SAMPLING_MODE not in SAMPLING_MODES:
+        raise ValueError(f"Unknown FRAME_SAMPLING_MODE {SAMPLING_MODE!r}, expected one of {SAMPLING_MODES}")
+    ocr_kwargs = dict(
+        frames_dir=frames_dir,
+        save_frames="text",
+        cache=OCRCache(cache_namespace(model, regions)),
+        deduper=make_deduper(),
+        regions=regions,
+        progress=progress
+    )
+    if SAMPLING_MODE == "adaptive":
+        # Coarse pass, then dense sampling around brand text and scene cuts
+        ocr_stats = run_adaptive_ocr(video_path, ocr_output_dir, model,
+                                     get_matcher(brand_keywords, BRAND_MATCH_THRESHOLD),
+                                     start_offset=start_offset, refine_tail=chunk_tail, **ocr_kwargs)
+        log(f"🔎 Adaptive sampling: {ocr_stats['coarse_frames']} coarse + {ocr_stats['dense_frames']} dense "
+            f"frames ({ocr_stats['dense_windows']} window(s), {ocr_stats['dense_seconds']}s)", log_file)
+    else:
+        if progress:
+            length = video_length(video_path)
+            progress(0, int(length * FIXED_FPS) + 1 if length else None)
+        ocr_stats = run_ocr_on_stream(iter_frames(video_path, fps=FIXED_FPS, start_offset=start_offset),
+                                      ocr_output_dir, model=model, **ocr_kwargs)
+    return ocr_stats
 
-        # === Prepare brand keywords ===
-        selected_brand_keywords = {
-            brand: brand_keywords[brand]
-            for brand in brands
-            if brand in brand_keywords
-        }
+def log_ocr_stats(ocr_stats, log_file=None):
+    log(f"🗃️ OCR cache: {ocr_stats['cache_hits']} hits, {ocr_stats['cache_misses']} misses "
+        f"({ocr_stats['cache_hit_rate']:.0%} hit rate)", log_file)
+    if "dedup_checked" in ocr_stats:
+        log(f"🪞 Dedup saved {ocr_stats['dedup_skipped']} of {ocr_stats['dedup_checked']} OCR calls "
+            f"(threshold {ocr_stats['dedup_threshold']})", log_file)
 
-        # === OCR output check ===
-        ocr_output_dir = os.path.join(base_dir, "paddle_output")
-        merged_texts_path = os.path.join(ocr_output_dir, "merged_texts.txt")
-        frames_dir = os.path.join(base_dir, "frames")
-
-        if not os.path.exists(merged_texts_path):
-            # === 1. Download & extract frames ===
-            log(f"[1/6] Downloading and extracting frames from URL: {youtube_url}", log_file)
-            download_and_extract_frames(youtube_url, fps=1, output_dir=frames_dir)
-
-            # === 2. Run OCR ===
-            log("[2/6] Running OCR on frames...", log_file)
-            run_ocr_on_frames(frames_dir, ocr_output_dir, model=model)
-        else:
-            log("🔁 Cached OCR results found. Skipping download and OCR.", log_file)
+def learn_auto_regions(ocr_output_dir, regions):
+    if ROI_PROFILE == "auto" and not regions:
+        # Full-frame job: learn where brand text lands for later jobs
+        learn_regions([ocr_output_dir], matcher=get_matcher(brand_keywords, BRAND_MATCH_THRESHOLD))
+
+def download_stage(job):
+    """
+    [1/6] Download the job's video (or its span) into the shared cache; adds
+    "video_path", and "video_pin": the video stays pinned in the cache until
+    the OCR stage (possibly another task) releases it.
+    """
+    with job_stage(job, "download"):
+        log(f"[1/6] Downloading video from URL: {job['youtube_url']}", job["log_file"])
+        holder = job.get("job_id") or uuid.uuid4().hex
+        video_path = VideoCache().get(job["youtube_url"], job["video_id"], profile=job["ingest_profile"],
+                                      span=job_span(job), pin=holder)
+    key = VideoCache.key(job["video_id"], job["ingest_profile"], job_span(job))
+    return dict(job, video_path=video_path, video_pin=[key, holder])
+
+def release_video(job):
+    """Unpin the job's cached video (see download_stage) once OCR is done with it."""
+    if job.get("video_pin"):
+        VideoCache().unpin(*job["video_pin"])
 
-        # === 3. Count selected brand keywords ===
+def extract_stage(job):
+    """Write the sampled frames of the downloaded video to the job's frames directory (non-streaming jobs)."""
+    with job_stage(job, "extract"):
+        log("[1/6] Extracting frames...", job["log_file"])
+        start_offset = job["span"][0] if job["span"] else 0
+        extract_frames(job["video_path"], job["frames_dir"], fps=FIXED_FPS, start_offset=start_offset)
+    return job
+
+def ocr_stage(job):
+    """
+    [2/6] OCR the downloaded video (streamed) or the extracted frames into the
+    job's OCR store, then unpin the video in the cache.
+    """
+    log_file, model = job["log_file"], job["model"]
+    try:
+        with job_stage(job, "ocr") as progress:
+            # Regions of interest to OCR (None: whole frame), see tasks/roi.py
+            regions = resolve_regions(ROI_PROFILE)
+            if regions:
+                log(f"🎯 OCR limited to {len(regions)} region(s) ({ROI_PROFILE} profile)", log_file)
+
+            if job["stream"]:
+                # === Stream decoded frames straight into OCR ===
+                log(f"[2/6] Streaming frames into OCR ({SAMPLING_MODE} sampling)...", log_file)
+                ocr_stats = ocr_video(job["video_path"], job["ocr_output_dir"], job["frames_dir"], model,
+                                      regions=regions, start_offset=job["span"][0] if job["span"] else 0,
+                                      log_file=log_file, progress=progress.reporter("ocr"))
+            else:
+                log("[2/6] Running OCR on frames...", log_file)
+                ocr_stats = run_ocr_on_frames(job["frames_dir"], job["ocr_output_dir"], model=model,
+                                              cache=OCRCache(cache_namespace(model, regions)),
+                                              deduper=make_deduper(), fps=FIXED_FPS, regions=regions,
+                                              progress=progress.reporter("ocr"))
+            learn_auto_regions(job["ocr_output_dir"], regions)
+            log_ocr_stats(ocr_stats, log_file)
+    finally:
+        release_video(job)
+    return job
+
+def live_partial_report(job):
+    """
+    Rebuild a live job's report from its frames so far (checkpointed in the
+    OCR store). Outside the stage caches: the final stages redo it all.
+    A failure is logged and ingest carries on.
+    """
+    base_dir, log_file = job["base_dir"], job["log_file"]
+    try:
+        count_brands(job["ocr_output_dir"], base_dir, job["brands"], threshold=BRAND_MATCH_THRESHOLD,
+                     matcher=get_matcher(brand_keywords, BRAND_MATCH_THRESHOLD))
+        track_brands(job["ocr_output_dir"], base_dir, job["brands"], threshold=BRAND_MATCH_THRESHOLD,
+                     matcher=get_matcher(brand_keywords, BRAND_MATCH_THRESHOLD))
+        generate_visuals(os.path.join(base_dir, "brand_analysis.csv"), base_dir=base_dir, profile=REPORT_PLOT_PROFILE)
+        generate_enhanced_report(base_dir, job["brands"])
+        log("📝 Partial report updated.", log_file)
+    except Exception as e:
+        log(f"⚠️ Partial report failed: {e}", log_file)
+
+def live_stage(job):
+    """
+    [1-2/6] Follow the job's live source until it ends, OCR'ing frames as
+    they arrive and counting brands as they go: live.json holds the running
+    counts, and the report is rebuilt every LIVE_REPORT_SECONDS.
+    """
+    log_file, model = job["log_file"], job["model"]
+    with job_stage(job, "live") as progress:
+        regions = resolve_regions(ROI_PROFILE)
+        if regions:
+            log(f"🎯 OCR limited to {len(regions)} region(s) ({ROI_PROFILE} profile)", log_file)
+        log(f"[1/6] Following live source {os.path.basename(job['live_source'])} (OCR as frames arrive)...",
+            log_file)
+        ocr_stats = run_live_ingest(
+            job["live_source"], job["ocr_output_dir"], job["base_dir"], job["brands"],
+            get_matcher(brand_keywords, BRAND_MATCH_THRESHOLD), model, fps=FIXED_FPS,
+            partial_report=lambda: live_partial_report(job),
+            publish=lambda snapshot: progress.attach("live", snapshot),
+            frames_dir=job["frames_dir"],
+            save_frames="text",
+            cache=OCRCache(cache_namespace(model, regions)),
+            deduper=make_deduper(),
+            regions=regions,
+            progress=progress.reporter("live")
+        )
+        log_ocr_stats(ocr_stats, log_file)
+        latency = ocr_stats["snapshot"]["latency_seconds"]
+        if latency:
+            log(f"📡 Live ingest ended after {ocr_stats['snapshot']['video_seconds']:.0f}s of video; "
+                f"arrival to counted p50 {latency['p50']:.1f}s, p95 {latency['p95']:.1f}s", log_file)
+    return job
+
+def plan_chunks(job, chunk_seconds):
+    """
+    Consecutive (start, end) spans of at most `chunk_seconds` covering the
+    job's span (or the whole video). A single span when the video's length
+    can't be determined.
+    """
+    span = job["span"] or [0.0, None]
+    end = span[1] if span[1] is not None else video_duration(job["youtube_url"], job["video_id"])
+    if not end:
+        return [span]
+    chunks = [list(chunk) for chunk in chunk_spans(span[0], end, chunk_seconds)]
+    if span[1] is None:
+        chunks[-1][1] = None  # probed lengths are rounded: let the last chunk run to the end
+    return chunks
+
+def chunk_output_dir(job, chunk):
+    return os.path.join(job["base_dir"], "chunks", span_key(chunk), "paddle_output")
+
+def ocr_chunk(job, chunk):
+    """
+    Download one time span of the job's video and OCR it into its own store
+    (frames keep their broadcast timestamps and ids). A chunk that already
+    has results, e.g. from a failed earlier attempt, is not redone.
+    Returns {"span", "ocr_output_dir", "frames"}.
+    """
+    log_file, key = job["log_file"], span_key(chunk)
+    ocr_output_dir = chunk_output_dir(job, chunk)
+    if has_ocr_results(ocr_output_dir):
+        log(f"🔁 Chunk {key}: cached OCR results found.", log_file)
+        progress = JobProgress(job.get("job_id"))
+        for stage in ("download", "ocr"):
+            progress.finish(stage, part=key)
+        return {"span": chunk, "ocr_output_dir": ocr_output_dir, "frames": None}
+
+    log(f"🧩 Chunk {key}: downloading and running OCR...", log_file)
+    cache, holder = VideoCache(), f"{job.get('job_id') or uuid.uuid4().hex}.{key}"
+    with job_stage(job, "download", part=key):
+        video_path = cache.get(job["youtube_url"], job["video_id"], profile=job["ingest_profile"],
+                               span=tuple(chunk), pin=holder)
+    last = chunk[1] is None or (job["span"] is not None and chunk[1] == job["span"][1])
+    try:
+        with job_stage(job, "ocr", part=key) as progress:
+            ocr_stats = ocr_video(video_path, ocr_output_dir, job["frames_dir"], job["model"],
+                                  regions=resolve_regions(ROI_PROFILE), start_offset=chunk[0], log_file=log_file,
+                                  chunk_tail=not last, progress=progress.reporter("ocr", part=key))
+    finally:
+        cache.unpin(VideoCache.key(job["video_id"], job["ingest_profile"], tuple(chunk)), holder)
+    log_ocr_stats(ocr_stats, log_file)
+    return {"span": chunk, "ocr_output_dir": ocr_output_dir, "frames": ocr_stats["frames"]}
+
+def merge_chunks(job, chunk_results):
+    """
+    Reduce step of a chunked job: merge the chunks' OCR stores in time order
+    into the job's store, ready for counting.
+    """
+    with job_stage(job, "merge"):
+        chunk_results = sorted(chunk_results, key=lambda r: r["span"][0])
+        frames = merge_stores([r["ocr_output_dir"] for r in chunk_results], job["ocr_output_dir"])
+        log(f"🧩 Merged {len(chunk_results)} chunk(s) into one OCR store ({frames} frames)", job["log_file"])
+        learn_auto_regions(job["ocr_output_dir"], resolve_regions(ROI_PROFILE))
+    return job
+
+# Stages 3-5 only re-run when their inputs (OCR store, brand set,
+# threshold, tracking settings, plot profile) changed since the last job on this video;
+# each stage passes its input key on to the next in the job.
+
+def count_stage(job):
+    """[3/6] Count the selected brand keywords in the OCR store; adds "count_key"."""
+    base_dir, log_file = job["base_dir"], job["log_file"]
+    selected_brand_keywords = job["brands"]
+    with job_stage(job, "count"):
         log("[3/6] Counting brand keywords...", log_file)
-        count_brands(
-            merged_texts_path=merged_texts_path,
+        count_key = fingerprint("count", store_fingerprint(job["ocr_output_dir"]),
+                                list(selected_brand_keywords.items()), BRAND_MATCH_THRESHOLD)
+        StageTracker(base_dir).run("count", count_key, [
+            os.path.join(base_dir, "brand_analysis.csv"),
+            os.path.join(base_dir, "brand_totals.csv"),
+        ], lambda: count_brands(
+            ocr_output_dir=job["ocr_output_dir"],
             base_output_dir=base_dir,
-            brand_keywords=selected_brand_keywords
-        )
+            brand_keywords=selected_brand_keywords,
+            threshold=BRAND_MATCH_THRESHOLD,
+            # Compiled once per worker for the full dictionary, so its token
+            # cache is shared by every brand selection.
+            matcher=get_matcher(brand_keywords, BRAND_MATCH_THRESHOLD)
+        ), log=lambda message: log(message, log_file))
+    return dict(job, count_key=count_key)
+
+def track_stage(job):
+    """[3/6] Link brand detections into on-screen tracks and measure exposure; adds "track_key"."""
+    base_dir, log_file = job["base_dir"], job["log_file"]
+    with job_stage(job, "track"):
+        log("[3/6] Tracking on-screen brand exposure...", log_file)
+        track_key = fingerprint("track", store_fingerprint(job["ocr_output_dir"]), list(job["brands"].items()),
+                                BRAND_MATCH_THRESHOLD, TRACK_IOU_THRESHOLD, TRACK_MAX_GAP_SECONDS)
+        StageTracker(base_dir).run("track", track_key, [
+            os.path.join(base_dir, "brand_exposure.csv"),
+            os.path.join(base_dir, "brand_tracks.csv"),
+        ], lambda: track_brands(
+            ocr_output_dir=job["ocr_output_dir"],
+            base_output_dir=base_dir,
+            brand_keywords=job["brands"],
+            threshold=BRAND_MATCH_THRESHOLD,
+            matcher=get_matcher(brand_keywords, BRAND_MATCH_THRESHOLD)
+        ), log=lambda message: log(message, log_file))
+    return dict(job, track_key=track_key)
 
-        # === 4. Generate visualizations ===
+def visuals_stage(job):
+    """[4/6] Plot the brand analysis; adds "visuals_key"."""
+    base_dir, log_file = job["base_dir"], job["log_file"]
+    plots_dir = os.path.join(base_dir, "plots")
+    with job_stage(job, "visuals"):
         log("[4/6] Generating visualizations...", log_file)
-        analysis_csv = os.path.join(base_dir, "brand_analysis.csv")
-        generate_visuals(analysis_csv, base_dir=base_dir)
+        visuals_key = fingerprint("visuals", job["count_key"], REPORT_PLOT_PROFILE)
+        StageTracker(base_dir).run("visuals", visuals_key, lambda: [
+            path for path in (os.path.join(plots_dir, filename) for filename, _ in PLOT_JOBS)
+            if os.path.exists(path)
+        ], lambda: generate_visuals(os.path.join(base_dir, "brand_analysis.csv"), base_dir=base_dir,
+                                    profile=REPORT_PLOT_PROFILE), log=lambda message: log(message, log_file))
+    return dict(job, visuals_key=visuals_key)
 
-        # === 5. Generate PDF report ===
+def report_stage(job):
+    """[5/6] Build the PDF report; adds "report"."""
+    base_dir, log_file = job["base_dir"], job["log_file"]
+    pdf_path = os.path.join(base_dir, "brand_report_enhanced.pdf")
+
+    def build_report():
+        # The report swallows its own errors; don't leave a stale PDF to be mailed.
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+        generate_enhanced_report(base_dir, job["brands"])
+
+    with job_stage(job, "report"):
         log("[5/6] Generating PDF report...", log_file)
-        generate_enhanced_report(base_dir, selected_brand_keywords)
-        pdf_path = os.path.join(base_dir, "brand_report_enhanced.pdf")
+        report_key = fingerprint("report", job["visuals_key"], job["track_key"])
+        StageTracker(base_dir).run("report", report_key, [pdf_path], build_report,
+                                   log=lambda message: log(message, log_file))
+    return dict(job, report=pdf_path)
+
+def report_link(job):
+    """Where the API serves the job's report, for reports too large to attach (None without a job id)."""
+    return f"{REPORT_BASE_URL}/result/{job['job_id']}" if job.get("job_id") else None
+
+def email_stage(job, raise_transient=False):
+    """
+    [6/6] Email the report; returns the job's final result. A failed
+    delivery doesn't fail the job (the report stays downloadable), unless
+    `raise_transient` asks for errors worth retrying to be raised. Everyone
+    whose identical request the scheduler folded into this job gets a copy.
+    """
+    with job_stage(job, "email"):
+        log("[6/6] Sending report via email...", job["log_file"])
+        # Closes the job to new subscribers; the same list on a retry
+        subscribers = get_scheduler().release(job["job_id"]) if job["job_id"] else []
+        bcc = [email for email in subscribers if email != job["email"]]
+        emailed = send_report_email(job["email"], job["report"], subject="Your NBA Brand Visibility Report",
+                                    link=report_link(job), raise_transient=raise_transient, bcc=bcc)
+    if not emailed:
+        log("📭 Report could not be emailed; it is still available from /result.", job["log_file"])
 
-        # === 6. Email report ===
-        log("[6/6] Sending report via email...", log_file)
-        send_report_email(email, pdf_path, subject="Your NBA Brand Visibility Report")
+    log("✅ Pipeline completed successfully.", job["log_file"])
+    return {"status": "success", "report": job["report"], "emailed": emailed}
+
+def finish_pipeline(job):
+    """Stages 3-6 on the job's OCR store: count, track, plot, report and email."""
+    return email_stage(report_stage(visuals_stage(track_stage(count_stage(job)))))
+
+def run_full_pipeline(youtube_url, brands, model, email, timestamp=None, stream=True,
+                      ingest_profile=DEFAULT_INGEST_PROFILE, start=None, end=None, job_id=None):
+    """All stages of a job in this process (the Celery path chains them as separate tasks)."""
+    try:
+        job = prepare_job(youtube_url, brands, model, email, ingest_profile, start, end,
+                          stream=stream, job_id=job_id)
+        log_file = job["log_file"]
+
+        log("[0/6] Task received. Checking cache...", log_file)
+        stages = plan_stages(job)
+
+        # === OCR output check ===
+        if "ocr" in stages:
+            job = download_stage(job)
+            try:
+                if "extract" in stages:
+                    job = extract_stage(job)
+                job = ocr_stage(job)
+            finally:
+                # ocr_stage unpins on its own, but not if extraction fails
+                release_video(job)
+        else:
+            log("🔁 Cached OCR results found. Skipping download and OCR.", log_file)
 
-        log("✅ Pipeline completed successfully.", log_file)
-        return {"status": "success", "report": pdf_path}
+        return finish_pipeline(job)
 
     except Exception as e:
         log(f"❌ Pipeline failed: {e}", log_file if 'log_file' in locals() else None)
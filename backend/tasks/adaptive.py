@@ -0,0 +1,141 @@
+import os
+import shutil
+
+import numpy as np
+
+from tasks.dedup import difference_hash
+from tasks.ocr import run_ocr_on_stream
+from tasks.ocr_store import OCRStore
+from tasks.sampling import DEFAULT_BACKEND, grid_index, sample_frames, sample_windows, video_fps, video_length
+
+# "fixed":    one frame per second for the whole video (the original behaviour)
+# "adaptive": a coarse pass, then dense sampling around brand text and scene cuts
+SAMPLING_MODES = ("fixed", "adaptive")
+# Adaptive OCRs fewer frames but changes brand_analysis.csv's rows and the
+# totals' weights, so it is opt-in
+SAMPLING_MODE = os.getenv("FRAME_SAMPLING_MODE", "fixed")
+FIXED_FPS = 1
+
+ADAPTIVE_COARSE_SECONDS = float(os.getenv("ADAPTIVE_COARSE_SECONDS", "4"))
+ADAPTIVE_DENSE_FPS = float(os.getenv("ADAPTIVE_DENSE_FPS", "2"))
+# Consecutive coarse frames less similar than this (dHash) bracket a scene cut
+SCENE_CUT_SIMILARITY = float(os.getenv("ADAPTIVE_CUT_SIMILARITY", "0.6"))
+
+def brand_activity(ocr_output_dir, matcher):
+    """
+    Time-ordered (timestamp, brands) for the frames of an OCR store, where
+    brands is the frozenset of brand indices `matcher` finds in its tokens.
+    """
+    store = OCRStore(ocr_output_dir)
+    timestamps = store.timestamps()
+    activity = []
+    for frame, lines in store.frame_texts().items():
+        tokens = [word for line in lines for word in line.lower().split()]
+        hits = matcher.lookup(tokens) if tokens else []
+        activity.append((timestamps[frame], frozenset(b for token_hits in hits for b, _, _ in token_hits)))
+    return activity
+
+def activity_changes(activity):
+    """
+    (previous, current) timestamps of consecutive frames whose visible
+    brands differ: a burst starts, ends or switches brand somewhere between
+    them. Runs of frames showing the same brands need no extra detail.
+    """
+    return [(t0, t1) for (t0, b0), (t1, b1) in zip(activity, activity[1:]) if b0 != b1]
+
+def scene_cuts(hashes, threshold=SCENE_CUT_SIMILARITY):
+    """
+    (previous, current) timestamps of consecutive frames whose perceptual
+    hashes differ enough that a cut happened somewhere between them.
+    `hashes` is a time-ordered list of (timestamp, difference_hash).
+    """
+    cuts = []
+    for (t0, h0), (t1, h1) in zip(hashes, hashes[1:]):
+        if np.count_nonzero(h0 == h1) / h0.size < threshold:
+            cuts.append((t0, t1))
+    return cuts
+
+def dense_windows(spans, duration=None):
+    """Sorted, merged (start, end) windows, clipped to [0, duration]."""
+    merged = []
+    for start, end in sorted(spans):
+        start = max(start, 0.0)
+        if duration is not None:
+            end = min(end, duration)
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def run_adaptive_ocr(video_path, output_dir, model, matcher, start_offset=0,
+                     coarse_seconds=ADAPTIVE_COARSE_SECONDS, dense_fps=ADAPTIVE_DENSE_FPS,
+                     cut_similarity=SCENE_CUT_SIMILARITY, backend=DEFAULT_BACKEND, refine_tail=False,
+                     progress=None, **ocr_kwargs):
+    """
+    Sample and OCR a video adaptively: one frame every `coarse_seconds`,
+    then `dense_fps` between consecutive coarse frames where the brand-like
+    tokens `matcher` (a BrandMatcher) finds change, i.e. around the edges of
+    ad bursts, and between coarse frames that bracket a scene cut. Both
+    passes land in one OCR store with real timestamps (shifted by
+    `start_offset`) and frame ids on the `dense_fps` grid. `refine_tail`
+    also densifies the gap after the last coarse frame, for a chunk of a
+    longer video whose next coarse frame is in the following chunk.
+    `progress(done, total=None)` is called as frames complete; the total
+    grows by the dense pass's estimate once its windows are known.
+    `ocr_kwargs` go to run_ocr_on_stream. Returns its statistics for both
+    passes combined.
+    """
+    report = progress or (lambda done, total=None: None)
+    length = video_length(video_path)
+    report(0, int(length / coarse_seconds) + 1 if length else None)
+    source_fps = video_fps(video_path)
+    hashes = []
+
+    def coarse_frames():
+        for _, timestamp, frame in sample_frames(video_path, fps=1 / coarse_seconds, backend=backend):
+            hashes.append((timestamp, difference_hash(frame)))
+            yield (grid_index(timestamp + start_offset, source_fps, dense_fps),
+                   round(timestamp + start_offset, 3), frame)
+
+    # Build the store next to the final one so a crash between passes never
+    # leaves a coarse-only store that looks complete.
+    staging = os.path.normpath(output_dir) + ".partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    coarse = run_ocr_on_stream(coarse_frames(), staging, model, progress=report, **ocr_kwargs)
+
+    activity = [(t - start_offset, brands) for t, brands in brand_activity(staging, matcher)]
+    changes = activity_changes(activity)
+    cuts = scene_cuts(hashes, cut_similarity)
+    duration = hashes[-1][0] + coarse_seconds if hashes else 0.0
+    tail = [(hashes[-1][0], duration)] if refine_tail and hashes else []
+    windows = dense_windows(changes + cuts + tail, duration)
+    print(f"🔎 Coarse pass: {coarse['frames']} frames, {sum(1 for _, b in activity if b)} with brand-like text, "
+          f"{len(changes)} activity change(s), {len(cuts)} scene cut(s) -> {len(windows)} dense window(s)")
+
+    stats = dict(coarse)
+    dense_frames = 0
+    if windows:
+        skip = {grid_index(t, source_fps, dense_fps) for t, _ in hashes}
+        report(coarse["frames"], coarse["frames"] + sum(int((end - start) * dense_fps) + 1 for start, end in windows))
+        dense = run_ocr_on_stream(
+            ((grid_index(timestamp + start_offset, source_fps, dense_fps), round(timestamp + start_offset, 3), frame)
+             for _, timestamp, frame in sample_windows(video_path, windows, dense_fps, skip=skip)),
+            staging, model, append=True, progress=lambda done: report(coarse["frames"] + done), **ocr_kwargs)
+        dense_frames = dense["frames"]
+        stats.update(dense)
+        for key in ("frames", "ocr_calls", "frames_saved"):
+            stats[key] = coarse.get(key, 0) + dense.get(key, 0)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(staging, output_dir)
+
+    stats.update({
+        "coarse_frames": coarse["frames"],
+        "dense_frames": dense_frames,
+        "dense_windows": len(windows),
+        "dense_seconds": round(sum(end - start for start, end in windows), 3),
+    })
+    return stats
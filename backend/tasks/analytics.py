@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+# Columns of brand_analysis.csv (and the derived frame) that are not brands
+NON_BRAND_COLUMNS = ("Frame", "FrameIndex", "TimeSeconds", "SampleSeconds")
+# Width of the heatmap's time windows, in seconds
+HEATMAP_WINDOW = 30
+# Minimum spacing between two peaks of the same brand, in seconds
+PEAK_DISTANCE_SECONDS = 5
+
+def sample_durations(timestamps):
+    """
+    Seconds of video each sample stands for: half the gap to each neighbour
+    (the full gap at either end). Evenly spaced frames all get the spacing,
+    which is a whole number of source frames (at 1 FPS from a 29.97 fps
+    video, 29 frames: ~0.968s); adaptively sampled frames are weighted by
+    how sparse the sampling was around them.
+    """
+    t = np.asarray(timestamps, dtype=np.float64)
+    if t.size < 2:
+        return np.ones(t.size)
+    gaps = np.diff(t)
+    return (np.concatenate(([gaps[0]], gaps)) + np.concatenate((gaps, [gaps[-1]]))) / 2
+
+def load_analysis(analysis_csv):
+    """
+    Read brand_analysis.csv, adding FrameIndex, SampleSeconds (see
+    sample_durations) and, for older CSVs, TimeSeconds.
+    """
+    df = pd.read_csv(analysis_csv)
+    df["FrameIndex"] = df.index
+    if "TimeSeconds" not in df.columns:
+        df["TimeSeconds"] = df["FrameIndex"]  # CSVs written before timestamps were stored: 1 FPS
+    df["SampleSeconds"] = sample_durations(df["TimeSeconds"])
+    return df
+
+def brand_columns(df):
+    return [col for col in df.columns if col not in NON_BRAND_COLUMNS]
+
+def _weighted(df, brands):
+    """Brand columns scaled by each sample's duration (detection-seconds)."""
+    return df[brands].mul(df["SampleSeconds"], axis=0)
+
+def windowed_sums(df, brands, window=HEATMAP_WINDOW):
+    """
+    Time-weighted detections per brand summed over fixed time windows, one
+    row per non-empty window labelled "<start>-<end>s".
+    """
+    bins = (df["TimeSeconds"].to_numpy() // window).astype(np.int64)
+    sums = _weighted(df, brands).groupby(bins, sort=True).sum()
+    sums.index = [f"{b * window}-{(b + 1) * window}s" for b in sums.index]
+    return sums
+
+def co_occurrence(df, brands):
+    """
+    Frames where more than one brand is visible: a DataFrame of time, count
+    (number of brands present) and brands (comma-joined, in brand order).
+    """
+    active = df[brands].to_numpy() > 0
+    counts = active.sum(axis=1)
+    mask = counts > 1
+    if not mask.any():
+        return pd.DataFrame(columns=["time", "brands", "count"])
+
+    # Label each distinct brand combination once instead of once per frame.
+    combos, inverse = np.unique(active[mask], axis=0, return_inverse=True)
+    labels = np.array([", ".join(b for b, on in zip(brands, combo) if on) for combo in combos], dtype=object)
+    return pd.DataFrame({
+        "time": df["TimeSeconds"].to_numpy()[mask],
+        "brands": labels[inverse.ravel()],
+        "count": counts[mask],
+    })
+
+def detection_frames(df, brands):
+    """Number of frames in which each brand was detected."""
+    return pd.Series((df[brands].to_numpy() > 0).sum(axis=0), index=brands)
+
+def detection_seconds(df, brands):
+    """Seconds of video in which each brand was detected."""
+    seconds = df["SampleSeconds"].to_numpy()
+    return pd.Series(seconds @ (df[brands].to_numpy() > 0), index=brands)
+
+def detection_rates(df, brands):
+    """Percentage of the analysed time in which each brand was detected."""
+    if df.empty:
+        return pd.Series(0.0, index=brands)
+    return detection_seconds(df, brands) / df["SampleSeconds"].sum() * 100
+
+def peaks(df, brands, height=0.5, distance_seconds=PEAK_DISTANCE_SECONDS):
+    """Row positions of local detection maxima for each brand that was ever detected."""
+    # find_peaks spaces peaks in rows; convert using the typical sampling interval
+    interval = float(np.median(df["SampleSeconds"])) if len(df) else 1.0
+    distance = max(int(round(distance_seconds / interval)), 1) if interval > 0 else 1
+    out = {}
+    for brand in brands:
+        values = df[brand].to_numpy()
+        if values.size and values.max() > 0:
+            out[brand], _ = find_peaks(values, height=height, distance=distance)
+    return out
+
+def peak_times(df, brands):
+    """Time (seconds) of each detected brand's highest-scoring frame."""
+    times = df["TimeSeconds"].to_numpy()
+    values = df[brands].to_numpy()
+    out = {}
+    for j, brand in enumerate(brands):
+        if values.shape[0] and values[:, j].max() > 0:
+            out[brand] = float(times[values[:, j].argmax()])
+    return out
+
+def analyze(df, brands=None, window=HEATMAP_WINDOW):
+    """
+    Every aggregate the plots and the PDF need, computed once per report.
+    Totals, windows and rates are weighted by SampleSeconds, so they measure
+    time on screen whatever the sampling rate.
+    """
+    brands = brand_columns(df) if brands is None else list(brands)
+    totals = _weighted(df, brands).sum()
+    co = co_occurrence(df, brands)
+    duration = float(df["SampleSeconds"].sum())
+    shared = df["SampleSeconds"].to_numpy()[(df[brands].to_numpy() > 0).sum(axis=1) > 1].sum()
+    return {
+        "df": df,
+        "brands": brands,
+        "totals": totals,
+        "duration": duration,
+        "samples": len(df),
+        "windows": windowed_sums(df, brands, window),
+        "co_occurrence": co,
+        "co_occurrence_rate": shared / duration * 100 if duration else 0.0,
+        "detection_frames": detection_frames(df, brands),
+        "detection_seconds": detection_seconds(df, brands),
+        "detection_rates": detection_rates(df, brands),
+        "peaks": peaks(df, brands),
+        "peak_times": peak_times(df, brands),
+    }
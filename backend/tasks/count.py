@@ -1,63 +1,94 @@
 import os
 import json
 import pandas as pd
-from rapidfuzz import fuzz
 
-def count_brands(merged_texts_path, base_output_dir, brand_keywords, threshold=80):
+from tasks.analytics import sample_durations
+from tasks.matching import score_frames
+from tasks.ocr_store import load_frame_texts, load_frame_timestamps, store_fingerprint
+from tasks.stages import fingerprint
+
+# Per-brand counts and match logs, reused by later requests that select the brand again
+BRAND_CACHE_DIRNAME = "brand_counts"
+
+def _brand_cache_path(base_output_dir, brand, variants, threshold):
+    return os.path.join(base_output_dir, BRAND_CACHE_DIRNAME,
+                        fingerprint(brand, list(variants), threshold) + ".json")
+
+def _load_brand_counts(path, store_key, frames):
+    if store_key is None or not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("store") != store_key or cached.get("frames") != frames:
+        return None
+    return cached
+
+def _save_brand_counts(path, cached):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cached, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def count_brands(ocr_output_dir, base_output_dir, brand_keywords, threshold=80, workers=-1, matcher=None):
     """
     Count brand keyword occurrences in OCR output using fuzzy matching.
+    Reads the OCR store (or legacy merged_texts.txt) in `ocr_output_dir`.
     Always generates CSVs, even with zero results.
+    `workers` is passed to rapidfuzz's cdist (-1 uses all cores); `matcher`
+    is an optional BrandMatcher compiled from a superset of brand_keywords.
+    brand_analysis.csv carries each frame's timestamp (TimeSeconds) from the
+    OCR store. Counts are cached per brand (under brand_counts/) against the
+    OCR store, so only brands that were never counted for this video are scored.
+    brand_totals.csv weights each frame by the seconds it stands for (see
+    tasks.analytics.sample_durations), not 1 per frame.
     """
-    def load_frame_texts(path):
-        frame_texts = {}
-        current_frame = None
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith("===") and line.endswith("==="):
-                    current_frame = line.strip("= ").strip()
-                    frame_texts[current_frame] = []
-                elif line and current_frame:
-                    frame_texts[current_frame].append(line)
-        return frame_texts
-
-    frame_texts = load_frame_texts(merged_texts_path)
+    frame_texts = load_frame_texts(ocr_output_dir)
     valid_frames = {k: v for k, v in frame_texts.items() if v and any(line.strip() for line in v)}
 
     if not valid_frames:
         print("⚠️ No valid OCR text found in any frame. Generating empty CSVs.")
         # Fake one row with zeros for all brands
-        df_analysis = pd.DataFrame([{"Frame": "no_valid_frames", **{brand: 0 for brand in brand_keywords}}])
+        df_analysis = pd.DataFrame([{"Frame": "no_valid_frames", "TimeSeconds": 0.0,
+                                     **{brand: 0 for brand in brand_keywords}}])
     else:
         print(f"📊 Counting brands in {len(valid_frames)} frames...")
 
         def score_brands():
-            results = []
-            match_log = {}  # New: to store matches per frame
-
-            for frame, lines in frame_texts.items():
-                row = {"Frame": frame}
-                match_log[frame] = []  # Initialize frame's match list
-
-                for brand, variants in brand_keywords.items():
-                    count = 0
-                    for line in lines:
-                        words = line.lower().split()
-                        for word in words:
-                            for variant in variants:
-                                score = fuzz.ratio(variant, word)
-                                if score >= threshold:
-                                    count += 1
-                                    match_log[frame].append({
-                                        "brand": brand,
-                                        "word": word,
-                                        "matched_variant": variant,
-                                        "score": score
-                                    })
-                                    break
-                    row[brand] = count
-                results.append(row)
+            frames = list(frame_texts)
+            store_key = store_fingerprint(ocr_output_dir)
+            paths = {brand: _brand_cache_path(base_output_dir, brand, variants, threshold)
+                     for brand, variants in brand_keywords.items()}
+            per_brand = {brand: _load_brand_counts(paths[brand], store_key, frames) for brand in brand_keywords}
+            missing = {brand: variants for brand, variants in brand_keywords.items() if per_brand[brand] is None}
 
+            if missing:
+                # Each distinct word is scored once against all variants (see tasks/matching.py)
+                results, match_log = score_frames(frame_texts, missing, threshold=threshold,
+                                                  workers=workers, matcher=matcher)
+                for brand in missing:
+                    per_brand[brand] = {
+                        "store": store_key,
+                        "frames": frames,
+                        "counts": [row[brand] for row in results],
+                        "log": {frame: [m for m in entries if m["brand"] == brand]
+                                for frame, entries in match_log.items()
+                                if any(m["brand"] == brand for m in entries)},
+                    }
+                    if store_key is not None:
+                        _save_brand_counts(paths[brand], per_brand[brand])
+            print(f"♻️ Reused cached counts for {len(brand_keywords) - len(missing)} of {len(brand_keywords)} brands")
+
+            # Assemble rows and the log in brand order, as a single scoring pass would
+            timestamps = load_frame_timestamps(ocr_output_dir)
+            results = [{"Frame": frame, "TimeSeconds": timestamps.get(frame, float(i)),
+                        **{brand: per_brand[brand]["counts"][i] for brand in brand_keywords}}
+                       for i, frame in enumerate(frames)]
+            match_log = {frame: [m for brand in brand_keywords for m in per_brand[brand]["log"].get(frame, [])]
+                         for frame in frames}
 
                 # === Step 5: Save detailed match log ===
             match_log_path = os.path.join(base_output_dir, "brand_match_log.json")
@@ -74,12 +105,13 @@ def count_brands(merged_texts_path, base_output_dir, brand_keywords, threshold=8
     df_analysis.to_csv(analysis_csv, index=False)
 
     # Save totals CSV
-    brand_cols = [c for c in df_analysis.columns if c != "Frame"]
-    df_totals = df_analysis[brand_cols].sum().reset_index()
+    brand_cols = [c for c in df_analysis.columns if c not in ("Frame", "TimeSeconds")]
+    weights = sample_durations(df_analysis["TimeSeconds"])
+    df_totals = df_analysis[brand_cols].mul(weights, axis=0).sum().reset_index()
     df_totals.columns = ["Brand", "Total Score"]
     totals_csv = os.path.join(base_output_dir, "brand_totals.csv")
     df_totals.to_csv(totals_csv, index=False)
-    
+
 
     print(f"✅ Saved brand_analysis.csv to: {analysis_csv}")
     print(f"✅ Saved brand_totals.csv to: {totals_csv}")
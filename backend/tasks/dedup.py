@@ -0,0 +1,107 @@
+import os
+import cv2
+import numpy as np
+
+# Near-duplicate suppression is opt-in: OCR_DEDUP=1 turns it on
+DEDUP_ENABLED = os.getenv("OCR_DEDUP", "0") == "1"
+# Frames at least this similar (0-1, share of unchanged cells in the most
+# changed block) to the last OCR'd frame reuse its results instead of being
+# OCR'd again.
+DEDUP_THRESHOLD = float(os.getenv("OCR_DEDUP_THRESHOLD", "0.97"))
+# Gray levels a cell's horizontal gradient may move by and still count as
+# unchanged (encoder noise on a static shot stays well under this)
+DEDUP_MARGIN = int(os.getenv("OCR_DEDUP_MARGIN", "4"))
+
+HASH_SIZE = 16
+# The frame is compared as DEDUP_GRID x DEDUP_GRID blocks of
+# DEDUP_BLOCK_SIZE x DEDUP_BLOCK_SIZE cells: a 1280x720 frame gives 20x11
+# pixel cells, so a small board changing its text moves a whole block.
+DEDUP_GRID = 8
+DEDUP_BLOCK_SIZE = 8
+
+def _gray(image):
+    if isinstance(image, str):
+        return cv2.imread(image, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+def difference_hash(image, hash_size=HASH_SIZE):
+    """
+    Perceptual difference hash (dHash) of a frame: the frame is shrunk to
+    (hash_size+1) x hash_size grayscale and each bit says whether a pixel is
+    brighter than its right neighbour. Returns a flat boolean array.
+    """
+    small = cv2.resize(_gray(image), (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).ravel()
+
+def block_signature(image, grid=DEDUP_GRID, block_size=DEDUP_BLOCK_SIZE):
+    """
+    Horizontal gradients of the frame shrunk to (grid*block_size+1) x
+    grid*block_size grayscale, as a (grid, block_size, grid, block_size)
+    array: [block row, cell row, block column, cell column].
+    """
+    cells = grid * block_size
+    small = cv2.resize(_gray(image), (cells + 1, cells), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return (small[:, 1:] - small[:, :-1]).reshape(grid, block_size, grid, block_size)
+
+def block_similarity(a, b, margin=DEDUP_MARGIN):
+    """Share of unchanged cells in the most changed block of two block signatures (0-1)."""
+    unchanged = np.abs(a - b) <= margin
+    return float(unchanged.mean(axis=(1, 3)).min())
+
+class FrameDeduper:
+    """
+    Tracks the last frame that was actually OCR'd and flags following frames
+    that are near-identical to it (static scoreboard shots, held LED boards,
+    free-throw setups). Frames are compared block by block and the most
+    changed block decides, so new text on a small board is never a duplicate.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, margin=DEDUP_MARGIN, grid=DEDUP_GRID,
+                 block_size=DEDUP_BLOCK_SIZE):
+        if not 0 < threshold <= 1:
+            raise ValueError("Dedup threshold must be in (0, 1].")
+        self.threshold = threshold
+        self.margin = margin
+        self.grid = grid
+        self.block_size = block_size
+        self.reference_signature = None
+        self.reference = None
+        self.checked = 0
+        self.skipped = 0
+
+    def reset(self):
+        """Forget the reference frame (a new pass over frames); the counts carry on."""
+        self.reference_signature = None
+        self.reference = None
+
+    def similarity(self, signature):
+        if self.reference_signature is None:
+            return 0.0
+        return block_similarity(signature, self.reference_signature, self.margin)
+
+    def check(self, image, ref):
+        """
+        Return the reference of the frame `image` duplicates, or None if it
+        should be OCR'd (in which case it becomes the new reference `ref`).
+        """
+        self.checked += 1
+        signature = block_signature(image, self.grid, self.block_size)
+        if self.similarity(signature) >= self.threshold:
+            self.skipped += 1
+            return self.reference
+        self.reference_signature = signature
+        self.reference = ref
+        return None
+
+    def stats(self):
+        return {
+            "dedup_checked": self.checked,
+            "dedup_skipped": self.skipped,
+            "dedup_threshold": self.threshold,
+        }
+
+def make_deduper():
+    """A FrameDeduper for a job's OCR, or None when OCR_DEDUP is off."""
+    return FrameDeduper() if DEDUP_ENABLED else None
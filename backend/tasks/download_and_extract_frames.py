@@ -2,157 +2,158 @@ import os
 import re
 import cv2
 import yt_dlp
-from datetime import datetime
 
-def log(message, log_file=None):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_line = f"[{timestamp}] {message}"
-    print(log_line)
-    if log_file:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(log_line + "\n")
+from tasks.sampling import grid_index, sample_frames, video_fps, DEFAULT_BACKEND
+from utils.logger import log
+
+# Tallest video the "ocr" ingest profile downloads; broadcast sponsor text
+# is still legible to the detector at 720p.
+OCR_MAX_HEIGHT = int(os.getenv("OCR_MAX_HEIGHT", "720"))
+
+# yt_dlp options per ingest profile
+INGEST_PROFILES = {
+    # best video + audio merged to mp4 (the original behaviour)
+    "full": {"format": "bestvideo+bestaudio/best", "merge_output_format": "mp4"},
+    # video stream only: OCR never uses the audio
+    "video": {"format": "bestvideo[ext=mp4]/bestvideo/best"},
+    # video only, capped at OCR_MAX_HEIGHT
+    "ocr": {"format": (f"bestvideo[height<={OCR_MAX_HEIGHT}][ext=mp4]/bestvideo[height<={OCR_MAX_HEIGHT}]/"
+                       f"best[height<={OCR_MAX_HEIGHT}]/best")},
+}
+DEFAULT_INGEST_PROFILE = os.getenv("INGEST_PROFILE", "ocr")
+
+VIDEO_EXTS = (".mp4", ".webm", ".mkv")
 
 def sanitize_filename(name):
     """Sanitize filename for filesystem compatibility."""
     return re.sub(r'[\\/*?:"<>|]', "_", name)
 
-def download_video(url):
-    """
-    Download a YouTube video via yt_dlp.
-    Returns (path_to_mp4, run_directory).
-    """
+def parse_timestamp(value):
+    """Seconds from a number or an "[[HH:]MM:]SS" string; None stays None."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0.0
+    for part in str(value).strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+def time_range(start=None, end=None):
+    """Normalise optional start/end times to a (start, end) tuple, or None for the whole video."""
+    start, end = parse_timestamp(start), parse_timestamp(end)
+    if start is None and end is None:
+        return None
+    start = start or 0.0
+    if end is not None and end <= start:
+        raise ValueError(f"End time ({end}s) must be after start time ({start}s).")
+    return start, end
+
+def chunk_spans(start, end, chunk_seconds):
+    """Split [start, end) seconds into consecutive (start, end) spans of at most `chunk_seconds`."""
+    if chunk_seconds <= 0:
+        raise ValueError("Chunk length must be positive.")
+    spans = []
+    while start < end:
+        spans.append((start, min(start + chunk_seconds, end)))
+        start += chunk_seconds
+    return spans
+
+def probe_duration(url):
+    """Length of a YouTube video in seconds from its metadata (nothing is downloaded), or None."""
     with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
         info = ydl.extract_info(url, download=False)
-        title = sanitize_filename(info.get("title", "downloaded_video"))
-
-    run_dir = os.path.abspath(title)
-    os.makedirs(run_dir, exist_ok=True)
-    output_template = os.path.join(run_dir, "video.%(ext)s")
-
-    ydl_opts = {
-        "format": "bestvideo+bestaudio/best",
-        "outtmpl": output_template,
-        "noplaylist": True,
-        "merge_output_format": "mp4",
-        "quiet": True,
-    }
-
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
-
-    for file in os.listdir(run_dir):
-        if file.endswith(".mp4"):
-            return os.path.join(run_dir, file), run_dir
-
-    raise RuntimeError("No MP4 file found after download.")
-
-def extract_frames(video_path, output_dir, fps=1):
-    """
-    Extract frames from a video at the given FPS.
-    Returns the directory where frames were saved.
-    """
-    print("Extracting frames.")
-    os.makedirs(output_dir, exist_ok=True)
-    vidcap = cv2.VideoCapture(video_path)
-    video_fps = vidcap.get(cv2.CAP_PROP_FPS)
-
-    if not video_fps or video_fps <= 0:
-        raise ValueError("Unable to read FPS from video.")
-
-    interval = max(int(video_fps / fps), 1)
-    frame_count, frame_id = 0, 0
-
-    while True:
-        success, frame = vidcap.read()
-        if not success:
-            break
-        if frame_count % interval == 0:
-            cv2.imwrite(os.path.join(output_dir, f"frame_{frame_id:04d}.jpg"), frame)
-            frame_id += 1
-        frame_count += 1
-
-    vidcap.release()
-    print("Frames extracted succefully")
-    return output_dir
-
-import os
-import re
-import cv2
-import yt_dlp
-from datetime import datetime
+    return float(info["duration"]) if info.get("duration") else None
 
-def log(message, log_file=None):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_line = f"[{timestamp}] {message}"
-    print(log_line)
-    if log_file:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(log_line + "\n")
+def span_key(span):
+    """"1440-2160" / "1440-end" for a (start, end) span."""
+    start, end = span
+    return f"{start:g}-{'end' if end is None else f'{end:g}'}"
 
-def sanitize_filename(name):
-    """Sanitize filename for filesystem compatibility."""
-    return re.sub(r'[\\/*?:"<>|]', "_", name)
+def ingest_key(profile=DEFAULT_INGEST_PROFILE, span=None):
+    """Name for what was ingested, e.g. "ocr" or "ocr_1440-2160"."""
+    if profile not in INGEST_PROFILES:
+        raise ValueError(f"Unknown ingest profile {profile!r}, expected one of {list(INGEST_PROFILES)}")
+    return profile if span is None else f"{profile}_{span_key(span)}"
 
-def download_video(url):
+def download_video(url, output_dir=None, profile=DEFAULT_INGEST_PROFILE, span=None):
     """
-    Download a YouTube video via yt_dlp.
-    Returns (path_to_mp4, run_directory).
+    Download a YouTube video via yt_dlp into `output_dir` (default: a
+    directory named after the video title in the working directory).
+    `profile` selects the formats (see INGEST_PROFILES); `span` is an
+    optional (start, end) in seconds to download only part of the video
+    (end None means until the end).
+    Returns (path_to_video, run_directory).
     """
-    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-        info = ydl.extract_info(url, download=False)
-        title = sanitize_filename(info.get("title", "downloaded_video"))
-
-    run_dir = os.path.abspath(title)
+    if profile not in INGEST_PROFILES:
+        raise ValueError(f"Unknown ingest profile {profile!r}, expected one of {list(INGEST_PROFILES)}")
+    if output_dir:
+        run_dir = os.path.abspath(output_dir)
+    else:
+        with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+            info = ydl.extract_info(url, download=False)
+            title = sanitize_filename(info.get("title", "downloaded_video"))
+        run_dir = os.path.abspath(title)
     os.makedirs(run_dir, exist_ok=True)
     output_template = os.path.join(run_dir, "video.%(ext)s")
 
     ydl_opts = {
-        "format": "bestvideo+bestaudio/best",
+        **INGEST_PROFILES[profile],
         "outtmpl": output_template,
         "noplaylist": True,
-        "merge_output_format": "mp4",
         "quiet": True,
     }
+    if span:
+        start, end = span
+        ydl_opts["download_ranges"] = yt_dlp.utils.download_range_func(
+            None, [(start, float("inf") if end is None else end)])
+        # Cut exactly at `start` so sampled timestamps can simply be offset by it
+        ydl_opts["force_keyframes_at_cuts"] = True
 
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         ydl.download([url])
 
-    for file in os.listdir(run_dir):
-        if file.endswith(".mp4"):
+    for file in sorted(os.listdir(run_dir)):
+        if file.endswith(VIDEO_EXTS):
             return os.path.join(run_dir, file), run_dir
 
-    raise RuntimeError("No MP4 file found after download.")
+    raise RuntimeError("No video file found after download.")
 
-def extract_frames(video_path, output_dir, fps=1):
+def frame_name(frame_id):
+    """Name used for a sampled frame on disk and in OCR output."""
+    return f"frame_{frame_id:04d}"
+
+def iter_frames(video_path, fps=1, backend=DEFAULT_BACKEND, start_offset=0):
+    """
+    Decode a video and yield (frame_id, timestamp_seconds, frame) for every
+    sampled frame, keeping frames in memory instead of writing them to disk.
+    See tasks.sampling for the available decoding backends.
+    `start_offset` is where the file starts in the original broadcast (for
+    time-range downloads); timestamps are shifted by it and frame ids are
+    the broadcast's sampling slots (see grid_index), so consecutive chunks
+    line up.
+    """
+    if not start_offset:
+        return sample_frames(video_path, fps=fps, backend=backend)
+    source_fps = video_fps(video_path)
+    return ((grid_index(timestamp + start_offset, source_fps, fps), round(timestamp + start_offset, 3), frame)
+            for _, timestamp, frame in sample_frames(video_path, fps=fps, backend=backend))
+
+def extract_frames(video_path, output_dir, fps=1, backend=DEFAULT_BACKEND, start_offset=0):
     """
     Extract frames from a video at the given FPS.
     Returns the directory where frames were saved.
     """
     print("Extracting frames.")
     os.makedirs(output_dir, exist_ok=True)
-    vidcap = cv2.VideoCapture(video_path)
-    video_fps = vidcap.get(cv2.CAP_PROP_FPS)
-
-    if not video_fps or video_fps <= 0:
-        raise ValueError("Unable to read FPS from video.")
-
-    interval = max(int(video_fps / fps), 1)
-    frame_count, frame_id = 0, 0
 
-    while True:
-        success, frame = vidcap.read()
-        if not success:
-            break
-        if frame_count % interval == 0:
-            cv2.imwrite(os.path.join(output_dir, f"frame_{frame_id:04d}.jpg"), frame)
-            frame_id += 1
-        frame_count += 1
+    for frame_id, _, frame in iter_frames(video_path, fps=fps, backend=backend, start_offset=start_offset):
+        cv2.imwrite(os.path.join(output_dir, f"{frame_name(frame_id)}.jpg"), frame)
 
-    vidcap.release()
     print("Frames extracted succefully")
     return output_dir
 
-def download_and_extract_frames(youtube_url, fps=1, output_dir=None, log_file=None):
+def download_and_extract_frames(youtube_url, fps=1, output_dir=None, log_file=None, backend=DEFAULT_BACKEND):
     """
     Combined function: Downloads video and extracts frames.
     Returns absolute path to the frame output directory.
@@ -167,6 +168,6 @@ def download_and_extract_frames(youtube_url, fps=1, output_dir=None, log_file=No
     frames_dir = output_dir if output_dir else os.path.join(run_dir, "frames")
 
     # Extract frames
-    extract_frames(video_path, frames_dir, fps=fps)
+    extract_frames(video_path, frames_dir, fps=fps, backend=backend)
 
     return frames_dir
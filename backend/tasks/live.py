@@ -0,0 +1,310 @@
+import os
+import json
+import math
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from tasks.download_and_extract_frames import VIDEO_EXTS, iter_frames
+from tasks.ocr import run_ocr_on_stream
+from tasks.sampling import video_length
+from utils.metrics import metrics
+
+# Live sources the API may follow are looked up under this directory (unset:
+# live ingest is disabled in the API). A source is a growing video file, a
+# directory of segments, or a local .m3u8 playlist of segments.
+LIVE_SOURCE_DIR = os.getenv("LIVE_SOURCE_DIR")
+# Seconds between checks of a live source for new data
+LIVE_POLL_SECONDS = float(os.getenv("LIVE_POLL_SECONDS", "1"))
+# A source that stops growing for this long is over (a playlist ends at #EXT-X-ENDLIST)
+LIVE_IDLE_TIMEOUT = float(os.getenv("LIVE_IDLE_TIMEOUT", "120"))
+# Seconds between rolling live.json snapshots of the counts
+LIVE_SNAPSHOT_SECONDS = float(os.getenv("LIVE_SNAPSHOT_SECONDS", "30"))
+# Seconds between rolling partial reports (0: only the final report)
+LIVE_REPORT_SECONDS = float(os.getenv("LIVE_REPORT_SECONDS", "600"))
+# Frames per OCR batch: small, so a frame is counted seconds after it airs
+LIVE_BATCH_SIZE = int(os.getenv("LIVE_BATCH_SIZE", "1"))
+# Frames this close to the end of a growing file may be half-written; they
+# wait for the next poll.
+LIVE_TAIL_SECONDS = 1.0
+# Latencies kept for the snapshot's percentiles
+LIVE_LATENCY_WINDOW = 600
+
+SEGMENT_EXTS = VIDEO_EXTS + (".ts", ".m4s", ".avi")
+
+def resolve_live_source(source, source_dir=LIVE_SOURCE_DIR):
+    """The path of `source` under `source_dir`; ValueError if live ingest is off or it isn't there."""
+    if not source_dir:
+        raise ValueError("Live ingest is not enabled (LIVE_SOURCE_DIR is not set).")
+    root = os.path.realpath(source_dir)
+    path = os.path.realpath(os.path.join(root, source))
+    if os.path.commonpath([root, path]) != root or path == root:
+        raise ValueError(f"Live source must be inside {source_dir}: {source}")
+    if not os.path.exists(path):
+        raise ValueError(f"Live source not found: {source}")
+    return path
+
+def read_playlist(path):
+    """
+    Segments of a local HLS-style playlist, as ([(path, seconds or None)],
+    ended): URIs are relative to the playlist, #EXTINF gives durations and
+    #EXT-X-ENDLIST marks a finished stream.
+    """
+    segments, duration, ended = [], None, False
+    base = os.path.dirname(path)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line == "#EXT-X-ENDLIST":
+                ended = True
+            elif line and not line.startswith("#"):
+                if "://" in line:
+                    raise ValueError(f"Only local playlists are supported, got segment {line}")
+                segments.append((os.path.join(base, line), duration))
+                duration = None
+    return segments, ended
+
+def _directory_segments(path):
+    names = sorted(name for name in os.listdir(path)
+                   if name.lower().endswith(SEGMENT_EXTS) and not name.startswith("."))
+    return [(os.path.join(path, name), None) for name in names]
+
+def follow_segments(source, fps, arrivals, poll=LIVE_POLL_SECONDS, idle_timeout=LIVE_IDLE_TIMEOUT):
+    """
+    Yield (frame_id, timestamp, frame) sampled at `fps` from the segments
+    of a playlist or directory, in order, as they are published. Segments
+    are laid end to end on one timeline. In a directory, a segment counts
+    as complete once the next one appears (the last one when the source
+    goes idle). `arrivals` records when each frame's segment was first
+    seen complete.
+    """
+    done, offset, last_id = 0, 0.0, -1
+    last_change = time.monotonic()
+    playlist = not os.path.isdir(source)
+    listed = {}
+    while True:
+        idle = time.monotonic() - last_change > idle_timeout
+        if playlist:
+            segments, ended = read_playlist(source)
+            complete = segments
+        else:
+            segments, ended = _directory_segments(source), idle
+            complete = segments if idle else segments[:-1]
+        now = time.monotonic()
+        for path, _ in complete[done:]:
+            listed.setdefault(path, now)
+
+        for path, duration in complete[done:]:
+            seen = listed.pop(path)
+            for frame_id, timestamp, frame in iter_frames(path, fps=fps, start_offset=offset):
+                if frame_id <= last_id:
+                    continue  # same sampling slot as the previous segment's last frame
+                last_id = frame_id
+                arrivals[frame_id] = seen
+                yield frame_id, timestamp, frame
+            offset += duration or video_length(path) or 0.0
+            done += 1
+            last_change = time.monotonic()
+
+        if ended and done >= len(segments):
+            return
+        if idle:
+            print(f"⏹️ No new segments for {idle_timeout:g}s; ending live ingest.")
+            return
+        time.sleep(poll)
+
+def follow_file(path, fps, arrivals, poll=LIVE_POLL_SECONDS, idle_timeout=LIVE_IDLE_TIMEOUT):
+    """
+    Yield (frame_id, timestamp, frame) sampled at `fps` from a video file
+    that is still being written, e.g. a recorder's MKV, AVI or MPEG-TS
+    output (an MP4's index is only written at the end). Each time the file
+    grows it is reopened at the next sampling slot; frames near its end
+    wait until more arrives or the file stops growing for `idle_timeout`.
+    """
+    next_id, last_size = 0, -1
+    last_change = time.monotonic()
+    while True:
+        size = os.path.getsize(path) if os.path.exists(path) else -1
+        final = size == last_size and time.monotonic() - last_change > idle_timeout
+        if size != last_size or final:
+            if size != last_size:
+                last_size, last_change = size, time.monotonic()
+            seen = time.monotonic()
+            vidcap = cv2.VideoCapture(path)
+            pending = deque()  # sampled frames not yet LIVE_TAIL_SECONDS from the end
+            try:
+                if vidcap.isOpened():
+                    vidcap.set(cv2.CAP_PROP_POS_MSEC, next_id / fps * 1000)
+                    while vidcap.grab():
+                        timestamp = vidcap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                        while pending and timestamp - pending[0][1] >= LIVE_TAIL_SECONDS:
+                            frame_id, frame_time, frame = pending.popleft()
+                            arrivals[frame_id] = seen
+                            next_id = frame_id + 1
+                            yield frame_id, round(frame_time, 3), frame
+                        # The first frame of each sampling slot
+                        slot = math.floor(timestamp * fps + 1e-6)
+                        if slot >= next_id and (not pending or slot > pending[-1][0]):
+                            success, frame = vidcap.retrieve()
+                            if success:
+                                metrics.inc("frames_decoded", backend="live")
+                                pending.append((slot, timestamp, frame))
+            finally:
+                vidcap.release()
+            if final:
+                for frame_id, frame_time, frame in pending:
+                    arrivals[frame_id] = seen
+                    yield frame_id, round(frame_time, 3), frame
+                print(f"⏹️ {path} stopped growing for {idle_timeout:g}s; ending live ingest.")
+                return
+        time.sleep(poll)
+
+def live_frames(source, fps, arrivals, poll=LIVE_POLL_SECONDS, idle_timeout=LIVE_IDLE_TIMEOUT):
+    """Frames of a live source: a playlist (.m3u8) or segment directory, else a growing file."""
+    if os.path.isdir(source) or source.lower().endswith(".m3u8"):
+        return follow_segments(source, fps, arrivals, poll=poll, idle_timeout=idle_timeout)
+    return follow_file(source, fps, arrivals, poll=poll, idle_timeout=idle_timeout)
+
+class LiveCounts:
+    """
+    Brand counts of a live job, updated as each frame is OCR'd: the same
+    per-frame keyword counts as count_brands (one matcher lookup per frame),
+    weighted like brand_totals.csv by the seconds each frame stands for
+    (tasks.analytics.sample_durations). A frame's weight needs the next
+    frame's timestamp, so the latest frame is weighted by the gap before it
+    until the next one arrives; with frames in time order the totals then
+    equal brand_totals.csv for the frames so far.
+    """
+
+    def __init__(self, brand_keywords, matcher):
+        self.brands = list(brand_keywords)
+        self.matcher = matcher
+        self.mentions = np.zeros(len(self.brands), dtype=np.int64)
+        # Weighted totals of every frame but the latest, whose weight isn't final
+        self.score_seconds = np.zeros(len(self.brands))
+        self.visible_seconds = np.zeros(len(self.brands))
+        self.latest = None  # (timestamp, counts) of the latest frame
+        self.latest_gap = None
+        self.last_seen = [None] * len(self.brands)
+        self.frames = 0
+        self.video_seconds = 0.0
+        self.latencies = deque(maxlen=LIVE_LATENCY_WINDOW)
+
+    def add(self, timestamp, datas):
+        tokens = [word for data in datas for line in data.get("rec_texts", []) or [] for word in line.lower().split()]
+        timestamp = float(timestamp)
+        counts = self.matcher.match_tokens(tokens, self.brands)[0].sum(axis=0) if tokens \
+            else np.zeros(len(self.brands), dtype=np.int64)
+        if self.latest is not None:
+            # Half the gap goes to each side; the first frame also gets the
+            # other half (sample_durations gives the ends the full gap)
+            previous_time, previous = self.latest
+            gap = timestamp - previous_time
+            halves = (2 if self.frames == 1 else 1) * previous + counts
+            self.score_seconds += halves * gap / 2
+            self.visible_seconds += ((2 if self.frames == 1 else 1) * (previous > 0) + (counts > 0)) * gap / 2
+            self.latest_gap = gap
+        self.latest = (timestamp, counts)
+        self.frames += 1
+        self.video_seconds = max(self.video_seconds, timestamp)
+        self.mentions += counts
+        for b in np.nonzero(counts)[0]:
+            self.last_seen[b] = timestamp
+
+    def totals(self):
+        """(score seconds, visible seconds) per brand, the latest frame included."""
+        if self.latest is None:
+            return self.score_seconds, self.visible_seconds
+        counts = self.latest[1]
+        weight = 1.0 if self.latest_gap is None else self.latest_gap / 2
+        return self.score_seconds + counts * weight, self.visible_seconds + (counts > 0) * weight
+
+    def snapshot(self, status="live", **extra):
+        latencies = np.asarray(self.latencies) if self.latencies else None
+        score_seconds, visible_seconds = self.totals()
+        brands = [{
+            "brand": brand,
+            "total_score": round(float(score_seconds[b]), 3),
+            "mentions": int(self.mentions[b]),
+            "seconds_on_screen": round(float(visible_seconds[b]), 3),
+            "last_seen": self.last_seen[b],
+        } for b, brand in enumerate(self.brands)]
+        return {
+            "status": status,
+            "updated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "frames": self.frames,
+            "video_seconds": self.video_seconds,
+            "latency_seconds": None if latencies is None else {
+                "last": round(float(latencies[-1]), 3),
+                "p50": round(float(np.percentile(latencies, 50)), 3),
+                "p95": round(float(np.percentile(latencies, 95)), 3),
+            },
+            "brands": sorted(brands, key=lambda entry: -entry["total_score"]),
+            **extra,
+        }
+
+def write_snapshot(path, snapshot):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(tmp_path, path)
+
+def run_live_ingest(source, ocr_output_dir, base_dir, brand_keywords, matcher, model, fps=1,
+                    snapshot_seconds=LIVE_SNAPSHOT_SECONDS, report_seconds=LIVE_REPORT_SECONDS,
+                    partial_report=None, publish=None, on_counted=None, poll=LIVE_POLL_SECONDS,
+                    idle_timeout=LIVE_IDLE_TIMEOUT, batch_size=LIVE_BATCH_SIZE, **ocr_kwargs):
+    """
+    Follow a live source (see live_frames) until it ends, OCR'ing frames as
+    they arrive into the OCR store and counting brands frame by frame.
+    Every `snapshot_seconds` the counts go to <base_dir>/live.json (and to
+    `publish(snapshot)`, if given); every
+    `report_seconds` the store is checkpointed and `partial_report()` is
+    called to rebuild the report from the frames so far. `on_counted(
+    frame_id, timestamp)` is called as each frame is counted. Other keyword
+    arguments go to run_ocr_on_stream. Returns the OCR statistics plus
+    the final snapshot.
+    """
+    counts = LiveCounts(brand_keywords, matcher)
+    arrivals = {}
+    snapshot_path = os.path.join(base_dir, "live.json")
+    source_name = os.path.basename(source)
+    timers = {"snapshot": time.monotonic(), "report": time.monotonic()}
+
+    def save(snapshot):
+        write_snapshot(snapshot_path, snapshot)
+        if publish:
+            publish(snapshot)
+
+    save(counts.snapshot(source=source_name))
+
+    def on_frame(frame_id, timestamp, datas, writer):
+        counts.add(timestamp, datas)
+        arrived = arrivals.pop(frame_id, None)
+        if arrived is not None:
+            latency = time.monotonic() - arrived
+            counts.latencies.append(latency)
+            metrics.observe("live_latency_seconds", latency)
+        if on_counted:
+            on_counted(frame_id, timestamp)
+        now = time.monotonic()
+        if now - timers["snapshot"] >= snapshot_seconds:
+            timers["snapshot"] = now
+            save(counts.snapshot(source=source_name))
+            metrics.flush(force=False)
+        if partial_report and report_seconds > 0 and now - timers["report"] >= report_seconds:
+            writer.checkpoint()
+            print(f"📝 Partial report at {timestamp:.0f}s of video ({counts.frames} frames)")
+            partial_report()
+            timers["report"] = time.monotonic()
+
+    print(f"📡 Following live source {source} at {fps:g} FPS")
+    stats = run_ocr_on_stream(live_frames(source, fps, arrivals, poll=poll, idle_timeout=idle_timeout),
+                              ocr_output_dir, model=model, batch_size=batch_size, on_frame=on_frame, **ocr_kwargs)
+    stats["snapshot"] = counts.snapshot(status="ended", source=source_name)
+    save(stats["snapshot"])
+    return stats
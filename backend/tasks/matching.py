@@ -0,0 +1,252 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from utils.metrics import metrics
+
+# Distinct OCR tokens whose match results each compiled matcher remembers
+TOKEN_CACHE_SIZE = int(os.getenv("BRAND_TOKEN_CACHE_SIZE", "200000"))
+# Compiled matchers kept per process (one per brand dictionary / threshold)
+MAX_MATCHERS = 16
+
+class BrandMatcher:
+    """
+    A brand dictionary compiled once for fuzzy token matching.
+
+    Matching keeps count_brands' original rule: a token counts for a brand
+    when any of the brand's variants has fuzz.ratio >= threshold, and the
+    first such variant (in list order) is the one reported. To get there
+    cheaply the matcher
+      * lowercases variants once (OCR words are lowercased before matching),
+      * answers tokens equal to a variant from a table scored at compile time,
+      * only scores variants whose length can reach the threshold
+        (fuzz.ratio <= 200 * min(len) / (len_a + len_b)), and
+      * remembers each token's result in a bounded LRU that lives as long as
+        the process, so recurring words ("state", "farm", "espn") are scored
+        once per worker rather than once per frame.
+    """
+
+    def __init__(self, brand_keywords, threshold=80, cache_size=TOKEN_CACHE_SIZE, workers=-1):
+        self.brand_keywords = {brand: list(variants) for brand, variants in brand_keywords.items()}
+        self.brands = list(self.brand_keywords)
+        self.threshold = threshold
+        self.workers = workers
+        self.cache_size = cache_size
+
+        self._variants = [v for brand in self.brands for v in self.brand_keywords[brand]]
+        self._lowered = [v.lower() for v in self._variants]
+        self._owner = np.array([b for b, brand in enumerate(self.brands)
+                                for _ in self.brand_keywords[brand]], dtype=np.int64)
+        self._offset = np.array([i for brand in self.brands
+                                 for i in range(len(self.brand_keywords[brand]))], dtype=np.int64)
+        self._lengths = np.array([len(v) for v in self._lowered], dtype=np.int64)
+        self._length_masks = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.exact_hits = 0
+
+        # Exact-match table: a token equal to a variant gets a precomputed result.
+        unique_variants = list(dict.fromkeys(self._lowered))
+        self._exact = dict(zip(unique_variants, self._score(unique_variants)))
+
+    def _candidates(self, length):
+        """Boolean mask of variants that can reach the threshold against a token of `length`."""
+        mask = self._length_masks.get(length)
+        if mask is None:
+            shorter = np.minimum(self._lengths, length)
+            total = self._lengths + length
+            mask = 200 * shorter >= self.threshold * np.maximum(total, 1)
+            self._length_masks[length] = mask
+        return mask
+
+    def _score(self, tokens):
+        """
+        Score tokens (grouped by length) against their candidate variants.
+        Returns, per token, a tuple of (brand_index, variant_offset, score) hits.
+        """
+        results = [()] * len(tokens)
+        by_length = {}
+        for i, token in enumerate(tokens):
+            by_length.setdefault(len(token), []).append(i)
+
+        for length, positions in by_length.items():
+            columns = np.flatnonzero(self._candidates(length))
+            if columns.size == 0:
+                continue
+            group = [tokens[i] for i in positions]
+            # float64 so scores (and threshold checks) are identical to fuzz.ratio
+            scores = process.cdist(group, [self._lowered[c] for c in columns], scorer=fuzz.ratio,
+                                   dtype=np.float64, workers=self.workers)
+            metrics.inc("fuzzy_comparisons", scores.size)
+            matched = scores >= self.threshold
+            owners = self._owner[columns]
+
+            per_brand = []
+            for b in np.unique(owners):
+                brand_cols = np.flatnonzero(owners == b)
+                brand_matched = matched[:, brand_cols]
+                first = brand_cols[brand_matched.argmax(axis=1)]
+                per_brand.append((b, brand_matched.any(axis=1), first))
+
+            for row, i in enumerate(positions):
+                hits = tuple(
+                    (int(b), int(self._offset[columns[first[row]]]), float(scores[row, first[row]]))
+                    for b, any_hit, first in per_brand if any_hit[row]
+                )
+                results[i] = hits
+        return results
+
+    def lookup(self, tokens):
+        """Return the (brand_index, variant_offset, score) hits for each token."""
+        results = [None] * len(tokens)
+        pending = {}
+        hits = 0
+        with self._lock:
+            for i, token in enumerate(tokens):
+                exact = self._exact.get(token)
+                if exact is not None:
+                    self.exact_hits += 1
+                    hits += 1
+                    results[i] = exact
+                    continue
+                cached = self._cache.get(token)
+                if cached is not None:
+                    self._cache.move_to_end(token)
+                    self.cache_hits += 1
+                    hits += 1
+                    results[i] = cached
+                    continue
+                pending.setdefault(token, []).append(i)
+        # Counted per lookup call rather than per token, to stay cheap
+        metrics.inc("cache_lookups", hits, cache="brand_tokens", result="hit")
+        metrics.inc("cache_lookups", len(tokens) - hits, cache="brand_tokens", result="miss")
+
+        if pending:
+            fresh_tokens = list(pending)
+            fresh = self._score(fresh_tokens)
+            with self._lock:
+                self.cache_misses += len(fresh_tokens)
+                for token, hits in zip(fresh_tokens, fresh):
+                    for i in pending[token]:
+                        results[i] = hits
+                    self._cache[token] = hits
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return results
+
+    def match_tokens(self, tokens, brands=None):
+        """
+        Returns (hits, variant_index, scores), each shaped (len(tokens), len(brands)):
+        whether the token matches the brand, which variant matched first and its score.
+        `brands` selects a subset (default: every brand in the dictionary).
+        """
+        brands = self.brands if brands is None else list(brands)
+        column = {self.brands.index(brand): j for j, brand in enumerate(brands)}
+        shape = (len(tokens), len(brands))
+        hits = np.zeros(shape, dtype=bool)
+        variant_index = np.zeros(shape, dtype=np.int64)
+        scores = np.zeros(shape, dtype=np.float64)
+
+        for i, token_hits in enumerate(self.lookup(tokens)):
+            for b, offset, score in token_hits:
+                j = column.get(b)
+                if j is not None:
+                    hits[i, j] = True
+                    variant_index[i, j] = offset
+                    scores[i, j] = score
+        return hits, variant_index, scores
+
+    def covers(self, brand_keywords):
+        """True if every brand in `brand_keywords` is compiled here with the same variants."""
+        return all(self.brand_keywords.get(brand) == list(variants)
+                   for brand, variants in brand_keywords.items())
+
+    def stats(self):
+        return {
+            "token_cache_size": len(self._cache),
+            "token_cache_hits": self.cache_hits,
+            "token_cache_misses": self.cache_misses,
+            "exact_hits": self.exact_hits,
+        }
+
+_matchers = OrderedDict()
+_matchers_lock = threading.Lock()
+
+def get_matcher(brand_keywords, threshold=80, workers=-1):
+    """
+    Return this process's compiled matcher for a brand dictionary and threshold.
+    `workers` (rapidfuzz cdist threads) applies when the matcher is first built.
+    """
+    key = (tuple((brand, tuple(variants)) for brand, variants in brand_keywords.items()), threshold)
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is None:
+            matcher = BrandMatcher(brand_keywords, threshold, workers=workers)
+            _matchers[key] = matcher
+            while len(_matchers) > MAX_MATCHERS:
+                _matchers.popitem(last=False)
+        else:
+            _matchers.move_to_end(key)
+        return matcher
+
+def match_tokens(tokens, brand_keywords, threshold=80, workers=-1):
+    """
+    Score every token against every brand variant.
+    Returns (hits, variant_index, scores), each shaped (len(tokens), len(brands)).
+    """
+    return get_matcher(brand_keywords, threshold, workers).match_tokens(tokens)
+
+def score_frames(frame_texts, brand_keywords, threshold=80, workers=-1, matcher=None):
+    """
+    Count brand matches per frame, scoring each distinct OCR word only once.
+
+    `matcher` may be a BrandMatcher compiled from a larger dictionary (e.g.
+    every known brand) so its token cache is shared across brand selections.
+
+    Returns (rows, match_log) in the same shape count_brands has always
+    produced: one {"Frame": ..., <brand>: count} row per frame, and per frame
+    a list of {"brand", "word", "matched_variant", "score"} in brand, then
+    word order.
+    """
+    brands = list(brand_keywords)
+    if matcher is None or matcher.threshold != threshold or not matcher.covers(brand_keywords):
+        matcher = get_matcher(brand_keywords, threshold, workers)
+
+    # Tokenise every frame once and intern the words.
+    vocabulary = {}
+    frame_token_ids = []
+    for lines in frame_texts.values():
+        ids = [vocabulary.setdefault(word, len(vocabulary))
+               for line in lines for word in line.lower().split()]
+        frame_token_ids.append(np.array(ids, dtype=np.int64))
+    tokens = list(vocabulary)
+
+    hits, variant_index, scores = matcher.match_tokens(tokens, brands)
+
+    rows, match_log = [], {}
+    for frame, ids in zip(frame_texts, frame_token_ids):
+        frame_hits = hits[ids]
+        counts = frame_hits.sum(axis=0)
+        row = {"Frame": frame}
+        entries = []
+        for b, brand in enumerate(brands):
+            row[brand] = int(counts[b])
+            if not counts[b]:
+                continue
+            variants = brand_keywords[brand]
+            for token_id in ids[frame_hits[:, b]]:
+                entries.append({
+                    "brand": brand,
+                    "word": tokens[token_id],
+                    "matched_variant": variants[variant_index[token_id, b]],
+                    "score": float(scores[token_id, b])
+                })
+        rows.append(row)
+        match_log[frame] = entries
+
+    return rows, match_log
@@ -1,85 +1,277 @@
 import os
-from paddleocr import PaddleOCR
+import cv2
 import json
 import time
+import queue
+import threading
+from collections import deque
 
-def run_ocr_on_frames(frames_dir, output_dir, model):
+from tasks.download_and_extract_frames import frame_name
+from tasks.ocr_engine import OCREngine
+from tasks.ocr_store import OCRStoreWriter, store_path
+
+SAVE_FRAME_POLICIES = ("all", "text", "none")
+
+# Engine tuning; see tasks/ocr_engine.py and benchmarks/bench_ocr_engine.py
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))
+
+def save_result_json(data, output_dir, output_prefix):
     """
-    Run OCR on all frames in a directory and save JSON+image results.
+    Write one frame's OCR result to <output_dir>/<prefix>_result/<prefix>_res.json,
+    the same layout PaddleOCR's save_to_json produces.
     """
-    start_time = time.time()
+    result_folder = os.path.join(output_dir, f"{output_prefix}_result")
+    os.makedirs(result_folder, exist_ok=True)
+    with open(os.path.join(result_folder, f"{output_prefix}_res.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+def _frame_index(output_prefix, default):
+    try:
+        return int(output_prefix.replace("frame_", ""))
+    except ValueError:
+        return default
+
+def _log_throughput(engine):
+    if not engine.frames:
+        return
+    fps, per_core = engine.throughput()
+    print(f"⚡ OCR throughput: {fps:.2f} frames/s, {per_core:.3f} frames/s per core "
+          f"({engine.workers} worker(s) x {engine.cpu_threads} thread(s), batch {engine.batch_size})")
+
+def _queued(frames, queue_size):
+    """
+    Pull items from `frames` in a background thread into a bounded queue and
+    yield them, so decoding overlaps with OCR while memory stays bounded.
+    """
+    frame_queue = queue.Queue(maxsize=queue_size)
+    done = object()
+    stop = threading.Event()
+    producer_error = []
+
+    def produce():
+        try:
+            for item in frames:
+                while not stop.is_set():
+                    try:
+                        frame_queue.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:
+            producer_error.append(e)
+        finally:
+            frame_queue.put(done)
+
+    producer = threading.Thread(target=produce, name="frame-decoder", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = frame_queue.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        stop.set()
+        # Drain so a producer blocked on put() can observe the stop flag.
+        while producer.is_alive():
+            try:
+                frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
+
+    if producer_error:
+        raise producer_error[0]
+
+def _ocr_items(engine, items, image_of, handle, cache=None, deduper=None, vis_dir_of=None):
+    """
+    Run `items` through near-duplicate suppression, the OCR cache and finally
+    the engine. `handle(item, datas)` is called once for every item, in input
+    order: with fresh results, cached results, or the results copied forward
+    from the frame it duplicates.
+    """
+    if deduper is not None:
+        deduper.reset()  # references are indexes into this call's items
+    pending = deque()  # [item, datas] in input order; datas is None until known
+    waiting = {}  # index of a frame to OCR -> its entry and its duplicates' entries
+    reference = {"index": None, "datas": None}
+
+    def flush():
+        while pending and pending[0][1] is not None:
+            item, datas = pending.popleft()
+            handle(item, datas)
+
+    def resolve(index, datas):
+        for entry in waiting.pop(index):
+            entry[1] = datas
+        if reference["index"] == index:
+            reference["datas"] = datas
+        flush()
 
-    print(f"Initializing PaddleOCR with model: {model}")
-    if model == "epoch50":
-        ocr = PaddleOCR(
-            det_model_dir="C:/Users/faiza/OneDrive/Desktop/New Pipeline/backend/tasks/inference/epoch50",
-            rec_model_dir=None,
-            use_doc_orientation_classify=False,
-            use_doc_unwarping=False,
-            use_textline_orientation=False
-        )
-    else:
-        ocr = PaddleOCR(
-            text_detection_model_name=model + "_det",
-            text_recognition_model_name=model + "_rec",
-            use_doc_orientation_classify=False,
-            use_doc_unwarping=False,
-            use_textline_orientation=False
-        )
+    def misses():
+        for index, item in enumerate(items):
+            entry = [item, None]
+            pending.append(entry)
+            image = image_of(item)
+            if deduper is not None:
+                ref = deduper.check(image, index)
+                if ref is not None:
+                    if reference["index"] == ref and reference["datas"] is not None:
+                        entry[1] = reference["datas"]
+                        flush()
+                    else:
+                        waiting[ref].append(entry)
+                    continue
+                reference["index"], reference["datas"] = index, None
+            waiting[index] = [entry]
+
+            key = cache.key(image) if cache is not None else None
+            datas = cache.get(key) if cache is not None else None
+            if datas is not None:
+                resolve(index, datas)
+                continue
+            yield index, key, item
+
+    keyed_vis_dir_of = (lambda keyed: vis_dir_of(keyed[2])) if vis_dir_of else None
+    for (index, key, item), datas in engine.run(misses(), image_of=lambda keyed: image_of(keyed[2]),
+                                                vis_dir_of=keyed_vis_dir_of):
+        if cache is not None:
+            cache.put(key, datas)
+        resolve(index, datas)
+
+def _ocr_stats(processed, engine, cache, deduper):
+    stats = {"frames": processed, "ocr_calls": engine.frames}
+    if cache is not None:
+        stats.update(cache.stats())
+        print(f"🗃️ OCR cache: {cache.hits} hits, {cache.misses} misses")
+    if deduper is not None:
+        stats.update(deduper.stats())
+        print(f"🪞 Near-duplicate frames skipped: {deduper.skipped}/{deduper.checked} "
+              f"(threshold {deduper.threshold})")
+    return stats
+
+def run_ocr_on_frames(frames_dir, output_dir, model, ocr=None, max_files=None,
+                      workers=OCR_WORKERS, batch_size=OCR_BATCH_SIZE, save_images=True, cache=None, deduper=None,
+                      fps=1, save_json=False, regions=None, progress=None):
+    """
+    Run OCR on all frames in a directory and write results to the columnar
+    OCR store (tasks/ocr_store.py), plus visualisation images if `save_images`
+    and per-frame JSON if `save_json`. Timestamps are frame index / `fps`.
+    Frames are OCR'd in batches of `batch_size` across `workers` processes;
+    frames already in `cache` (an OCRCache) are not OCR'd again, and frames
+    `deduper` (a FrameDeduper) flags as near-duplicates reuse earlier results.
+    `regions` limits OCR to regions of interest (see tasks/roi.py).
+    `progress(done, total=None)` is called as frames complete.
+    Returns a dict of run statistics.
+    """
+    start_time = time.time()
 
     os.makedirs(output_dir, exist_ok=True)
 
     image_extensions = ('.jpg', '.jpeg', '.png')
     image_files = [f for f in os.listdir(frames_dir) if f.lower().endswith(image_extensions)]
     image_files.sort()
-    max_files = 50
-    image_files = image_files[:max_files]
+    if max_files:
+        image_files = image_files[:max_files]
 
-    for idx, img_file in enumerate(image_files):
-        output_prefix = os.path.splitext(img_file)[0]
-        result_folder = os.path.join(output_dir, f"{output_prefix}_result")
-        result_json = os.path.join(result_folder, f"{output_prefix}_res.json")
+    items = [(os.path.splitext(f)[0], os.path.join(frames_dir, f)) for f in image_files]
+    first_frame = cv2.imread(items[0][1]) if items else None
+    frame_size = (first_frame.shape[1], first_frame.shape[0]) if first_frame is not None else None
+    vis_dir_of = (lambda item: os.path.join(output_dir, f"{item[0]}_result")) if save_images else None
+    processed = 0
+    if progress:
+        progress(0, len(items))
 
-        # if os.path.isfile(result_json):
-        #     print(f"[{idx+1}/{len(image_files)}] Skipping (cached): {img_file}")
-        #     continue
+    def handle(item, datas):
+        nonlocal processed
+        output_prefix = item[0]
+        processed += 1
+        print(f"[{processed}/{len(items)}] OCRed: {output_prefix}")
+        if progress:
+            progress(processed)
+        frame_index = _frame_index(output_prefix, processed - 1)
+        writer.append(frame_index, round(frame_index / fps, 3), datas, frame_size)
+        if save_json:
+            for data in datas:
+                save_result_json(data, output_dir, output_prefix)
 
-        img_path = os.path.join(frames_dir, img_file)
-        print(f"[{idx+1}/{len(image_files)}] OCRing: {img_file}")
+    with OCRStoreWriter(output_dir) as writer, \
+            OCREngine(model, workers=workers, batch_size=batch_size, ocr=ocr, regions=regions) as engine:
+        _ocr_items(engine, items, lambda item: item[1], handle, cache, deduper, vis_dir_of)
 
-        result = ocr.predict(img_path)
+    print(f"✅ OCR store written to {store_path(output_dir)} ({writer.detection_count} detections)")
+    _log_throughput(engine)
+    print(f"🕒 OCR completed in {round(time.time() - start_time, 2)} seconds.")
+    return _ocr_stats(processed, engine, cache, deduper)
 
-        for i, res in enumerate(result):
-            res.save_to_img(os.path.join(output_dir, f"{output_prefix}_result"))
-            res.save_to_json(os.path.join(output_dir, f"{output_prefix}_result"))
+def run_ocr_on_stream(frames, output_dir, model, ocr=None, frames_dir=None,
+                      save_frames="text", queue_size=8,
+                      workers=OCR_WORKERS, batch_size=OCR_BATCH_SIZE, cache=None, deduper=None,
+                      save_json=False, regions=None, append=False, progress=None, on_frame=None):
+    """
+    Run OCR on frames as they come out of the decoder, without a JPEG round-trip.
+    Results are appended to the columnar OCR store as they arrive (and to
+    per-frame JSON if `save_json`); with `append` they are added to the
+    existing store in `output_dir` instead of replacing it.
 
+    `frames` yields (frame_id, timestamp, ndarray), e.g. iter_frames(video_path).
+    Decoding runs in a background thread feeding a bounded queue, so at most
+    `queue_size` decoded frames (plus the batches in flight) are held in memory.
 
-    # === Merge JSONs into a single text file ===
-    merged_output_file = os.path.join(output_dir, "merged_texts.txt")
-    result_folders = [
-        f for f in os.listdir(output_dir)
-        if os.path.isdir(os.path.join(output_dir, f)) and f.endswith('_result')
-    ]
-    result_folders.sort()
+    `save_frames` controls which frames are written to `frames_dir` as JPEGs:
+    "all", "text" (only frames where OCR found text, i.e. report candidates)
+    or "none". Frames already in `cache` (an OCRCache) are not OCR'd again,
+    and frames `deduper` (a FrameDeduper) flags as near-duplicates reuse the
+    results of the frame they duplicate. `regions` limits OCR to regions of
+    interest (see tasks/roi.py). `progress(done)` is called as frames
+    complete, and `on_frame(frame_id, timestamp, datas, writer)` with each
+    frame's results once stored (`writer` is the OCRStoreWriter, e.g. to
+    checkpoint it). Returns a dict of run statistics.
+    """
+    if save_frames not in SAVE_FRAME_POLICIES:
+        raise ValueError(f"save_frames must be one of {SAVE_FRAME_POLICIES}, got {save_frames!r}")
 
-    with open(merged_output_file, "w", encoding="utf-8") as f_out:
-        for folder in result_folders:
-            folder_path = os.path.join(output_dir, folder)
-            json_filename = folder.replace('_result', '_res.json')
-            json_path = os.path.join(folder_path, json_filename)
+    start_time = time.time()
 
-            if not os.path.isfile(json_path):
-                print(f"Skipping missing JSON: {json_path}")
-                continue
+    os.makedirs(output_dir, exist_ok=True)
+    if frames_dir and save_frames != "none":
+        os.makedirs(frames_dir, exist_ok=True)
+
+    processed, saved = 0, 0
+
+    def handle(item, datas):
+        nonlocal processed, saved
+        frame_id, timestamp, frame = item
+        output_prefix = frame_name(frame_id)
+        print(f"[{processed + 1}] OCRed: {output_prefix}")
+
+        writer.append(frame_id, timestamp, datas, (frame.shape[1], frame.shape[0]))
+        texts = []
+        for data in datas:
+            texts.extend(data.get("rec_texts", []))
+            if save_json:
+                save_result_json(data, output_dir, output_prefix)
 
-            with open(json_path, "r", encoding="utf-8") as jf:
-                data = json.load(jf)
-            rec_texts = data.get("rec_texts", [])
+        if frames_dir and (save_frames == "all" or (save_frames == "text" and texts)):
+            cv2.imwrite(os.path.join(frames_dir, f"{output_prefix}.jpg"), frame)
+            saved += 1
+        processed += 1
+        if progress:
+            progress(processed)
+        if on_frame:
+            on_frame(frame_id, timestamp, datas, writer)
 
-            f_out.write(f"=== {folder} ===\n")
-            for text in rec_texts:
-                f_out.write(text + "\n")
-            f_out.write("\n")
+    with OCRStoreWriter(output_dir, append=append) as writer, \
+            OCREngine(model, workers=workers, batch_size=batch_size, ocr=ocr, regions=regions) as engine:
+        _ocr_items(engine, _queued(frames, queue_size), lambda item: item[2], handle, cache, deduper)
 
-    print(f"✅ Merged OCR texts written to {merged_output_file}")
+    print(f"✅ OCR store written to {store_path(output_dir)} ({writer.detection_count} detections)")
+    _log_throughput(engine)
+    print(f"🖼️ Streamed {processed} frames into OCR ({saved} written to disk).")
     print(f"🕒 OCR completed in {round(time.time() - start_time, 2)} seconds.")
+    stats = _ocr_stats(processed, engine, cache, deduper)
+    stats["frames_saved"] = saved
+    return stats
@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+
+from utils.metrics import metrics
+
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join("downloads", ".ocr_cache"))
+OCR_CACHE_MAX_MB = int(os.getenv("OCR_CACHE_MAX_MB", "512"))
+
+def frame_hash(image):
+    """
+    Content hash of a frame: the raw bytes of an image file, or the pixels of
+    a decoded ndarray (shape included, so crops don't collide).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    else:
+        image = np.ascontiguousarray(image)
+        h.update(str(image.shape).encode())
+        h.update(image.data)
+    return h.hexdigest()
+
+class OCRCache:
+    """
+    Content-addressed, on-disk cache of per-frame OCR results.
+
+    Entries are keyed by frame hash + model name, so identical footage
+    (re-runs, intros, replays, sponsor bumpers) is only OCR'd once per model.
+    The cache is bounded to `max_mb`; when it grows past that, the least
+    recently used entries (by mtime, refreshed on every hit) are deleted.
+    """
+
+    def __init__(self, model, cache_dir=OCR_CACHE_DIR, max_mb=OCR_CACHE_MAX_MB):
+        self.model = str(model)
+        self.root = os.path.join(cache_dir, self.model)
+        self.max_bytes = max_mb * 2**20
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def key(self, image):
+        return frame_hash(image)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Return the cached list of result dicts for `key`, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                datas = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            metrics.inc("cache_lookups", cache="ocr", result="miss")
+            return None
+        self.hits += 1
+        metrics.inc("cache_lookups", cache="ocr", result="hit")
+        return datas
+
+    def put(self, key, datas):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(datas, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += os.path.getsize(path)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Trim to 90% of the budget so we don't rescan on every put.
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        size = sum(e[1] for e in entries)
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            self.evictions += 1
+        self._size = size
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_evictions": self.evictions,
+            "cache_hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,202 @@
+import os
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from tasks.ocr_models import build_ocr, registry_for, result_data
+from tasks.roi import predict_regions
+from utils.metrics import metrics, trace_event
+
+# Registry used inside pool worker processes; set once by _init_worker.
+_worker_registry = None
+
+# Pools are kept alive across jobs so worker processes keep their models loaded.
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _init_worker(ocr_factory, preload=(), cpu_threads=None):
+    global _worker_registry
+    _worker_registry = registry_for(ocr_factory)
+    _worker_registry.preload(preload, cpu_threads=cpu_threads)
+
+def _shared_pool(workers, ocr_factory, preload=()):
+    """The shared pool of `workers` OCR processes; `preload` models load as each process starts."""
+    key = (workers, ocr_factory)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(ocr_factory, tuple(preload), engine_cpu_threads(workers)),
+            )
+        return _pools[key]
+
+def engine_cpu_threads(workers):
+    """CPU threads per OCR worker: the cores split between workers so they don't oversubscribe them."""
+    return max((os.cpu_count() or 1) // max(int(workers), 1), 1)
+
+def preload_models(models, workers=1, ocr_factory=build_ocr):
+    """
+    Load `models` where and as OCREngine(workers=workers) will ask for them
+    (same CPU thread split, so the same registry entry): in this process,
+    or in every process of the shared pool when workers > 1.
+    """
+    workers = max(int(workers), 1)
+    if workers == 1:
+        registry_for(ocr_factory).preload(models, cpu_threads=engine_cpu_threads(1))
+        return
+    pool = _shared_pool(workers, ocr_factory, preload=models)
+    # Processes start on demand: one task per worker, submitted at once,
+    # starts them all (each preloads in its initializer)
+    for future in [pool.submit(os.getpid) for _ in range(workers)]:
+        future.result()
+
+def shutdown_pools():
+    """Stop all shared OCR worker pools (e.g. on worker shutdown)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+        _pools.clear()
+
+def _predict_batch(ocr, images, vis_dirs=None, regions=None):
+    """
+    Run OCR on a list of images (paths or ndarrays) and return, for each
+    image, the list of plain result dicts. With `regions` (see tasks/roi.py)
+    only those crops are OCR'd and no visualisation images are written.
+    """
+    if regions:
+        return predict_regions(ocr, images, regions)
+    if len(images) == 1:
+        results = [list(ocr.predict(images[0]))]
+    else:
+        # Batched predict returns one result object per input image.
+        results = [[res] for res in ocr.predict(images)]
+
+    out = []
+    for i, per_image in enumerate(results):
+        if vis_dirs and vis_dirs[i]:
+            for res in per_image:
+                res.save_to_img(vis_dirs[i])
+        out.append([result_data(res) for res in per_image])
+    return out
+
+def _predict_batch_in_worker(model, cpu_threads, images, vis_dirs=None, regions=None):
+    """_predict_batch in a pool process; returns (results, seconds spent)."""
+    start = time.perf_counter()
+    results = _predict_batch(_worker_registry.get(model, cpu_threads=cpu_threads), images, vis_dirs, regions)
+    return results, time.perf_counter() - start
+
+def _record_batch(frames, started, seconds):
+    metrics.inc("ocr_batches")
+    metrics.inc("ocr_frames", frames)
+    metrics.observe("ocr_frame_seconds", seconds / frames, count=frames)
+    trace_event("ocr batch", started, seconds, frames=frames)
+
+class OCREngine:
+    """
+    Batched OCR over a stream of frames.
+
+    With workers=1 OCR runs in-process. With workers>1 batches are spread
+    over a shared process pool (kept alive across jobs), each process holding
+    its own long-lived PaddleOCR, while keeping results in input order.
+    CPU threads are split between workers so they don't oversubscribe cores.
+    Models come from the process's ModelRegistry, so they load only once.
+    `regions` restricts OCR to regions of interest (tasks/roi.py); results
+    are mapped back to frame coordinates.
+    """
+
+    def __init__(self, model, workers=1, batch_size=8, ocr=None, ocr_factory=build_ocr, cpu_threads=None,
+                 regions=None):
+        self.model = model
+        self.regions = regions
+        self.workers = max(int(workers), 1)
+        self.batch_size = max(int(batch_size), 1)
+        self.cpu_threads = cpu_threads or engine_cpu_threads(self.workers)
+        self.frames = 0
+        # Time spent in predict, summed over pool processes (not decoding or consumers)
+        self.seconds = 0.0
+        self._pool = None
+        self._ocr = ocr
+
+        if self.workers > 1:
+            self._pool = _shared_pool(self.workers, ocr_factory)
+        elif self._ocr is None:
+            self._ocr = registry_for(ocr_factory).get(model, cpu_threads=self.cpu_threads)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Shared pools and registry models outlive the engine on purpose.
+        self._pool = None
+
+    @property
+    def cores(self):
+        return self.cpu_threads if self._pool is None else self.workers * self.cpu_threads
+
+    def throughput(self):
+        """Return (frames per second, frames per second per core) while predicting, all workers busy."""
+        fps = self.frames * (1 if self._pool is None else self.workers) / self.seconds if self.seconds else 0.0
+        return fps, fps / max(self.cores, 1)
+
+    def _batches(self, items):
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _collect(self, batch, future):
+        results, seconds = future.result()
+        # Timed in the pool process; traced as ending when it was collected
+        _record_batch(len(batch), time.time() - seconds, seconds)
+        self.seconds += seconds
+        return results
+
+    def run(self, items, image_of=lambda item: item, vis_dir_of=None):
+        """
+        OCR `items`, yielding (item, [result dicts]) in input order.
+        `image_of` maps an item to the path/ndarray handed to PaddleOCR,
+        `vis_dir_of` optionally maps it to a folder for visualisation images.
+        """
+        if self._pool is None:
+            for batch in self._batches(items):
+                images = [image_of(item) for item in batch]
+                vis_dirs = [vis_dir_of(item) for item in batch] if vis_dir_of else None
+                started, batch_start = time.time(), time.perf_counter()
+                results = _predict_batch(self._ocr, images, vis_dirs, self.regions)
+                seconds = time.perf_counter() - batch_start
+                _record_batch(len(batch), started, seconds)
+                self.seconds += seconds
+                for item, datas in zip(batch, results):
+                    self.frames += 1
+                    yield item, datas
+            return
+
+        # Keep a bounded window of batches in flight so memory stays flat.
+        pending = deque()
+        max_in_flight = self.workers * 2
+        for batch in self._batches(items):
+            images = [image_of(item) for item in batch]
+            vis_dirs = [vis_dir_of(item) for item in batch] if vis_dir_of else None
+            pending.append((batch, self._pool.submit(_predict_batch_in_worker, self.model, self.cpu_threads,
+                                                     images, vis_dirs, self.regions)))
+            while len(pending) >= max_in_flight:
+                done_batch, future = pending.popleft()
+                for item, datas in zip(done_batch, self._collect(done_batch, future)):
+                    self.frames += 1
+                    yield item, datas
+        while pending:
+            done_batch, future = pending.popleft()
+            for item, datas in zip(done_batch, self._collect(done_batch, future)):
+                self.frames += 1
+                yield item, datas
@@ -0,0 +1,113 @@
+import os
+import gc
+import time
+import threading
+from collections import OrderedDict
+
+import psutil
+from paddleocr import PaddleOCR
+
+# How many OCR models a worker process keeps loaded before evicting the LRU one
+OCR_MAX_MODELS = int(os.getenv("OCR_MAX_MODELS", "2"))
+
+def build_ocr(model, cpu_threads=None):
+    """
+    Construct a PaddleOCR instance for the given model name.
+    """
+    print(f"Initializing PaddleOCR with model: {model}")
+    options = {"cpu_threads": cpu_threads} if cpu_threads else {}
+    if model == "epoch50":
+        return PaddleOCR(
+            det_model_dir="C:/Users/faiza/OneDrive/Desktop/New Pipeline/backend/tasks/inference/epoch50",
+            rec_model_dir=None,
+            use_doc_orientation_classify=False,
+            use_doc_unwarping=False,
+            use_textline_orientation=False,
+            **options
+        )
+    return PaddleOCR(
+        text_detection_model_name=model + "_det",
+        text_recognition_model_name=model + "_rec",
+        use_doc_orientation_classify=False,
+        use_doc_unwarping=False,
+        use_textline_orientation=False,
+        **options
+    )
+
+def result_data(res):
+    """Return the plain dict (rec_texts, rec_scores, ...) of a PaddleOCR result."""
+    data = res.json
+    return data.get("res", data)
+
+class ModelRegistry:
+    """
+    Process-wide cache of OCR model instances keyed by model name.
+
+    Models are built on first use (or up front via preload) and kept for the
+    life of the process, so jobs don't pay the weight-loading cost again.
+    When more than `max_models` are loaded the least recently used is evicted.
+    """
+
+    def __init__(self, factory=build_ocr, max_models=OCR_MAX_MODELS):
+        self.factory = factory
+        self.max_models = max(int(max_models), 1)
+        self._models = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, model, cpu_threads=None):
+        key = (model, cpu_threads)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self._stats[key]["hits"] += 1
+                return self._models[key]
+
+            process = psutil.Process()
+            rss_before = process.memory_info().rss
+            start = time.perf_counter()
+            ocr = self.factory(model, cpu_threads=cpu_threads)
+            load_seconds = time.perf_counter() - start
+            rss_delta = process.memory_info().rss - rss_before
+
+            self._models[key] = ocr
+            self._stats[key] = {"load_seconds": round(load_seconds, 3), "rss_bytes": rss_delta, "hits": 0}
+            print(f"🧠 Loaded OCR model {model} in {load_seconds:.2f}s (+{rss_delta / 2**20:.0f} MB RSS)")
+
+            while len(self._models) > self.max_models:
+                (old_model, old_threads), _ = self._models.popitem(last=False)
+                self._stats.pop((old_model, old_threads), None)
+                print(f"♻️ Evicted OCR model {old_model} (LRU)")
+                gc.collect()
+            return ocr
+
+    def preload(self, models, cpu_threads=None):
+        for model in models:
+            self.get(model, cpu_threads=cpu_threads)
+
+    def stats(self):
+        """Load time, RSS growth at load and cache hits for each loaded model."""
+        with self._lock:
+            return {
+                model if threads is None else f"{model}@{threads}": dict(stat)
+                for (model, threads), stat in self._stats.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+        gc.collect()
+
+registry = ModelRegistry()
+_registries = {build_ocr: registry}
+
+def registry_for(factory):
+    """Return the process-wide registry for models built by `factory`."""
+    if factory not in _registries:
+        _registries[factory] = ModelRegistry(factory)
+    return _registries[factory]
+
+def get_ocr(model, cpu_threads=None):
+    """Return this process's long-lived OCR instance for `model`."""
+    return registry.get(model, cpu_threads=cpu_threads)
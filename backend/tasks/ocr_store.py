@@ -0,0 +1,271 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+STORE_DIRNAME = "ocr_store"
+STORE_VERSION = 1
+
+# One record per sampled frame, in the order frames were written.
+FRAME_DTYPE = np.dtype([
+    ("frame", "<i4"),            # sampled frame index (frame_XXXX)
+    ("timestamp", "<f8"),        # seconds from the start of the video
+    ("first_detection", "<i8"),  # row of its first detection
+    ("detections", "<i4"),       # number of detections
+])
+
+# One record per recognised text line.
+DETECTION_DTYPE = np.dtype([
+    ("frame", "<i4"),
+    ("score", "<f4"),
+    ("box", "<f4", (4,)),        # x0, y0, x1, y1 in frame pixels
+    ("text_offset", "<i8"),      # byte offset into texts.bin
+    ("text_length", "<i4"),
+])
+
+def store_path(ocr_output_dir):
+    return os.path.join(ocr_output_dir, STORE_DIRNAME)
+
+def store_exists(ocr_output_dir):
+    """A store is readable once its meta.json has been written (on close, or a checkpoint)."""
+    return os.path.isfile(os.path.join(store_path(ocr_output_dir), "meta.json"))
+
+def frame_key(frame_index):
+    """Frame label used in brand_analysis.csv and the match log."""
+    return f"frame_{int(frame_index):04d}_result"
+
+def _boxes(data, count):
+    """Axis-aligned boxes for a PaddleOCR result dict, from rec_boxes or rec_polys."""
+    boxes = data.get("rec_boxes")
+    if boxes is not None and len(boxes) == count:
+        return np.asarray(boxes, dtype=np.float32).reshape(count, 4)
+    polys = data.get("rec_polys")
+    if polys is not None and len(polys) == count:
+        out = np.zeros((count, 4), dtype=np.float32)
+        for i, poly in enumerate(polys):
+            poly = np.asarray(poly, dtype=np.float32).reshape(-1, 2)
+            out[i] = (poly[:, 0].min(), poly[:, 1].min(), poly[:, 0].max(), poly[:, 1].max())
+        return out
+    return np.zeros((count, 4), dtype=np.float32)
+
+class OCRStoreWriter:
+    """
+    Appends per-frame OCR results to a compact columnar store as they are
+    produced: fixed-size frame and detection records plus a UTF-8 text blob.
+    Frames may arrive in any order; readers sort by timestamp. With `append`,
+    frames are added to an existing complete store instead of replacing it.
+    """
+
+    def __init__(self, ocr_output_dir, append=False):
+        self.path = store_path(ocr_output_dir)
+        os.makedirs(self.path, exist_ok=True)
+        meta_path = os.path.join(self.path, "meta.json")
+        meta = {}
+        if os.path.exists(meta_path):
+            if append:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            os.remove(meta_path)
+        mode = "ab" if meta else "wb"
+        self._frames = open(os.path.join(self.path, "frames.bin"), mode)
+        self._detections = open(os.path.join(self.path, "detections.bin"), mode)
+        self._texts = open(os.path.join(self.path, "texts.bin"), mode)
+        self.frame_count = meta.get("frames", 0)
+        self.detection_count = meta.get("detections", 0)
+        self.text_bytes = meta.get("text_bytes", 0)
+        self.frame_size = (meta["frame_width"], meta["frame_height"]) if meta.get("frame_width") else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(commit=exc_type is None)
+
+    def append(self, frame_index, timestamp, datas, frame_size=None):
+        """Add one frame's OCR result dicts (rec_texts, rec_scores, rec_boxes...)."""
+        if frame_size and self.frame_size is None:
+            self.frame_size = (int(frame_size[0]), int(frame_size[1]))
+
+        records = []
+        for data in datas:
+            texts = data.get("rec_texts", []) or []
+            if not texts:
+                continue
+            scores = data.get("rec_scores") or [0.0] * len(texts)
+            boxes = _boxes(data, len(texts))
+            for text, score, box in zip(texts, scores, boxes):
+                encoded = text.encode("utf-8")
+                records.append((frame_index, score, box, self.text_bytes, len(encoded)))
+                self._texts.write(encoded)
+                self.text_bytes += len(encoded)
+
+        frame = np.array([(frame_index, timestamp, self.detection_count, len(records))], dtype=FRAME_DTYPE)
+        self._frames.write(frame.tobytes())
+        if records:
+            self._detections.write(np.array(records, dtype=DETECTION_DTYPE).tobytes())
+        self.frame_count += 1
+        self.detection_count += len(records)
+
+    def checkpoint(self):
+        """
+        Make the frames appended so far readable (e.g. a live job's rolling
+        report) without closing: data is flushed before meta.json, whose
+        counts readers map, is replaced.
+        """
+        for f in (self._frames, self._detections, self._texts):
+            f.flush()
+        self._write_meta()
+
+    def close(self, commit=True):
+        for f in (self._frames, self._detections, self._texts):
+            f.close()
+        if commit:
+            self._write_meta()
+
+    def _write_meta(self):
+        meta = {
+            "version": STORE_VERSION,
+            "frames": self.frame_count,
+            "detections": self.detection_count,
+            "text_bytes": self.text_bytes,
+            "frame_width": self.frame_size[0] if self.frame_size else None,
+            "frame_height": self.frame_size[1] if self.frame_size else None,
+        }
+        tmp_path = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, "meta.json"))
+
+def _memmap(path, dtype, count):
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+class OCRStore:
+    """
+    Memory-mapped reader for a store written by OCRStoreWriter.
+
+    `frames` is sorted by timestamp; `detections` rows for frames[i] are
+    detections[frames[i]["first_detection"] : + frames[i]["detections"]].
+    """
+
+    def __init__(self, ocr_output_dir):
+        self.path = store_path(ocr_output_dir)
+        with open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        frames = _memmap(os.path.join(self.path, "frames.bin"), FRAME_DTYPE, self.meta["frames"])
+        order = np.lexsort((frames["frame"], frames["timestamp"]))
+        self.frames = frames[order]
+        self.detections = _memmap(os.path.join(self.path, "detections.bin"), DETECTION_DTYPE,
+                                  self.meta["detections"])
+        self._texts = _memmap(os.path.join(self.path, "texts.bin"), np.uint8, self.meta["text_bytes"])
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def frame_size(self):
+        """(width, height) of the OCR'd frames, if known."""
+        if self.meta.get("frame_width"):
+            return self.meta["frame_width"], self.meta["frame_height"]
+        return None
+
+    def text(self, row):
+        det = self.detections[row]
+        start = int(det["text_offset"])
+        return bytes(self._texts[start:start + int(det["text_length"])]).decode("utf-8")
+
+    def frame_detections(self, i):
+        frame = self.frames[i]
+        start = int(frame["first_detection"])
+        return self.detections[start:start + int(frame["detections"])]
+
+    def frame_texts(self):
+        """OrderedDict of frame label -> recognised text lines, in time order."""
+        out = OrderedDict()
+        for frame in self.frames:
+            start = int(frame["first_detection"])
+            out[frame_key(frame["frame"])] = [self.text(row) for row in range(start, start + int(frame["detections"]))]
+        return out
+
+    def timestamps(self):
+        """OrderedDict of frame label -> timestamp (seconds), in time order."""
+        return OrderedDict((frame_key(f["frame"]), float(f["timestamp"])) for f in self.frames)
+
+def merge_stores(ocr_output_dirs, output_dir):
+    """
+    Concatenate the OCR stores of consecutive chunks of a video into one
+    store in `output_dir`. A frame sampled by two chunks (at their shared
+    boundary) is kept once. Returns the number of frames written.
+    """
+    seen = set()
+    with OCRStoreWriter(output_dir) as writer:
+        for ocr_output_dir in ocr_output_dirs:
+            store = OCRStore(ocr_output_dir)
+            for i, frame in enumerate(store.frames):
+                if int(frame["frame"]) in seen:
+                    continue
+                seen.add(int(frame["frame"]))
+                start = int(frame["first_detection"])
+                detections = store.frame_detections(i)
+                writer.append(int(frame["frame"]), float(frame["timestamp"]), [{
+                    "rec_texts": [store.text(row) for row in range(start, start + len(detections))],
+                    "rec_scores": detections["score"].tolist(),
+                    "rec_boxes": detections["box"].tolist(),
+                }], store.frame_size)
+    return len(seen)
+
+def _load_legacy_merged_texts(path):
+    out, current = OrderedDict(), None
+    if not os.path.isfile(path):
+        return out
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("===") and line.endswith("==="):
+                current = line.strip("= ").strip()
+                out[current] = []
+            elif line and current:
+                out[current].append(line)
+    return out
+
+def load_frame_texts(ocr_output_dir):
+    """
+    Frame label -> text lines for an OCR output directory. Reads the columnar
+    store, or a legacy merged_texts.txt for runs cached before the store existed.
+    """
+    if store_exists(ocr_output_dir):
+        return OCRStore(ocr_output_dir).frame_texts()
+    return _load_legacy_merged_texts(os.path.join(ocr_output_dir, "merged_texts.txt"))
+
+def store_fingerprint(ocr_output_dir):
+    """
+    Key identifying the OCR results currently in `ocr_output_dir`; it changes
+    whenever the store (or a legacy merged_texts.txt) is rewritten.
+    """
+    if store_exists(ocr_output_dir):
+        path = os.path.join(store_path(ocr_output_dir), "meta.json")
+    else:
+        path = os.path.join(ocr_output_dir, "merged_texts.txt")
+    if not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        digest = hashlib.blake2b(f.read(), digest_size=16)
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode("ascii"))
+    return digest.hexdigest()
+
+def load_frame_timestamps(ocr_output_dir):
+    """
+    Frame label -> timestamp in seconds. Legacy merged_texts.txt runs carry
+    no timestamps, so their frame numbers are taken as seconds (1 FPS).
+    """
+    if store_exists(ocr_output_dir):
+        return OCRStore(ocr_output_dir).timestamps()
+    return OrderedDict((label, float(label.split("_")[1]))
+                       for label in _load_legacy_merged_texts(os.path.join(ocr_output_dir, "merged_texts.txt")))
+
+def has_ocr_results(ocr_output_dir):
+    return store_exists(ocr_output_dir) or os.path.isfile(os.path.join(ocr_output_dir, "merged_texts.txt"))
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+
+# Where stage tasks publish job progress
+PROGRESS_DIR = os.getenv("PROGRESS_DIR", os.path.join("downloads", ".progress"))
+# Minimum seconds between progress writes while a stage is running
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "1"))
+
+# Rough share of a job's wall time per stage, used to turn stage progress
+# into a percentage (only the stages a job plans to run count).
+STAGE_WEIGHTS = {
+    "download": 10,
+    "extract": 10,
+    "ocr": 60,
+    "merge": 2,
+    "live": 60,
+    "count": 4,
+    "track": 2,
+    "visuals": 6,
+    "report": 6,
+    "email": 2,
+}
+PIPELINE_STAGES = tuple(STAGE_WEIGHTS)
+
+PLAN_FILENAME = "plan.json"
+# Documents a job publishes next to its progress (not stage entries)
+ATTACHMENT_SUFFIX = ".attachment"
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+class JobProgress:
+    """
+    Progress of one pipeline job as published by its stage tasks, read back
+    by the status endpoint. Each stage (or each chunk of a chunked stage,
+    `part`) has its own small JSON file under PROGRESS_DIR/<job_id>,
+    replaced atomically: tasks on different workers never write the same
+    file, and readers always see a whole one. A job without an id (run
+    in-process) tracks nothing.
+    """
+
+    def __init__(self, job_id, root=PROGRESS_DIR, interval=PROGRESS_INTERVAL):
+        self.dir = os.path.join(root, job_id) if job_id else None
+        self.interval = interval
+        self.entries = {}
+        self.written = {}
+
+    def _path(self, name):
+        return os.path.join(self.dir, f"{name}.json")
+
+    @staticmethod
+    def _name(stage, part=None):
+        return stage if part is None else f"{stage}@{part}"
+
+    def _save(self, name, force=True):
+        if not self.dir:
+            return
+        now = time.monotonic()
+        if not force and now - self.written.get(name, 0.0) < self.interval:
+            return
+        _write_json(self._path(name), self.entries[name])
+        self.written[name] = now
+
+    def plan(self, stages, parts=None):
+        """
+        Record the stages this job will run, in order, and how many parts
+        (chunks) each chunked stage is split into.
+        """
+        if self.dir:
+            _write_json(self._path("plan"), {"stages": list(stages), "parts": parts or {}})
+
+    def start(self, stage, total=None, part=None):
+        name = self._name(stage, part)
+        self.entries[name] = {"status": "running", "done": 0, "total": total,
+                              "started": time.time(), "finished": None}
+        self._save(name)
+
+    def update(self, stage, done, total=None, part=None):
+        """Set a running stage's `done` count (and `total`, once known); writes are throttled."""
+        entry = self.entries.get(self._name(stage, part))
+        if entry is None:
+            return
+        entry["done"] = done
+        if total is not None:
+            entry["total"] = total
+        self._save(self._name(stage, part), force=False)
+
+    def reporter(self, stage, part=None):
+        """`update` bound to one stage, as a `progress(done, total=None)` callback."""
+        return lambda done, total=None: self.update(stage, done, total=total, part=part)
+
+    def finish(self, stage, part=None, status="done", message=None):
+        name = self._name(stage, part)
+        entry = self.entries.setdefault(name, {"done": 0, "total": None, "started": time.time()})
+        entry.update({"status": status, "finished": time.time()})
+        if status == "done" and entry.get("total"):
+            entry["done"] = entry["total"]
+        if message:
+            entry["message"] = message
+        self._save(name)
+
+    def attach(self, name, data):
+        """Publish a document with the job's progress, e.g. a live job's running counts."""
+        if self.dir:
+            _write_json(os.path.join(self.dir, name + ATTACHMENT_SUFFIX), data)
+
+    def attachment(self, name):
+        return _read_json(os.path.join(self.dir, name + ATTACHMENT_SUFFIX)) if self.dir else None
+
+    @contextmanager
+    def track(self, stage, total=None, part=None):
+        """Mark `stage` running for the duration of the block, then done (or failed, re-raising)."""
+        self.start(stage, total=total, part=part)
+        try:
+            yield self
+        except Exception as e:
+            self.finish(stage, part=part, status="failed", message=str(e))
+            raise
+        self.finish(stage, part=part)
+
+    def snapshot(self):
+        """
+        {"percent", "stage", "stages"} for the status endpoint: overall
+        percent complete (by STAGE_WEIGHTS), the stage currently running (or
+        last touched), and per stage its status, done/total and seconds.
+        """
+        plan = _read_json(self._path("plan")) if self.dir else None
+        if not plan or not os.path.isdir(self.dir):
+            return {"percent": 0.0, "stage": None, "stages": {}}
+
+        entries = {}
+        for filename in os.listdir(self.dir):
+            if filename.endswith(".json") and filename != PLAN_FILENAME:
+                entry = _read_json(os.path.join(self.dir, filename))
+                if entry:
+                    entries.setdefault(filename[:-len(".json")].split("@")[0], []).append(entry)
+
+        now = time.time()
+        stages = {}
+        weighted, total_weight = 0.0, 0
+        for stage in plan["stages"]:
+            parts = entries.get(stage, [])
+            expected = max(plan["parts"].get(stage, 1), len(parts))
+            if any(p["status"] == "failed" for p in parts):
+                status = "failed"
+            elif len(parts) == expected and all(p["status"] == "done" for p in parts):
+                status = "done"
+            else:
+                status = "running" if parts else "pending"
+
+            info = {"status": status}
+            if parts:
+                finished = [p["finished"] for p in parts if p.get("finished")]
+                ended = max(finished) if status != "running" and finished else now
+                info["seconds"] = round(ended - min(p["started"] for p in parts), 2)
+                totals = [p.get("total") for p in parts]
+                if any(totals):
+                    info["done"] = sum(p["done"] for p in parts)
+                    info["total"] = sum(totals) if all(totals) and len(parts) == expected else None
+                messages = [p["message"] for p in parts if p.get("message")]
+                if messages:
+                    info["message"] = messages[0]
+            stages[stage] = info
+
+            fraction = sum(1.0 if p["status"] == "done" else
+                           min(p["done"] / p["total"], 1.0) if p.get("total") else 0.0
+                           for p in parts) / expected
+            weight = STAGE_WEIGHTS.get(stage, 1)
+            weighted += weight * fraction
+            total_weight += weight
+
+        active = [s for s, info in stages.items() if info["status"] in ("running", "failed")]
+        touched = [s for s, info in stages.items() if info["status"] != "pending"]
+        current = active[0] if active else (touched[-1] if touched else None)
+        percent = round(100.0 * weighted / total_weight, 1) if total_weight else 0.0
+        return {"percent": percent, "stage": current, "stages": stages}
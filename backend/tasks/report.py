@@ -2,9 +2,12 @@ import os
 import json
 from datetime import datetime
 from fpdf import FPDF
+import numpy as np
 import pandas as pd
 
-FPS = 1
+from tasks.analytics import analyze, load_analysis
+from tasks.ocr_store import load_frame_texts
+
 IMAGE_EXTS = [".png", ".jpg", ".jpeg"]
 
 COLORS = {
@@ -17,13 +20,6 @@ COLORS = {
     'text_light': (127, 140, 141)
 }
 
-def frame_to_seconds(frame_name, fps=1):
-    try:
-        frame_number = int(frame_name.replace("frame_", "").replace("_result", ""))
-        return round(frame_number / fps, 2)
-    except Exception:
-        return 0
-
 def find_frame_image(frame_name, frames_dir):
     base = frame_name.replace("_result", "")
     for ext in IMAGE_EXTS:
@@ -32,19 +28,6 @@ def find_frame_image(frame_name, frames_dir):
             return candidate
     return None
 
-def _load_frame_texts(path):
-    out, current = {}, None
-    if not os.path.isfile(path): return out
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith("===") and line.endswith("==="):
-                current = line.strip("= ").strip()
-                out[current] = []
-            elif line and current:
-                out[current].append(line)
-    return out
-
 class EnhancedPDF(FPDF):
     def __init__(self):
         super().__init__()
@@ -125,29 +108,81 @@ class EnhancedPDF(FPDF):
             self.ln()
         self.ln(5)
 
-    def add_key_metrics_summary(self, df_totals, tot_col):
+    def add_key_metrics_summary(self, df_totals, tot_col, stats):
         top = df_totals.iloc[0]
         metrics_text = f"""
 Total Brands Analyzed: {len(df_totals)}
 Top Performing Brand: {top['Brand']} (Score: {round(top[tot_col], 2)})
 Average Visibility Score: {round(df_totals[tot_col].mean(), 2)}
-Analysis Duration: 300 seconds (estimated)
+Analysis Duration: {round(stats['duration'])} seconds ({stats['samples']} frames sampled)
         """.strip()
         self.create_info_box("KEY METRICS", metrics_text, COLORS['accent'])
 
-    def add_methodology_section(self):
-        self.create_info_box("METHODOLOGY", """This report uses PaddleOCR and fuzzy matching to analyze frame-level brand visibility in broadcast footage.
-Frames are extracted at 1 FPS and processed with OCR, then matched against known brand variants.""")
+    def add_methodology_section(self, stats):
+        gaps = np.diff(stats["df"]["TimeSeconds"].to_numpy())
+        if gaps.size and np.ptp(gaps) > 0.01:
+            sampling = (f"Frames are sampled adaptively ({gaps.min():g}s to {gaps.max():g}s apart): a coarse pass, "
+                        "then denser sampling around brand text and scene cuts. Scores are weighted by the time "
+                        "each frame stands for.")
+        else:
+            sampling = f"Frames are sampled every {gaps[0] if gaps.size else 1:g}s."
+        self.create_info_box("METHODOLOGY", f"""This report uses PaddleOCR and fuzzy matching to analyze frame-level brand visibility in broadcast footage.
+{sampling} Each frame is processed with OCR, then matched against known brand variants.""")
 
-    def add_brand_analysis_page(self, brand, frame_texts, max_frame, min_frame, max_count, min_count, frames_dir, match_log):
+    def add_exposure_section(self, df_exposure):
+        """Exposure time, screen share and visibility per brand, from the tracking stage"""
+        self.create_section_header("ON-SCREEN EXPOSURE")
+        self.set_font("Arial", "", 9)
+        self.multi_cell(0, 5, "Detections of a brand are linked across consecutive frames into tracks. Exposure is "
+                              "the time at least one track was on screen; screen share is the part of the frame its "
+                              "text covers while visible; the visibility score weights each visible second by "
+                              "detection confidence.")
+        self.ln(3)
+        df_exposure = df_exposure.sort_values("Exposure Seconds", ascending=False)
+        table_data = [[
+            row["Brand"],
+            f"{row['Exposure Seconds']:.1f}s",
+            f"{int(row['Tracks'])}",
+            f"{row['Longest Track Seconds']:.1f}s",
+            "n/a" if pd.isna(row["Avg Screen Share"]) else f"{row['Avg Screen Share'] * 100:.2f}%",
+            f"{row['Visibility Score']:.1f}",
+        ] for _, row in df_exposure.iterrows()]
+        self.create_styled_table(["Brand", "Exposure", "Tracks", "Longest", "Screen Share", "Visibility"],
+                                 table_data, col_widths=[45, 29, 24, 29, 34, 29])
+
+    def add_insights_section(self, stats):
+        """Add automated insights based on the precomputed analytics"""
+        self.add_page()
+        self.create_section_header("KEY INSIGHTS", COLORS['accent'])
+
+        insights = []
+
+        # Peak detection timing
+        for brand, peak_time in stats["peak_times"].items():
+            insights.append(f"• {brand} reached peak visibility at {round(peak_time, 2)}s")
+
+        # Detection consistency
+        for brand, detection_rate in stats["detection_rates"].items():
+            if detection_rate > 0:
+                insights.append(f"• {brand} appears in {detection_rate:.1f}% of analyzed frames")
+
+        # Co-occurrence analysis
+        if stats["co_occurrence_rate"] > 0:
+            insights.append(f"• Multiple brands appear together in {stats['co_occurrence_rate']:.1f}% of frames")
+
+        insights_text = "\n".join(insights) if insights else "No significant patterns detected in the current dataset."
+        self.create_info_box("AUTOMATED INSIGHTS", insights_text)
+
+    def add_brand_analysis_page(self, brand, frame_texts, max_frame, min_frame, max_count, min_count, frames_dir, match_log,
+                                timestamps):
         self.add_page()
         self.create_section_header(f"{brand.upper()} - DETAILED ANALYSIS", COLORS['secondary'])
 
         self.create_styled_table(
             ["Metric", "Frame (Time)", "Detection Count"],
             [
-                ["Peak Frame", f"{max_frame} ({frame_to_seconds(max_frame)}s)" if max_frame else "N/A", str(max_count)],
-                ["Lowest Frame", f"{min_frame} ({frame_to_seconds(min_frame)}s)" if min_frame else "N/A", str(min_count)]
+                ["Peak Frame", f"{max_frame} ({timestamps.get(max_frame, 0):g}s)" if max_frame else "N/A", str(max_count)],
+                ["Lowest Frame", f"{min_frame} ({timestamps.get(min_frame, 0):g}s)" if min_frame else "N/A", str(min_count)]
             ],
             [50, 90, 50]
         )
@@ -190,17 +225,17 @@ def generate_enhanced_report(base_dir, brand_keywords=None):
         with open(match_log_path, "r", encoding="utf-8") as f:
             match_log = json.load(f)
 
-        frame_texts = _load_frame_texts(os.path.join(base_dir, "paddle_output", "merged_texts.txt"))
+        frame_texts = load_frame_texts(os.path.join(base_dir, "paddle_output"))
         df_totals = pd.read_csv(os.path.join(base_dir, "brand_totals.csv"))
         analysis_csv = os.path.join(base_dir, "brand_analysis.csv")
-        df_analysis = pd.read_csv(analysis_csv)
+        df_analysis = load_analysis(analysis_csv)
         frames_dir = os.path.join(base_dir, "frames")
         plots_dir = os.path.join(base_dir, "plots")
         output_pdf = os.path.join(base_dir, "brand_report_enhanced.pdf")
 
         df_totals.columns = df_totals.columns.str.strip()
         tot_col = [c for c in df_totals.columns if "Total" in c][0]
-        brands = [c for c in df_analysis.columns if c != "Frame"]
+        stats = analyze(df_analysis)
         df_totals = df_totals.sort_values(tot_col, ascending=False)
 
         pdf = EnhancedPDF()
@@ -211,8 +246,8 @@ def generate_enhanced_report(base_dir, brand_keywords=None):
         summary = f"This automated analysis covers broadcast footage.\nTop brand: {top_brand} (score: {top_score})."
         pdf.multi_cell(0, 6, summary.strip())
         pdf.ln(5)
-        pdf.add_key_metrics_summary(df_totals, tot_col)
-        pdf.add_methodology_section()
+        pdf.add_key_metrics_summary(df_totals, tot_col, stats)
+        pdf.add_methodology_section(stats)
 
         pdf.add_page()
         pdf.create_section_header("BRAND VISIBILITY RESULTS")
@@ -228,6 +263,9 @@ def generate_enhanced_report(base_dir, brand_keywords=None):
                 f"{round(pct, 1)}%"
             ])
         pdf.create_styled_table(["Brand", "Total", "Rank", "Share %"], table_data)
+        exposure_csv = os.path.join(base_dir, "brand_exposure.csv")
+        if os.path.exists(exposure_csv):
+            pdf.add_exposure_section(pd.read_csv(exposure_csv))
 
         # Enhanced plot integration with better descriptions and layout
         plot_configs = [
@@ -249,7 +287,7 @@ def generate_enhanced_report(base_dir, brand_keywords=None):
             {
                 "file": "brand_frequency_analysis.png",
                 "title": "BRAND DETECTION FREQUENCY ANALYSIS",
-                "description": "Comparison of total brand detections (left) vs detection consistency across frames (right)."
+                "description": "Comparison of total brand detections (left) vs how long each brand was on screen (right)."
             },
             {
                 "file": "brand_peak_analysis.png",
@@ -283,46 +321,8 @@ def generate_enhanced_report(base_dir, brand_keywords=None):
                 pdf.image(plot_path, x=20, w=img_width, h=img_height)
                 pdf.ln(10)
 
-        # Optional: Add a summary insights section
-        def add_insights_section(pdf, df_analysis, brand_columns):
-            """Add automated insights based on the data analysis"""
-            pdf.add_page()
-            pdf.create_section_header("KEY INSIGHTS", COLORS['accent'])
-            
-            insights = []
-            
-            # Peak detection timing
-            for brand in brand_columns:
-                brand_data = df_analysis[brand]
-                if brand_data.max() > 0:
-                    peak_frame = brand_data.idxmax()
-                    peak_time = frame_to_seconds(peak_frame)
-                    insights.append(f"• {brand} reached peak visibility at {peak_time}s")
-            
-            # Detection consistency
-            for brand in brand_columns:
-                detection_rate = (df_analysis[brand] > 0).mean() * 100
-                if detection_rate > 0:
-                    insights.append(f"• {brand} appears in {detection_rate:.1f}% of analyzed frames")
-            
-            # Co-occurrence analysis
-            co_occur_count = 0
-            for _, row in df_analysis.iterrows():
-                active_brands = sum(1 for brand in brand_columns if row[brand] > 0)
-                if active_brands > 1:
-                    co_occur_count += 1
-            
-            if co_occur_count > 0:
-                co_occur_rate = (co_occur_count / len(df_analysis)) * 100
-                insights.append(f"• Multiple brands appear together in {co_occur_rate:.1f}% of frames")
-            
-            # Create insights text
-            insights_text = "\n".join(insights) if insights else "No significant patterns detected in the current dataset."
-            
-            pdf.create_info_box("AUTOMATED INSIGHTS", insights_text)
-
         # Add this call before the individual brand analysis in generate_enhanced_report():
-        # add_insights_section(pdf, df_analysis, brands)
+        # pdf.add_insights_section(stats)
         pdf.output(output_pdf)
         print(f"✅ PDF saved to: {output_pdf}")
     except Exception as e:
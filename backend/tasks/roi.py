@@ -0,0 +1,296 @@
+import os
+import json
+
+import cv2
+import numpy as np
+from filelock import FileLock
+
+from tasks.ocr_models import result_data
+from tasks.ocr_store import OCRStore, store_exists
+from tasks.stages import fingerprint
+
+# Regions of a broadcast frame worth OCR'ing, per broadcast layout. Boxes are
+# relative (x0, y0, x1, y1). `scale` resizes the crop before OCR (upsample
+# small scorebug text); `tiles` splits a wide region into overlapping tiles so
+# the detector sees it near native resolution instead of shrinking the strip.
+ROI_PROFILES = {
+    # Whole frame (the original behaviour)
+    "full": None,
+    # National TV layout: scorebug bottom left, courtside LED boards along the
+    # bottom third, stanchion pads and under-basket signage at the sides, and
+    # the arena ribbon boards across the top.
+    "nba_national": [
+        {"name": "scorebug", "box": (0.0, 0.86, 0.45, 1.0), "scale": 1.25},
+        {"name": "courtside", "box": (0.0, 0.62, 1.0, 0.92), "tiles": 2},
+        {"name": "stanchion_left", "box": (0.0, 0.35, 0.15, 0.65)},
+        {"name": "stanchion_right", "box": (0.85, 0.35, 1.0, 0.65)},
+        {"name": "ribbon", "box": (0.1, 0.0, 0.9, 0.12)},
+    ],
+    # Regional sports network layout: scorebug across the top
+    "nba_regional": [
+        {"name": "scorebug", "box": (0.0, 0.0, 1.0, 0.1), "scale": 1.25},
+        {"name": "courtside", "box": (0.0, 0.62, 1.0, 0.92), "tiles": 2},
+        {"name": "stanchion_left", "box": (0.0, 0.35, 0.15, 0.65)},
+        {"name": "stanchion_right", "box": (0.85, 0.35, 1.0, 0.65)},
+    ],
+}
+# "auto" uses regions learned from earlier full-frame jobs (see learn_regions)
+ROI_PROFILE = os.getenv("OCR_ROI_PROFILE", "full")
+ROI_PROFILE_DIR = os.getenv("OCR_ROI_PROFILE_DIR", os.path.join("downloads", ".roi_profiles"))
+# Full-frame jobs to learn from before the "auto" profile starts cropping
+ROI_AUTO_MIN_JOBS = int(os.getenv("OCR_ROI_AUTO_MIN_JOBS", "3"))
+# Seconds a job waits for another job's update of a learned profile
+ROI_LEARN_LOCK_TIMEOUT = 60
+
+# Share of a tile's width shared with its neighbour
+TILE_OVERLAP = 0.25
+# Learning grid (columns x rows over the frame) and share of detections kept
+LEARN_GRID = (32, 18)
+LEARN_COVERAGE = 0.97
+
+def _learned_path(name):
+    return os.path.join(ROI_PROFILE_DIR, f"{name}.json")
+
+def load_learned_profile(name="auto"):
+    try:
+        with open(_learned_path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def resolve_regions(profile=ROI_PROFILE):
+    """
+    Regions for a profile name, or None for whole-frame OCR. "auto" yields
+    the learned regions once ROI_AUTO_MIN_JOBS jobs have been learned from.
+    """
+    if profile in (None, "", "full"):
+        return None
+    if profile in ROI_PROFILES:
+        return ROI_PROFILES[profile]
+    learned = load_learned_profile(profile)
+    if learned is None and profile != "auto":
+        raise ValueError(f"Unknown ROI profile {profile!r}, expected one of {list(ROI_PROFILES)} or a learned profile")
+    if learned is None or learned["jobs"] < ROI_AUTO_MIN_JOBS or not learned["regions"]:
+        return None
+    return learned["regions"]
+
+def cache_namespace(model, regions):
+    """OCRCache namespace: results only match when model and regions match."""
+    return str(model) if not regions else f"{model}-roi-{fingerprint(regions)[:10]}"
+
+def _tile_boxes(x0, x1, tiles):
+    """
+    (tile_x0, tile_x1, core_x0, core_x1) for `tiles` overlapping tiles over
+    [x0, x1]. A tile owns the text centred in its core, which ends halfway
+    through the overlap with each neighbour, so text is kept by one tile only.
+    """
+    width = (x1 - x0) / (tiles - (tiles - 1) * TILE_OVERLAP)
+    step = width * (1 - TILE_OVERLAP)
+    half_overlap = width * TILE_OVERLAP / 2
+    out = []
+    for i in range(tiles):
+        start, end = x0 + i * step, min(x0 + i * step + width, x1)
+        out.append((start, end, x0 if i == 0 else start + half_overlap, x1 if i == tiles - 1 else end - half_overlap))
+    return out
+
+def region_crops(image, regions):
+    """
+    Cut `image` into the crops OCR should see. Returns a list of dicts:
+    image (the crop), origin (its top-left in the frame), scale, region
+    (name) and core (the x range, in frame pixels, whose text it owns).
+    """
+    height, width = image.shape[:2]
+    crops = []
+    for region in regions:
+        rx0, ry0, rx1, ry1 = region["box"]
+        scale = region.get("scale", 1.0)
+        y0, y1 = int(ry0 * height), int(ry1 * height)
+        for tx0, tx1, cx0, cx1 in _tile_boxes(rx0, rx1, max(int(region.get("tiles", 1)), 1)):
+            x0, x1 = int(tx0 * width), int(tx1 * width)
+            if x1 - x0 < 2 or y1 - y0 < 2:
+                continue
+            crop = image[y0:y1, x0:x1]
+            if scale != 1.0:
+                crop = cv2.resize(crop, None, fx=scale, fy=scale,
+                                  interpolation=cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA)
+            crops.append({
+                "image": np.ascontiguousarray(crop),
+                "origin": (x0, y0),
+                "scale": scale,
+                "region": region["name"],
+                "core": (cx0 * width, cx1 * width),
+            })
+    return crops
+
+def _polys(data, count):
+    polys = data.get("rec_polys")
+    if polys is not None and len(polys) == count:
+        return [np.asarray(p, dtype=np.float32).reshape(-1, 2) for p in polys]
+    boxes = data.get("rec_boxes")
+    if boxes is not None and len(boxes) == count:
+        return [np.array([[b[0], b[1]], [b[2], b[1]], [b[2], b[3]], [b[0], b[3]]], dtype=np.float32)
+                for b in np.asarray(boxes, dtype=np.float32).reshape(count, 4)]
+    return [np.zeros((4, 2), dtype=np.float32) for _ in range(count)]
+
+def _iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def merge_region_results(parts):
+    """
+    Combine per-crop result dicts into one frame-level result dict with
+    boxes/polygons in frame coordinates. `parts` is a list of (data, crop)
+    with crops from region_crops. A tile only keeps text centred in its core,
+    and the same text found by two overlapping regions is kept once (the
+    higher-scoring copy).
+    """
+    detections = []
+    for data, crop in parts:
+        (ox, oy), scale = crop["origin"], crop["scale"]
+        core_x0, core_x1 = crop["core"]
+        texts = data.get("rec_texts", []) or []
+        scores = data.get("rec_scores") or [0.0] * len(texts)
+        for text, score, poly in zip(texts, scores, _polys(data, len(texts))):
+            poly = poly / scale + np.array([ox, oy], dtype=np.float32)
+            box = (float(poly[:, 0].min()), float(poly[:, 1].min()), float(poly[:, 0].max()), float(poly[:, 1].max()))
+            if not core_x0 <= (box[0] + box[2]) / 2 < core_x1:
+                continue
+            detections.append((float(score), text, box, poly, crop["region"]))
+
+    kept = []
+    for det in sorted(detections, key=lambda d: -d[0]):
+        if any(det[1] == k[1] and _iou(det[2], k[2]) > 0.5 for k in kept):
+            continue
+        kept.append(det)
+    kept.sort(key=lambda d: (d[2][1], d[2][0]))
+    return {
+        "rec_texts": [d[1] for d in kept],
+        "rec_scores": [d[0] for d in kept],
+        "rec_boxes": [[round(v, 1) for v in d[2]] for d in kept],
+        "rec_polys": [d[3].round(1).tolist() for d in kept],
+        "rec_regions": [d[4] for d in kept],
+    }
+
+def predict_regions(ocr, images, regions):
+    """
+    OCR only the `regions` of each image (paths or ndarrays) in one batched
+    predict call; returns, per image, a one-element list holding the merged
+    frame-level result dict.
+    """
+    crops, owners = [], []
+    for i, image in enumerate(images):
+        if isinstance(image, str):
+            image = cv2.imread(image)
+        for crop in region_crops(image, regions):
+            crops.append(crop)
+            owners.append(i)
+
+    parts = [[] for _ in images]
+    if crops:
+        results = ocr.predict([c["image"] for c in crops]) if len(crops) > 1 else list(ocr.predict(crops[0]["image"]))
+        for owner, crop, res in zip(owners, crops, results):
+            parts[owner].append((result_data(res), crop))
+    return [[merge_region_results(p)] for p in parts]
+
+def detection_heatmap(ocr_output_dirs, grid=LEARN_GRID, matcher=None):
+    """
+    Count, per grid cell, the detections whose box covers it over the OCR
+    stores in `ocr_output_dirs`. With a BrandMatcher, only detections
+    containing a brand token count. Returns (heatmap rows x cols, jobs used).
+    """
+    cols, rows = grid
+    heat = np.zeros((rows, cols), dtype=np.float64)
+    jobs = 0
+    for ocr_output_dir in ocr_output_dirs:
+        if not store_exists(ocr_output_dir):
+            continue
+        store = OCRStore(ocr_output_dir)
+        if not store.frame_size or not len(store.detections):
+            continue
+        width, height = store.frame_size
+        boxes = store.detections["box"].astype(np.float64)
+        keep = np.ones(len(boxes), dtype=bool)
+        if matcher is not None:
+            for row in range(len(boxes)):
+                tokens = store.text(row).lower().split()
+                keep[row] = any(hits for hits in matcher.lookup(tokens))
+        scale = np.array([cols / width, rows / height, cols / width, rows / height])
+        cells = (boxes[keep] * scale).astype(np.int64)
+        # Identical boxes (static boards, the scorebug) are rasterised once
+        cells, counts = np.unique(cells.clip(0, [cols - 1, rows - 1, cols - 1, rows - 1]), axis=0, return_counts=True)
+        for (c0, r0, c1, r1), count in zip(cells, counts):
+            heat[r0:r1 + 1, c0:c1 + 1] += count
+        jobs += 1
+    return heat, jobs
+
+def regions_from_heatmap(heat, coverage=LEARN_COVERAGE, pad=1):
+    """
+    Smallest set of grid cells holding `coverage` of all detections, grown by
+    `pad` cells and turned into rectangular regions (one per connected blob).
+    """
+    total = heat.sum()
+    if total <= 0:
+        return []
+    rows, cols = heat.shape
+    order = np.argsort(heat, axis=None)[::-1]
+    cumulative = np.cumsum(heat.ravel()[order])
+    selected = order[:int(np.searchsorted(cumulative, coverage * total)) + 1]
+    mask = np.zeros(heat.size, dtype=np.uint8)
+    mask[selected] = 1
+    mask = mask.reshape(rows, cols)
+    if pad:
+        mask = cv2.dilate(mask, np.ones((2 * pad + 1, 2 * pad + 1), dtype=np.uint8))
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    regions = []
+    for label in range(1, count):
+        x, y, w, h = stats[label, :4]
+        box = (x / cols, y / rows, (x + w) / cols, (y + h) / rows)
+        aspect = (box[2] - box[0]) * 16 / max((box[3] - box[1]) * 9, 1e-6)
+        regions.append({"name": f"learned_{label}", "box": tuple(round(v, 4) for v in box),
+                        "tiles": 2 if aspect > 6 else 1})
+    return regions
+
+def learn_regions(ocr_output_dirs, name="auto", matcher=None, coverage=LEARN_COVERAGE):
+    """
+    Add the detections of full-frame jobs to the learned profile `name` and
+    re-derive its regions. Returns the learned profile dict.
+    """
+    heat, jobs = detection_heatmap(ocr_output_dirs, matcher=matcher)
+    os.makedirs(ROI_PROFILE_DIR, exist_ok=True)
+    # Workers finishing jobs at once update the profile one at a time, and
+    # readers only ever see a complete file (written aside, then renamed).
+    with FileLock(_learned_path(name) + ".lock", timeout=ROI_LEARN_LOCK_TIMEOUT):
+        learned = load_learned_profile(name)
+        if learned is not None and np.asarray(learned["heatmap"]).shape == heat.shape:
+            heat = heat + np.asarray(learned["heatmap"])
+            jobs += learned["jobs"]
+        learned = {
+            "jobs": jobs,
+            "coverage": coverage,
+            "heatmap": heat.tolist(),
+            "regions": regions_from_heatmap(heat, coverage),
+        }
+        tmp_path = f"{_learned_path(name)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(learned, f)
+            os.replace(tmp_path, _learned_path(name))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    print(f"🎯 Learned ROI profile {name!r} from {jobs} job(s): {len(learned['regions'])} region(s)")
+    return learned
+
+def frame_share(regions):
+    """Share of the frame's pixels that OCR sees with `regions` (before scaling)."""
+    if not regions:
+        return 1.0
+    mask = np.zeros((180, 320), dtype=bool)
+    for region in regions:
+        x0, y0, x1, y1 = region["box"]
+        mask[int(y0 * 180):int(np.ceil(y1 * 180)), int(x0 * 320):int(np.ceil(x1 * 320))] = True
+    return float(mask.mean())
@@ -0,0 +1,181 @@
+import os
+import math
+import cv2
+import numpy as np
+
+from utils.metrics import metrics
+
+# "read":   decode every frame, keep one in `interval` (original behaviour)
+# "grab":   grab() every frame, only retrieve() (decode to BGR) sampled ones
+# "seek":   jump to each sampled frame with CAP_PROP_POS_FRAMES (grab when
+#           frames are sampled less than SEEK_MIN_FRAMES apart)
+# "ffmpeg": let ffmpeg's fps filter pick frames and pipe raw BGR out
+SAMPLING_BACKENDS = ("read", "grab", "seek", "ffmpeg")
+DEFAULT_BACKEND = os.getenv("FRAME_SAMPLING_BACKEND", "seek")
+# A seek decodes from the previous keyframe: for short hops, decoding
+# straight through (grab) is cheaper (see benchmarks/bench_sampling.py)
+SEEK_MIN_FRAMES = int(os.getenv("FRAME_SEEK_MIN_FRAMES", "24"))
+
+def _open_capture(video_path):
+    vidcap = cv2.VideoCapture(video_path)
+    video_fps = vidcap.get(cv2.CAP_PROP_FPS)
+    if not video_fps or video_fps <= 0:
+        vidcap.release()
+        raise ValueError("Unable to read FPS from video.")
+    return vidcap, video_fps
+
+def _sample_read(video_path, fps):
+    vidcap, video_fps = _open_capture(video_path)
+    interval = max(int(video_fps / fps), 1)
+    frame_count, frame_id = 0, 0
+    try:
+        while True:
+            success, frame = vidcap.read()
+            if not success:
+                break
+            if frame_count % interval == 0:
+                yield frame_id, round(frame_count / video_fps, 3), frame
+                frame_id += 1
+            frame_count += 1
+    finally:
+        vidcap.release()
+
+def _sample_grab(video_path, fps):
+    vidcap, video_fps = _open_capture(video_path)
+    interval = max(int(video_fps / fps), 1)
+    frame_count, frame_id = 0, 0
+    try:
+        while vidcap.grab():
+            if frame_count % interval == 0:
+                success, frame = vidcap.retrieve()
+                if not success:
+                    break
+                yield frame_id, round(frame_count / video_fps, 3), frame
+                frame_id += 1
+            frame_count += 1
+    finally:
+        vidcap.release()
+
+def _sample_seek(video_path, fps):
+    vidcap, video_fps = _open_capture(video_path)
+    interval = max(int(video_fps / fps), 1)
+    if interval < SEEK_MIN_FRAMES:
+        vidcap.release()
+        yield from _sample_grab(video_path, fps)
+        return
+    frame_count, frame_id = 0, 0
+    try:
+        while True:
+            vidcap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+            success, frame = vidcap.read()
+            if not success:
+                break
+            yield frame_id, round(frame_count / video_fps, 3), frame
+            frame_id += 1
+            frame_count += interval
+    finally:
+        vidcap.release()
+
+def _sample_ffmpeg(video_path, fps):
+    import ffmpeg
+
+    probe = ffmpeg.probe(video_path)
+    stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
+    width, height = int(stream["width"]), int(stream["height"])
+    frame_bytes = width * height * 3
+
+    process = (
+        ffmpeg
+        .input(video_path)
+        .filter("fps", fps=fps)
+        .output("pipe:", format="rawvideo", pix_fmt="bgr24")
+        .run_async(pipe_stdout=True, quiet=True)
+    )
+    frame_id = 0
+    try:
+        while True:
+            buf = process.stdout.read(frame_bytes)
+            if len(buf) < frame_bytes:
+                break
+            # Writable, like the OpenCV backends' frames (frombuffer is read-only)
+            frame = np.frombuffer(buf, np.uint8).reshape(height, width, 3).copy()
+            yield frame_id, round(frame_id / fps, 3), frame
+            frame_id += 1
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+_BACKENDS = {
+    "read": _sample_read,
+    "grab": _sample_grab,
+    "seek": _sample_seek,
+    "ffmpeg": _sample_ffmpeg,
+}
+
+def sample_frames(video_path, fps=1, backend=DEFAULT_BACKEND):
+    """
+    Yield (frame_id, timestamp_seconds, frame) for frames sampled at `fps`.
+
+    "read", "grab" and "seek" select the same frames (every `interval`-th);
+    "ffmpeg" uses ffmpeg's fps filter, whose timestamps are evenly spaced
+    at 1/fps and may land one source frame away from the OpenCV backends.
+    """
+    if backend not in _BACKENDS:
+        raise ValueError(f"Unknown sampling backend {backend!r}, expected one of {SAMPLING_BACKENDS}")
+    return _counted(_BACKENDS[backend](video_path, fps), backend)
+
+def _counted(frames, backend):
+    for frame in frames:
+        metrics.inc("frames_decoded", backend=backend)
+        yield frame
+
+def video_fps(video_path):
+    vidcap, fps = _open_capture(video_path)
+    vidcap.release()
+    return fps
+
+def video_length(video_path):
+    """Length of a local video in seconds from its container metadata, or None."""
+    vidcap = cv2.VideoCapture(video_path)
+    try:
+        fps = vidcap.get(cv2.CAP_PROP_FPS)
+        frames = vidcap.get(cv2.CAP_PROP_FRAME_COUNT)
+    finally:
+        vidcap.release()
+    return frames / fps if fps and frames and frames > 0 else None
+
+def grid_index(timestamp, source_fps, fps):
+    """Index of the `fps` sampling slot a timestamp falls in (the frame_id sample_frames would give it)."""
+    return int(round(timestamp * source_fps)) // max(int(source_fps / fps), 1)
+
+def sample_windows(video_path, windows, fps, skip=()):
+    """
+    Yield (frame_id, timestamp_seconds, frame) sampled at `fps` inside each
+    (start, end) window (seconds, sorted and non-overlapping), seeking to the
+    start of every window instead of decoding the whole video. Frame ids are
+    the same sampling slots sample_frames(video_path, fps) uses; ids in
+    `skip` are not yielded.
+    """
+    vidcap, source_fps = _open_capture(video_path)
+    interval = max(int(source_fps / fps), 1)
+    try:
+        for start, end in windows:
+            first = int(math.ceil(start * source_fps / interval)) * interval
+            last = int(end * source_fps)
+            if first > last:
+                continue
+            vidcap.set(cv2.CAP_PROP_POS_FRAMES, first)
+            for frame_count in range(first, last + 1):
+                if not vidcap.grab():
+                    break
+                frame_id = frame_count // interval
+                if (frame_count - first) % interval or frame_id in skip:
+                    continue
+                success, frame = vidcap.retrieve()
+                if not success:
+                    break
+                metrics.inc("frames_decoded", backend="windows")
+                yield frame_id, round(frame_count / source_fps, 3), frame
+    finally:
+        vidcap.release()
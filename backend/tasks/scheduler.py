@@ -0,0 +1,257 @@
+import os
+import time
+import uuid
+import threading
+
+from celery_config import CELERY_ALWAYS_EAGER
+from tasks.stages import fingerprint
+
+# Active (queued or running) jobs one user may have at once
+SCHEDULER_MAX_JOBS_PER_USER = int(os.getenv("SCHEDULER_MAX_JOBS_PER_USER", "2"))
+# Admitted jobs (queued or running) across all users before new full games
+# are turned away. Counts the scheduler's own bookkeeping, not the broker's
+# queue length: jobs enqueued outside /analyze aren't counted.
+SCHEDULER_MAX_ACTIVE_JOBS = int(os.getenv("SCHEDULER_MAX_ACTIVE_JOBS", "20"))
+# Extra room above that limit kept for highlight clips
+SCHEDULER_HIGHLIGHT_RESERVE = int(os.getenv("SCHEDULER_HIGHLIGHT_RESERVE", "5"))
+# A request for at most this many seconds of video is a highlight clip
+HIGHLIGHT_MAX_SECONDS = float(os.getenv("HIGHLIGHT_MAX_SECONDS", "600"))
+# Seconds a rejected client is told to wait (Retry-After)
+SCHEDULER_RETRY_AFTER = int(os.getenv("SCHEDULER_RETRY_AFTER", "60"))
+# Bookkeeping of a job that never reports back (crashed worker) expires after this
+SCHEDULER_JOB_TTL = int(os.getenv("SCHEDULER_JOB_TTL", str(6 * 3600)))
+
+# Celery message priorities (Redis transport: 0 is served first)
+HIGHLIGHT_PRIORITY = 0
+FULL_GAME_PRIORITY = 6
+
+# "redis": shared by every API process and worker; "memory": this process
+# only (eager runs, tests). Without Redis, requests are refused (503) rather
+# than tracked apart from the workers; only eager runs fall back to memory.
+SCHEDULER_BACKEND = os.getenv("SCHEDULER_BACKEND", "memory" if CELERY_ALWAYS_EAGER else "redis")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+class SchedulerUnavailable(RuntimeError):
+    """Scheduler state can't be reached or locked right now; retry after `retry_after` seconds."""
+
+    def __init__(self, message, retry_after=SCHEDULER_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class MemoryStore:
+    """Scheduler state in this process: keys and expiring sets."""
+    errors = ()
+
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.mutex = threading.RLock()
+
+    def lock(self):
+        return self.mutex
+
+    def get(self, key):
+        value, expires_at = self.values.get(key, (None, None))
+        if expires_at is not None and expires_at < time.time():
+            self.values.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        self.values[key] = (value, time.time() + ttl)
+
+    def delete(self, key):
+        self.values.pop(key, None)
+        self.sets.pop(key, None)
+
+    def add(self, key, member, ttl):
+        self.sets.setdefault(key, {})[member] = time.time() + ttl
+
+    def remove(self, key, member):
+        self.sets.get(key, {}).pop(member, None)
+
+    def members(self, key):
+        now = time.time()
+        live = {m: t for m, t in self.sets.get(key, {}).items() if t >= now}
+        self.sets[key] = live
+        return list(live)
+
+class RedisStore:
+    """
+    Scheduler state in Redis, shared by every API process and worker. Sets
+    are sorted sets scored by expiry time, so members expire one by one.
+    """
+
+    def __init__(self, url=REDIS_URL, prefix="scheduler:"):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.client.ping()
+        self.prefix = prefix
+        # Connection failures and a lock not acquired within its blocking_timeout
+        self.errors = (redis.RedisError,)
+
+    def lock(self):
+        return self.client.lock(self.prefix + "lock", timeout=10, blocking_timeout=10)
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def add(self, key, member, ttl):
+        pipe = self.client.pipeline()
+        pipe.zadd(self.prefix + key, {member: time.time() + ttl})
+        pipe.expire(self.prefix + key, ttl)
+        pipe.execute()
+
+    def remove(self, key, member):
+        self.client.zrem(self.prefix + key, member)
+
+    def members(self, key):
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(self.prefix + key, "-inf", time.time())
+        pipe.zrange(self.prefix + key, 0, -1)
+        return pipe.execute()[1]
+
+def open_store(backend=SCHEDULER_BACKEND):
+    """
+    The configured store. An unreachable Redis raises SchedulerUnavailable:
+    a per-process fallback would never see the workers' releases and leave
+    slots and dedup entries stuck. Eager runs have no workers, so they
+    fall back to memory.
+    """
+    if backend == "redis":
+        try:
+            return RedisStore()
+        except Exception as e:
+            if not CELERY_ALWAYS_EAGER:
+                raise SchedulerUnavailable(f"Job scheduler unavailable: Redis unreachable ({e})") from e
+            print(f"⚠️ Scheduler: Redis unavailable ({e}), keeping job state in this process only")
+    elif backend != "memory":
+        raise ValueError(f"Unknown SCHEDULER_BACKEND {backend!r}, expected 'redis' or 'memory'")
+    return MemoryStore()
+
+def request_key(video_id, model, brands, ingest_profile, span):
+    """Requests with equal keys would produce the same report."""
+    return fingerprint("job", video_id, model, sorted(set(brands)), ingest_profile, list(span) if span else None)
+
+def is_highlight(span):
+    return span is not None and span[1] is not None and span[1] - span[0] <= HIGHLIGHT_MAX_SECONDS
+
+def job_priority(span):
+    return HIGHLIGHT_PRIORITY if is_highlight(span) else FULL_GAME_PRIORITY
+
+class JobScheduler:
+    """
+    Admission control in front of Celery. An identical request (same video,
+    span, model, brands and ingest profile) to a job already queued or
+    running joins that job: same task id, and the report goes to every
+    requester. New jobs are refused (with a retry hint) when the user
+    already has `max_per_user` active jobs, or when `max_active` jobs are
+    active (admitted here and not yet released, whatever the broker's queue
+    holds); highlight clips get `highlight_reserve` more room.
+    """
+
+    def __init__(self, store=None, max_per_user=SCHEDULER_MAX_JOBS_PER_USER, max_active=SCHEDULER_MAX_ACTIVE_JOBS,
+                 highlight_reserve=SCHEDULER_HIGHLIGHT_RESERVE, ttl=SCHEDULER_JOB_TTL,
+                 retry_after=SCHEDULER_RETRY_AFTER):
+        self.store = store or open_store()
+        self.max_per_user = max_per_user
+        self.max_active = max_active
+        self.highlight_reserve = highlight_reserve
+        self.ttl = ttl
+        self.retry_after = retry_after
+
+    def _finished(self, is_finished):
+        # One result-backend round trip per active job: done before taking
+        # the lock, so other requests and releases aren't held up by it
+        if not is_finished:
+            return set()
+        return {task_id for task_id in self.store.members("active") if is_finished(task_id)}
+
+    def _active(self, finished):
+        for task_id in finished:
+            self._release(task_id)
+        return [task_id for task_id in self.store.members("active") if task_id not in finished]
+
+    def admit(self, key, email, highlight=False, is_finished=None):
+        """
+        Decide on a request: {"decision": "joined" | "new", "task_id"} or
+        {"decision": "rejected", "reason", "retry_after"}. A "new" task id
+        is reserved and must be enqueued with that id (or released).
+        `is_finished` (task id -> bool) catches jobs that ended without
+        being released, e.g. a worker killed mid-job. Raises
+        SchedulerUnavailable when the store can't be reached or locked.
+        """
+        try:
+            return self._admit(key, email, highlight, is_finished)
+        except self.store.errors as e:
+            raise SchedulerUnavailable(f"Job scheduler busy or unreachable: {e}", self.retry_after) from e
+
+    def _admit(self, key, email, highlight, is_finished):
+        store = self.store
+        finished = self._finished(is_finished)
+        with store.lock():
+            active = self._active(finished)
+            task_id = store.get(f"job:{key}")
+            if task_id in active:
+                store.add(f"subscribers:{task_id}", email, self.ttl)
+                return {"decision": "joined", "task_id": task_id}
+
+            if len(set(store.members(f"user:{email}")) & set(active)) >= self.max_per_user:
+                return {"decision": "rejected", "retry_after": self.retry_after,
+                        "reason": f"You already have {self.max_per_user} analyses in progress."}
+            limit = self.max_active + (self.highlight_reserve if highlight else 0)
+            if len(active) >= limit:
+                return {"decision": "rejected", "retry_after": self.retry_after,
+                        "reason": "Too many analyses are in progress."}
+
+            task_id = str(uuid.uuid4())
+            store.set(f"job:{key}", task_id, self.ttl)
+            store.set(f"key:{task_id}", key, self.ttl)
+            store.add("active", task_id, self.ttl)
+            store.add(f"user:{email}", task_id, self.ttl)
+            store.add(f"subscribers:{task_id}", email, self.ttl)
+            return {"decision": "new", "task_id": task_id}
+
+    def _release(self, task_id):
+        store = self.store
+        recipients = store.get(f"recipients:{task_id}")
+        if recipients is not None:
+            return recipients.split(",") if recipients else []
+
+        subscribers = store.members(f"subscribers:{task_id}")
+        key = store.get(f"key:{task_id}")
+        if key and store.get(f"job:{key}") == task_id:
+            store.delete(f"job:{key}")
+        store.remove("active", task_id)
+        for email in subscribers:
+            store.remove(f"user:{email}", task_id)
+        store.delete(f"subscribers:{task_id}")
+        store.delete(f"key:{task_id}")
+        store.set(f"recipients:{task_id}", ",".join(subscribers), self.ttl)
+        return subscribers
+
+    def release(self, task_id):
+        """
+        Close a finished (or failed) job to new subscribers and free its
+        slots. Returns everyone who asked for its report; idempotent, so a
+        retried delivery gets the same list.
+        """
+        with self.store.lock():
+            return self._release(task_id)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Return this process's JobScheduler (SchedulerUnavailable until its store can be opened)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
@@ -0,0 +1,54 @@
+import os
+import json
+import hashlib
+
+STAGES_FILENAME = "stages.json"
+
+def fingerprint(*parts):
+    """Stable hash of JSON-serialisable stage inputs."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+class StageTracker:
+    """
+    Remembers, per job directory, the input fingerprint each pipeline stage
+    last ran with (in stages.json). A stage is up to date when its inputs
+    hash to the same key and all of its outputs still exist, so a re-run
+    with the same OCR, brands and plot settings skips it.
+    """
+
+    def __init__(self, base_dir):
+        self.path = os.path.join(base_dir, STAGES_FILENAME)
+        self.stages = {}
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.stages = json.load(f)
+            except (OSError, ValueError):
+                self.stages = {}
+
+    def up_to_date(self, stage, key):
+        entry = self.stages.get(stage)
+        if not entry or entry.get("key") != key:
+            return False
+        return all(os.path.exists(path) for path in entry.get("outputs", []))
+
+    def record(self, stage, key, outputs):
+        self.stages[stage] = {"key": key, "outputs": list(outputs)}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.stages, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def run(self, stage, key, outputs, fn, log=print):
+        """
+        Call `fn()` unless `stage` already ran with `key` and `outputs` exist.
+        `outputs` may be a callable, evaluated after `fn` runs. Returns True if
+        the stage ran.
+        """
+        if self.up_to_date(stage, key):
+            log(f"♻️ {stage}: inputs unchanged, reusing previous output.")
+            return False
+        fn()
+        self.record(stage, key, outputs() if callable(outputs) else outputs)
+        return True
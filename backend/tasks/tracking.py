@@ -0,0 +1,196 @@
+import os
+import numpy as np
+import pandas as pd
+
+from tasks.analytics import sample_durations
+from tasks.matching import get_matcher
+from tasks.ocr_store import OCRStore, store_exists
+
+# Box IoU a detection needs with a brand's open track to extend it
+TRACK_IOU_THRESHOLD = float(os.getenv("TRACK_IOU_THRESHOLD", "0.3"))
+# Seconds a track stays open without a detection (an occluded board, a
+# missed OCR read). A track always survives to the next sampled frame, so
+# sparse adaptive sampling doesn't break it up.
+TRACK_MAX_GAP_SECONDS = float(os.getenv("TRACK_MAX_GAP_SECONDS", "2"))
+
+EXPOSURE_COLUMNS = ["Brand", "Exposure Seconds", "Tracks", "Longest Track Seconds", "Avg Screen Share",
+                    "Visibility Score"]
+TRACK_COLUMNS = ["Brand", "Start", "End", "Seconds", "Frames", "Avg Screen Share", "Mean Confidence"]
+
+class Track:
+    """One brand's detections linked across consecutive frames."""
+    __slots__ = ("brand", "start", "end", "last_frame", "last_seen", "box", "frames", "seconds",
+                 "share_seconds", "confidence_seconds")
+
+    def __init__(self, brand, frame, timestamp, duration, box):
+        self.brand = brand
+        self.start = timestamp - duration / 2
+        self.last_frame = frame
+        self.last_seen = timestamp
+        self.box = box
+        self.frames = 0
+        self.seconds = 0.0
+        self.share_seconds = 0.0
+        self.confidence_seconds = 0.0
+        self.end = timestamp + duration / 2
+
+    def open_at(self, frame, timestamp, max_gap):
+        return self.last_frame == frame - 1 or timestamp - self.last_seen <= max_gap
+
+    def extend(self, frame, timestamp, duration, box, share, confidence):
+        self.last_frame, self.last_seen, self.box = frame, timestamp, box
+        self.end = timestamp + duration / 2
+        self.frames += 1
+        self.seconds += duration
+        self.share_seconds += duration * share
+        self.confidence_seconds += duration * confidence
+
+def box_iou(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def detection_brands(store, brands, matcher):
+    """
+    The brands each detection line names: per detection row, a list of
+    (brand column, confidence), where confidence is the OCR score times
+    the fuzzy match score (0-1). Every distinct word is scored once.
+    """
+    vocabulary = {}
+    row_tokens = []
+    for row in range(len(store.detections)):
+        row_tokens.append([vocabulary.setdefault(word, len(vocabulary)) for word in store.text(row).lower().split()])
+    if not vocabulary:
+        return [[] for _ in row_tokens]
+    hits, _, scores = matcher.match_tokens(list(vocabulary), brands)
+    token_brands = {}
+    for token_id, b in zip(*np.nonzero(hits)):
+        token_brands.setdefault(int(token_id), []).append((int(b), float(scores[token_id, b]) / 100))
+
+    ocr_scores = store.detections["score"].astype(np.float64)
+    out = []
+    for row, ids in enumerate(row_tokens):
+        best = {}
+        for token_id in ids:
+            for b, score in token_brands.get(token_id, ()):
+                best[b] = max(best.get(b, 0.0), score)
+        out.append([(b, score * ocr_scores[row]) for b, score in best.items()])
+    return out
+
+def link_tracks(store, row_brands, brand_count, iou_threshold=TRACK_IOU_THRESHOLD,
+                max_gap=TRACK_MAX_GAP_SECONDS):
+    """
+    Walk the store's frames in time order, linking each frame's brand
+    detections to that brand's open tracks (greedy, highest confidence
+    first, best IoU at or above `iou_threshold`) or starting new ones.
+    Only a brand's few open tracks are compared, so this is linear in the
+    detections. Returns (tracks in start order, per-brand totals of
+    visible seconds, screen-share seconds and confidence seconds).
+    """
+    timestamps = store.frames["timestamp"].astype(np.float64)
+    durations = sample_durations(timestamps)
+    size = store.frame_size
+    frame_area = float(size[0] * size[1]) if size else None
+
+    tracks, open_tracks = [], [[] for _ in range(brand_count)]
+    totals = np.zeros((brand_count, 3))
+    for i in range(len(store)):
+        first = int(store.frames[i]["first_detection"])
+        found = {}
+        for row in range(first, first + int(store.frames[i]["detections"])):
+            for b, confidence in row_brands[row]:
+                found.setdefault(b, []).append((confidence, row))
+        if not found:
+            continue
+        t, d = float(timestamps[i]), float(durations[i])
+        boxes = store.frame_detections(i)["box"].astype(np.float64)
+        for b, detections in found.items():
+            candidates = [track for track in open_tracks[b] if track.open_at(i, t, max_gap)]
+            detections.sort(reverse=True)
+            areas = [max(boxes[row - first][2] - boxes[row - first][0], 0) *
+                     max(boxes[row - first][3] - boxes[row - first][1], 0) for _, row in detections]
+            share = min(sum(areas) / frame_area, 1.0) if frame_area else np.nan
+            extended = []
+            for (confidence, row), area in zip(detections, areas):
+                box = boxes[row - first]
+                best, best_iou = None, iou_threshold
+                for track in candidates:
+                    iou = box_iou(track.box, box)
+                    if iou >= best_iou:
+                        best, best_iou = track, iou
+                if best is None:
+                    best = Track(b, i, t, d, box)
+                    tracks.append(best)
+                else:
+                    candidates.remove(best)
+                best.extend(i, t, d, box, min(area / frame_area, 1.0) if frame_area else np.nan, confidence)
+                extended.append(best)
+            open_tracks[b] = extended + candidates
+            totals[b] += (d, d * share, d * detections[0][0])
+    return tracks, totals
+
+def exposure_seconds(tracks):
+    """Length of the union of the tracks' time spans (tracks sorted by start)."""
+    total, end = 0.0, -np.inf
+    for track in tracks:
+        if track.end <= end:
+            continue
+        total += track.end - max(track.start, end)
+        end = track.end
+    return total
+
+def track_brands(ocr_output_dir, base_output_dir, brand_keywords, threshold=80, matcher=None,
+                 iou_threshold=TRACK_IOU_THRESHOLD, max_gap=TRACK_MAX_GAP_SECONDS):
+    """
+    Link brand detections in the OCR store into on-screen tracks and
+    measure each brand's exposure. Writes brand_tracks.csv (one row per
+    track) and brand_exposure.csv, per brand:
+    - Exposure Seconds: time at least one of its tracks was on screen,
+      gaps within a track included;
+    - Avg Screen Share: share of the frame its boxes cover while visible;
+    - Visibility Score: seconds visible, weighted by detection confidence
+      (OCR score x match score) of its best detection in each frame.
+    Legacy merged_texts.txt runs have no boxes and get zero exposure.
+    """
+    brands = list(brand_keywords)
+    if matcher is None or matcher.threshold != threshold or not matcher.covers(brand_keywords):
+        matcher = get_matcher(brand_keywords, threshold)
+
+    if store_exists(ocr_output_dir):
+        store = OCRStore(ocr_output_dir)
+        print(f"🎯 Tracking {len(brands)} brands over {len(store)} frames...")
+        tracks, totals = link_tracks(store, detection_brands(store, brands, matcher), len(brands),
+                                     iou_threshold=iou_threshold, max_gap=max_gap)
+    else:
+        print("⚠️ No OCR store with detection boxes; brand exposure is left at zero.")
+        tracks, totals = [], np.zeros((len(brands), 3))
+
+    def share(seconds, share_seconds):
+        return round(share_seconds / seconds, 4) if seconds else 0.0
+
+    df_tracks = pd.DataFrame([[brands[t.brand], round(t.start, 3), round(t.end, 3), round(t.end - t.start, 3),
+                               t.frames, share(t.seconds, t.share_seconds),
+                               round(t.confidence_seconds / t.seconds, 4) if t.seconds else 0.0]
+                              for t in tracks], columns=TRACK_COLUMNS)
+    by_brand = [[] for _ in brands]
+    for t in tracks:
+        by_brand[t.brand].append(t)
+    rows = []
+    for b, (brand, brand_tracks) in enumerate(zip(brands, by_brand)):
+        seconds, share_seconds, confidence_seconds = totals[b]
+        rows.append([brand, round(exposure_seconds(brand_tracks), 3), len(brand_tracks),
+                     round(max((t.end - t.start for t in brand_tracks), default=0.0), 3),
+                     share(seconds, share_seconds), round(confidence_seconds, 3)])
+    df_exposure = pd.DataFrame(rows, columns=EXPOSURE_COLUMNS)
+
+    tracks_csv = os.path.join(base_output_dir, "brand_tracks.csv")
+    exposure_csv = os.path.join(base_output_dir, "brand_exposure.csv")
+    df_tracks.to_csv(tracks_csv, index=False)
+    df_exposure.to_csv(exposure_csv, index=False)
+    print(f"✅ Saved {len(tracks)} tracks to: {tracks_csv}")
+    print(f"✅ Saved brand_exposure.csv to: {exposure_csv}")
+    return df_exposure
@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import shutil
+
+import cv2
+from filelock import FileLock, Timeout
+
+from tasks.download_and_extract_frames import (
+    DEFAULT_INGEST_PROFILE, OCR_MAX_HEIGHT, download_video, ingest_key, probe_duration
+)
+from tasks.sampling import video_length
+from utils.metrics import metrics
+
+VIDEO_CACHE_DIR = os.getenv("VIDEO_CACHE_DIR", os.path.join("downloads", ".videos"))
+VIDEO_CACHE_MAX_GB = float(os.getenv("VIDEO_CACHE_MAX_GB", "20"))
+# How long a task waits for another task's download of the same video
+VIDEO_DOWNLOAD_TIMEOUT = int(os.getenv("VIDEO_DOWNLOAD_TIMEOUT", "3600"))
+# A pin older than this is left by a job that died between its download and
+# OCR stages, and no longer keeps its video from eviction
+VIDEO_PIN_HOURS = float(os.getenv("VIDEO_PIN_HOURS", "24"))
+# Directory of <video_id>.mp4 files to serve instead of YouTube (tests, benchmarks)
+VIDEO_SOURCE_DIR = os.getenv("VIDEO_SOURCE_DIR")
+
+def youtube_downloader(url, video_id, output_dir, profile=DEFAULT_INGEST_PROFILE, span=None):
+    """Download `url` into `output_dir` with yt_dlp; returns the video path."""
+    video_path, _ = download_video(url, output_dir=output_dir, profile=profile, span=span)
+    return video_path
+
+def transcode_video(source, target, max_height=None, span=None):
+    """Re-encode `source` scaled down to `max_height` and/or cut to `span` (OpenCV, no audio)."""
+    vidcap = cv2.VideoCapture(source)
+    fps = vidcap.get(cv2.CAP_PROP_FPS)
+    width = int(vidcap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(vidcap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if max_height and height > max_height:
+        width, height = int(round(width * max_height / height / 2)) * 2, max_height
+    first, last = 0, None
+    if span:
+        first = int(round(span[0] * fps))
+        last = None if span[1] is None else int(round(span[1] * fps))
+        vidcap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    writer = cv2.VideoWriter(target, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    index = first
+    try:
+        while last is None or index < last:
+            success, frame = vidcap.read()
+            if not success:
+                break
+            if frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            writer.write(frame)
+            index += 1
+    finally:
+        vidcap.release()
+        writer.release()
+
+def local_downloader(source_dir):
+    """
+    Stand-in downloader that serves <source_dir>/<video_id>.mp4 instead of
+    fetching from YouTube. Like YouTube's pre-encoded formats, a
+    <video_id>.<profile>.mp4 variant is served for a profile when present;
+    otherwise the "ocr" profile is emulated by re-encoding. Time spans are
+    cut by re-encoding.
+    """
+    def download(url, video_id, output_dir, profile=DEFAULT_INGEST_PROFILE, span=None):
+        source = os.path.join(source_dir, f"{video_id}.{profile}.mp4")
+        encoded = os.path.isfile(source)
+        if not encoded:
+            source = os.path.join(source_dir, f"{video_id}.mp4")
+        if not os.path.isfile(source):
+            raise FileNotFoundError(f"No local video for {video_id} in {source_dir}")
+        target = os.path.join(output_dir, "video.mp4")
+        max_height = OCR_MAX_HEIGHT if profile == "ocr" and not encoded else None
+        if max_height or span:
+            transcode_video(source, target, max_height=max_height, span=span)
+        else:
+            shutil.copyfile(source, target)
+        return target
+    return download
+
+def video_duration(url, video_id, source_dir=VIDEO_SOURCE_DIR):
+    """Length of a video in seconds without downloading it (from VIDEO_SOURCE_DIR when set), or None."""
+    if not source_dir:
+        return probe_duration(url)
+    return video_length(os.path.join(source_dir, f"{video_id}.mp4"))
+
+def default_downloader():
+    return local_downloader(VIDEO_SOURCE_DIR) if VIDEO_SOURCE_DIR else youtube_downloader
+
+class VideoCache:
+    """
+    Shared on-disk cache of downloaded videos, keyed by YouTube video ID plus
+    ingest profile / time span and independent of the OCR model, so a game is
+    downloaded once no matter how many models or requests analyse it.
+
+    Each video is guarded by a file lock: concurrent tasks (threads, worker
+    processes or workers sharing the directory) asking for the same video
+    wait for the single in-flight download instead of starting their own.
+    A job pins the video it gets (a file under <key>.pins/) until its OCR
+    stage is done with it, possibly in another task on another worker.
+    The cache is bounded to `max_gb`; least recently used videos (by mtime,
+    refreshed on every hit) are evicted, except pinned ones and ones being
+    downloaded. Pins older than `pin_hours` are stale and ignored.
+    """
+
+    def __init__(self, cache_dir=VIDEO_CACHE_DIR, max_gb=VIDEO_CACHE_MAX_GB, downloader=None,
+                 timeout=VIDEO_DOWNLOAD_TIMEOUT, pin_hours=VIDEO_PIN_HOURS):
+        self.root = cache_dir
+        self.max_bytes = int(max_gb * 2**30)
+        self.downloader = downloader or default_downloader()
+        self.timeout = timeout
+        self.pin_seconds = pin_hours * 3600
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.wait_seconds = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _dir(self, key):
+        return os.path.join(self.root, key)
+
+    def _lock(self, key, timeout=None):
+        return FileLock(os.path.join(self.root, f"{key}.lock"),
+                        timeout=self.timeout if timeout is None else timeout)
+
+    def _pins(self, key):
+        return os.path.join(self.root, f"{key}.pins")
+
+    @staticmethod
+    def key(video_id, profile=DEFAULT_INGEST_PROFILE, span=None):
+        return f"{video_id}.{ingest_key(profile, span)}"
+
+    def pin(self, key, holder):
+        """Keep the video under `key` from eviction until `holder` unpins it."""
+        os.makedirs(self._pins(key), exist_ok=True)
+        with open(os.path.join(self._pins(key), holder), "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+
+    def unpin(self, key, holder):
+        try:
+            os.remove(os.path.join(self._pins(key), holder))
+        except FileNotFoundError:
+            pass
+
+    def unpin_holder(self, holder):
+        """Drop every pin `holder` has, whichever videos they are on."""
+        for name in os.listdir(self.root):
+            if name.endswith(".pins"):
+                self.unpin(name[:-len(".pins")], holder)
+
+    def pinned(self, key):
+        """Whether any job holds a live (not stale) pin on `key`."""
+        try:
+            names = os.listdir(self._pins(key))
+        except FileNotFoundError:
+            return False
+        now = time.time()
+        for name in names:
+            try:
+                if now - os.path.getmtime(os.path.join(self._pins(key), name)) < self.pin_seconds:
+                    return True
+            except FileNotFoundError:
+                continue
+        return False
+
+    def cached_path(self, key):
+        """Path of the cached video for a cache key, or None if it has not been downloaded."""
+        meta_path = os.path.join(self._dir(key), "meta.json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                video_path = os.path.join(self._dir(key), json.load(f)["file"])
+        except (OSError, ValueError, KeyError):
+            return None
+        return video_path if os.path.isfile(video_path) else None
+
+    def get(self, url, video_id, profile=DEFAULT_INGEST_PROFILE, span=None, pin=None):
+        """
+        Return the local path of `video_id` downloaded with ingest `profile`
+        (and optional (start, end) `span`), downloading it at most once.
+        With `pin` (a holder name), the video is pinned for that holder
+        before anything can evict it; unpin(key(...), pin) releases it.
+        """
+        key = self.key(video_id, profile, span)
+        start = time.perf_counter()
+        with self._lock(key):
+            self.wait_seconds += time.perf_counter() - start
+            if pin:
+                self.pin(key, pin)
+            video_path = self.cached_path(key)
+            if video_path:
+                self.hits += 1
+                metrics.inc("cache_lookups", cache="video", result="hit")
+                os.utime(os.path.join(self._dir(key), "meta.json"))
+                print(f"🎞️ Video cache hit: {key}")
+                return video_path
+
+            self.misses += 1
+            metrics.inc("cache_lookups", cache="video", result="miss")
+            try:
+                video_path = self._download(url, video_id, key, profile, span)
+            except Exception:
+                if pin:
+                    self.unpin(key, pin)
+                raise
+        self._evict(keep=key)
+        return video_path
+
+    def _download(self, url, video_id, key, profile, span):
+        # Download into a staging directory so a crash never leaves a
+        # half-written video that looks complete.
+        staging = f"{self._dir(key)}.partial"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            video_path = self.downloader(url, video_id, staging, profile=profile, span=span)
+            meta = {
+                "video_id": video_id,
+                "url": url,
+                "profile": profile,
+                "span": span,
+                "file": os.path.basename(video_path),
+                "bytes": os.path.getsize(video_path),
+                "downloaded_at": time.time(),
+            }
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+            shutil.rmtree(self._dir(key), ignore_errors=True)
+            os.replace(staging, self._dir(key))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        print(f"📥 Cached video {key} ({meta['bytes'] / 2**20:.1f} MB)")
+        return os.path.join(self._dir(key), meta["file"])
+
+    def _entries(self):
+        for key in os.listdir(self.root):
+            # Staging directories get their meta.json just before they are
+            # moved into place; pins and locks are not videos
+            if key.endswith((".partial", ".pins", ".lock")):
+                continue
+            video_dir = self._dir(key)
+            meta_path = os.path.join(video_dir, "meta.json")
+            if not os.path.isfile(meta_path):
+                continue
+            size = sum(os.path.getsize(os.path.join(video_dir, name)) for name in os.listdir(video_dir))
+            yield os.stat(meta_path).st_mtime, size, key
+
+    def size_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self, keep=None):
+        entries = sorted(self._entries())
+        size = sum(e[1] for e in entries)
+        for _, entry_size, key in entries:
+            if size <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # Skip videos another task is downloading or waiting on, and
+            # videos a job has pinned for its OCR stage (pins are taken
+            # under the same lock, so none can appear while we delete).
+            lock = self._lock(key, timeout=0)
+            try:
+                with lock:
+                    if self.pinned(key):
+                        continue
+                    shutil.rmtree(self._dir(key), ignore_errors=True)
+                    shutil.rmtree(self._pins(key), ignore_errors=True)
+            except Timeout:
+                continue
+            size -= entry_size
+            self.evictions += 1
+            print(f"🧹 Evicted cached video {key}")
+
+    def stats(self):
+        return {
+            "video_cache_hits": self.hits,
+            "video_cache_misses": self.misses,
+            "video_cache_evictions": self.evictions,
+            "video_cache_wait_seconds": round(self.wait_seconds, 2),
+        }
@@ -2,7 +2,9 @@
 
 from dotenv import load_dotenv
 import os
+import time
 import smtplib
+import threading
 from email.message import EmailMessage
 
 load_dotenv()  # Load from .env file
@@ -12,32 +14,189 @@ SMTP_HOST = os.getenv("SMTP_HOST")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+# STARTTLS before logging in (turn off for a local test server)
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# A pooled connection idle for longer is checked with NOOP before reuse
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+# Start a new session after this many messages (servers cap them per session)
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "50"))
 
+# Reports larger than this are linked instead of attached
+EMAIL_MAX_ATTACHMENT_MB = float(os.getenv("EMAIL_MAX_ATTACHMENT_MB", "10"))
+# Public address of the API, for report links
+REPORT_BASE_URL = os.getenv("REPORT_BASE_URL", "http://localhost:8000").rstrip("/")
+# Redelivery of a report after a transient failure: up to EMAIL_MAX_RETRIES
+# times, EMAIL_RETRY_BACKOFF seconds apart, doubling up to EMAIL_RETRY_BACKOFF_MAX
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "5"))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "30"))
+EMAIL_RETRY_BACKOFF_MAX = float(os.getenv("EMAIL_RETRY_BACKOFF_MAX", "900"))
 
-def send_report_email(to_email, pdf_path, subject="Your NBA Brand Visibility Report"):
+
+def is_transient(error):
     """
-    Send the final report PDF to the user's email.
+    True for delivery errors worth retrying: dropped or refused connections,
+    timeouts and 4xx replies. 5xx replies (bad address, rejected message)
+    and authentication failures fail the same way every time.
     """
-    if not os.path.isfile(pdf_path):
-        print(f"❌ Report file not found: {pdf_path}")
-        return
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+
+def retry_delay(retries, backoff=EMAIL_RETRY_BACKOFF, backoff_max=EMAIL_RETRY_BACKOFF_MAX):
+    """Seconds to wait before redelivery attempt `retries` + 1."""
+    return min(backoff * 2 ** retries, backoff_max)
+
+
+class SMTPPool:
+    """
+    One authenticated SMTP session per process, reused for every report the
+    process sends, instead of a connect + STARTTLS + login per message.
+    This is connection pooling only: each report is still sent as soon as
+    it is ready, nothing waits to be batched with other reports.
+    A session idle for `idle_seconds` is checked with NOOP before reuse,
+    and replaced after `max_messages`, or once if the server dropped it.
+    Thread-safe: concurrent sends take turns on the session.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, timeout=SMTP_TIMEOUT, idle_seconds=SMTP_IDLE_SECONDS,
+                 max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self.max_messages = max_messages
+        self.lock = threading.Lock()
+        self.smtp = None
+        self.session_messages = 0
+        self.last_used = 0.0
+        self.connections = 0
+        self.sent = 0
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        self.session_messages = 0
+        self.connections += 1
+
+    def _close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self.smtp.close()
+        self.smtp = None
+
+    def _session(self):
+        if self.smtp is not None and self.session_messages >= self.max_messages:
+            self._close()
+        if self.smtp is not None and time.monotonic() - self.last_used > self.idle_seconds:
+            try:
+                if self.smtp.noop()[0] != 250:
+                    self._close()
+            except (smtplib.SMTPException, OSError):
+                self._close()
+        if self.smtp is None:
+            self._connect()
+        return self.smtp
+
+    def send(self, messages):
+        """
+        Send EmailMessages over the pooled session, reconnecting once per
+        message if the server dropped it. Raises on the first failure;
+        messages before it were sent.
+        """
+        with self.lock:
+            for msg in messages:
+                for attempt in range(2):
+                    smtp = self._session()
+                    try:
+                        smtp.send_message(msg)
+                        break
+                    except smtplib.SMTPServerDisconnected:
+                        self._close()
+                        if attempt:
+                            raise
+                self.session_messages += 1
+                self.sent += 1
+                self.last_used = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self._close()
 
+    def stats(self):
+        return {"connections": self.connections, "sent": self.sent}
+
+
+# Shared by every report this process sends
+smtp_pool = SMTPPool()
+
+
+def build_report_message(to_email, pdf_path, subject="Your NBA Brand Visibility Report", link=None,
+                         max_attachment_mb=EMAIL_MAX_ATTACHMENT_MB, bcc=()):
+    """
+    The report email: the PDF attached, or, when it is larger than
+    `max_attachment_mb` and a download `link` is known, the link instead.
+    `bcc` also receives it, without the addresses being shown to anyone.
+    """
     msg = EmailMessage()
     msg['From'] = SMTP_USER
     msg['To'] = to_email
+    if bcc:
+        msg['Bcc'] = ", ".join(bcc)
     msg['Subject'] = subject
-    msg.set_content("Attached is your automatically generated NBA brand visibility report.")
 
+    size_mb = os.path.getsize(pdf_path) / 2**20
+    if link and size_mb > max_attachment_mb:
+        msg.set_content(f"Your automatically generated NBA brand visibility report is ready "
+                        f"({size_mb:.1f} MB, too large to attach). Download it here:\n\n{link}")
+        return msg
+
+    msg.set_content("Attached is your automatically generated NBA brand visibility report.")
     with open(pdf_path, 'rb') as f:
         file_data = f.read()
         file_name = os.path.basename(pdf_path)
         msg.add_attachment(file_data, maintype='application', subtype='pdf', filename=file_name)
+    return msg
+
+
+def send_report_email(to_email, pdf_path, subject="Your NBA Brand Visibility Report", link=None, pool=None,
+                      raise_transient=False, bcc=()):
+    """
+    Send the final report PDF to the user's email, and blind copies to
+    `bcc`, over the pooled SMTP session (see build_report_message for large
+    reports). Returns True if it was sent. Errors are logged; with `raise_transient`, those worth
+    retrying (see is_transient) are raised for the caller to retry later.
+    """
+    if not os.path.isfile(pdf_path):
+        print(f"❌ Report file not found: {pdf_path}")
+        return False
 
+    msg = build_report_message(to_email, pdf_path, subject, link=link, bcc=bcc)
     try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as smtp:
-            smtp.starttls()
-            smtp.login(SMTP_USER, SMTP_PASSWORD)
-            smtp.send_message(msg)
-        print(f"✅ Report sent to {to_email}")
+        (pool or smtp_pool).send([msg])
+        print(f"✅ Report sent to {', '.join([to_email, *bcc])}")
+        return True
     except Exception as e:
         print(f"❌ Failed to send email: {e}")
+        if raise_transient and is_transient(e):
+            raise
+        return False
@@ -0,0 +1,43 @@
+# utils/logger.py
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# Job log files kept open at once per process (least recently used are closed)
+LOG_MAX_OPEN_FILES = int(os.getenv("LOG_MAX_OPEN_FILES", "32"))
+
+_files = OrderedDict()
+_files_lock = threading.Lock()
+
+def _log_handle(log_file):
+    handle = _files.get(log_file)
+    if handle is not None and not handle.closed:
+        _files.move_to_end(log_file)
+        return handle
+    # Line-buffered, so `tail -f pipeline.log` sees every line as it is logged
+    handle = _files[log_file] = open(log_file, "a", encoding="utf-8", buffering=1)
+    while len(_files) > LOG_MAX_OPEN_FILES:
+        _files.popitem(last=False)[1].close()
+    return handle
+
+def log(message, log_file=None):
+    """Print a timestamped line and append it to `log_file` (kept open for the next lines)."""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    log_line = f"[{timestamp}] {message}"
+    print(log_line)
+    if log_file:
+        with _files_lock:
+            try:
+                _log_handle(log_file).write(log_line + "\n")
+            except OSError as e:
+                _files.pop(log_file, None)
+                print(f"⚠️ Could not write to {log_file}: {e}")
+
+def close_logs():
+    """Close every open log file (e.g. on worker shutdown)."""
+    with _files_lock:
+        for handle in _files.values():
+            handle.close()
+        _files.clear()
@@ -0,0 +1,279 @@
+# utils/metrics.py
+
+import os
+import json
+import time
+import uuid
+import socket
+import resource
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Every process (API, Celery workers) writes its metrics here, and /metrics adds them up
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join("downloads", ".metrics"))
+# Minimum seconds between metric flushes from a process
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+METRICS_PREFIX = "nba_"
+
+# Histogram buckets in seconds, from one OCR'd frame up to a full-game stage
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+HELP = {
+    "frames_decoded": "Video frames decoded for OCR.",
+    "ocr_frames": "Frames (or regions of interest sets) run through OCR.",
+    "ocr_batches": "Batches of frames run through OCR.",
+    "cache_lookups": "Cache lookups by cache and result (hit or miss).",
+    "fuzzy_comparisons": "Token-to-brand-variant fuzzy comparisons scored.",
+    "stage_seconds": "Wall time of pipeline stages.",
+    "ocr_frame_seconds": "OCR time per frame.",
+    "stage_peak_rss_bytes": "Peak resident memory of the process during the last run of a stage.",
+    "live_latency_seconds": "Seconds from a live frame's arrival to its brands being counted.",
+}
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def peak_rss_bytes():
+    """The process's peak resident memory (VmHWM, or ru_maxrss where /proc is missing)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def reset_peak_rss():
+    """Reset VmHWM (Linux only), so each stage reports its own peak."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+class Metrics:
+    """
+    Counters, gauges and histograms of one process, flushed to
+    METRICS_DIR/<process>.json at most every `flush_interval` seconds.
+    """
+
+    def __init__(self, directory=METRICS_DIR, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.path = os.path.join(directory, f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.flushed = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, count=1, buckets=DEFAULT_BUCKETS, **labels):
+        """Record `count` observations of `value` (e.g. seconds) in histogram `name`."""
+        key = _key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"le": list(buckets), "buckets": [0] * len(buckets),
+                                               "sum": 0.0, "count": 0}
+            for i, bound in enumerate(hist["le"]):
+                if value <= bound:
+                    hist["buckets"][i] += count
+                    break
+            hist["sum"] += value * count
+            hist["count"] += count
+
+    def counter_values(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                "gauges": [[name, dict(labels), value] for (name, labels), value in self.gauges.items()],
+                "histograms": [[name, dict(labels), dict(hist, buckets=list(hist["buckets"]))]
+                               for (name, labels), hist in self.histograms.items()],
+            }
+
+    def flush(self, force=True):
+        now = time.monotonic()
+        if not force and now - self.flushed < self.flush_interval:
+            return
+        self.flushed = now
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not write metrics to {self.path}: {e}")
+
+# This process's metrics
+metrics = Metrics()
+
+def read_metrics(directory=METRICS_DIR):
+    """
+    The metrics of every process that flushed to `directory`, added up:
+    counters and histograms summed, gauges the maximum.
+    """
+    counters, gauges, histograms = {}, {}, {}
+    try:
+        filenames = [f for f in os.listdir(directory) if f.endswith(".json")]
+    except OSError:
+        filenames = []
+    for filename in filenames:
+        try:
+            with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data.get("counters", []):
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, value in data.get("gauges", []):
+            key = _key(name, labels)
+            gauges[key] = max(gauges.get(key, value), value)
+        for name, labels, hist in data.get("histograms", []):
+            key = _key(name, labels)
+            total = histograms.get(key)
+            if total is None or total["le"] != hist["le"]:
+                histograms[key] = hist
+                continue
+            total["buckets"] = [a + b for a, b in zip(total["buckets"], hist["buckets"])]
+            total["sum"] += hist["sum"]
+            total["count"] += hist["count"]
+    return counters, gauges, histograms
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+def prometheus_text(directory=METRICS_DIR):
+    """All processes' metrics in the Prometheus text exposition format."""
+    counters, gauges, histograms = read_metrics(directory)
+    lines = []
+
+    def header(name, kind, suffix=""):
+        lines.append(f"# HELP {METRICS_PREFIX}{name}{suffix} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {METRICS_PREFIX}{name}{suffix} {kind}")
+
+    for kind, series in (("counter", counters), ("gauge", gauges)):
+        suffix = "_total" if kind == "counter" else ""
+        for name in sorted({name for name, _ in series}):
+            header(name, kind, suffix)
+            for (n, labels), value in sorted(series.items()):
+                if n == name:
+                    lines.append(f"{METRICS_PREFIX}{name}{suffix}{_labels(labels)} {value}")
+    for name in sorted({name for name, _ in histograms}):
+        header(name, "histogram")
+        for (n, labels), hist in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(hist["le"], hist["buckets"]):
+                cumulative += count
+                lines.append(f"{METRICS_PREFIX}{name}_bucket{_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{METRICS_PREFIX}{name}_bucket{_labels(labels, [('le', '+Inf')])} {hist['count']}")
+            lines.append(f"{METRICS_PREFIX}{name}_sum{_labels(labels)} {hist['sum']}")
+            lines.append(f"{METRICS_PREFIX}{name}_count{_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+class JobTrace:
+    """
+    A job's trace in the Chrome trace-event format, one event per span.
+    Each event is one O_APPEND write, so workers can share the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def reset(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("[\n")
+
+    def event(self, name, start, seconds, category="stage", **args):
+        if not self.path:
+            return
+        record = {"name": name, "cat": category, "ph": "X", "ts": round(start * 1e6), "dur": round(seconds * 1e6),
+                  "pid": os.getpid(), "tid": threading.get_native_id(), "args": args}
+        line = (json.dumps(record) + ",\n").encode("utf-8")
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        except OSError:
+            return
+        try:
+            if os.fstat(fd).st_size == 0:
+                line = b"[\n" + line
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+def read_trace(path):
+    """The events of a trace file written by JobTrace."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read().strip().rstrip(",")
+    if not text.endswith("]"):
+        text += "]"
+    return json.loads(text)
+
+# The trace of the span running in this context; nested spans and
+# trace_event() write to it.
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+@contextmanager
+def span(name, trace_file=None, **labels):
+    """
+    Time a pipeline stage into stage_seconds and stage_peak_rss_bytes, and
+    trace it to `trace_file` (or the enclosing span's); `labels` go to the
+    trace only.
+    """
+    trace = JobTrace(trace_file) if trace_file else _current_trace.get()
+    token = _current_trace.set(trace)
+    counters_before = metrics.counter_values() if trace else None
+    reset_peak_rss()
+    wall, start = time.time(), time.perf_counter()
+    status = "done"
+    try:
+        yield
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        peak = peak_rss_bytes()
+        _current_trace.reset(token)
+        metrics.observe("stage_seconds", seconds, stage=name)
+        metrics.set("stage_peak_rss_bytes", peak, stage=name)
+        if trace:
+            moved = {}
+            for (counter, counter_labels), value in metrics.counter_values().items():
+                delta = value - counters_before.get((counter, counter_labels), 0)
+                if delta:
+                    label = ",".join(f"{k}={v}" for k, v in counter_labels)
+                    moved[f"{counter}{{{label}}}" if label else counter] = delta
+            trace.event(name, wall, seconds, status=status, peak_rss_mb=round(peak / 2**20, 1),
+                        counters=moved, **labels)
+        metrics.flush()
+
+def trace_event(name, start, seconds, **args):
+    """Add a finer-grained event (e.g. one OCR batch) to the current span's trace, if any."""
+    trace = _current_trace.get()
+    if trace:
+        trace.event(name, start, seconds, category="detail", **args)
@@ -1,12 +1,247 @@
 # worker.py
 
-from celery import Celery
-from celery_config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND
-from pipeline import run_full_pipeline
+import os
+import time
+from celery import Celery, chain, chord
+from celery.result import allow_join_result
+from celery.signals import task_failure, worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
+from kombu import Queue
+from celery_config import (
+    CELERY_BROKER_URL, CELERY_RESULT_BACKEND, CELERY_ALWAYS_EAGER, CELERY_QUEUES, CELERY_TASK_ROUTES
+)
+from pipeline import (
+    check_shared_downloads, count_stage, download_stage, email_stage, extract_stage, live_stage, log, merge_chunks,
+    ocr_chunk, ocr_stage, plan_chunks, plan_stages, prepare_job, prepare_live_job, release_video, report_stage,
+    track_stage, visuals_stage
+)
+from tasks.download_and_extract_frames import DEFAULT_INGEST_PROFILE
+from tasks.ocr import OCR_WORKERS
+from tasks.ocr_engine import preload_models, shutdown_pools
+from tasks.ocr_models import registry
+from tasks.ocr_store import has_ocr_results
+from tasks.progress import JobProgress
+from tasks.scheduler import FULL_GAME_PRIORITY, get_scheduler
+from tasks.video_cache import VideoCache
+from utils.emailer import EMAIL_MAX_RETRIES, is_transient, retry_delay, smtp_pool
+from utils.logger import close_logs
+from utils.metrics import metrics
 
 celery_app = Celery("tasks", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+celery_app.conf.update(
+    task_always_eager=CELERY_ALWAYS_EAGER,
+    task_eager_propagates=CELERY_ALWAYS_EAGER,
+    # So /result can look eager jobs up in the in-memory backend
+    task_store_eager_result=CELERY_ALWAYS_EAGER,
+    task_queues=[Queue(name) for name in CELERY_QUEUES],
+    task_default_queue="celery",
+    task_routes=CELERY_TASK_ROUTES,
+    # Hand out one task at a time: stages differ wildly in length
+    worker_prefetch_multiplier=1,
+    # Highlight clips are queued at a higher priority than full games (see
+    # tasks/scheduler.py), and every stage task of a job keeps its priority
+    task_default_priority=FULL_GAME_PRIORITY,
+    task_inherit_parent_priority=True,
+    broker_transport_options={"queue_order_strategy": "priority", "priority_steps": list(range(10))},
+)
 
-@celery_app.task(name="run_full_pipeline")
-def run_pipeline_task(youtube_url, brands, model, email, timestamp):
-    print(f"📦 New task started: {youtube_url=} {brands=} {email=}")
-    return run_full_pipeline(youtube_url, brands, model, email, timestamp)
+# Comma-separated OCR models to load when a worker process starts,
+# e.g. OCR_PRELOAD_MODELS=PP-OCRv5_mobile. Others load lazily on first use.
+OCR_PRELOAD_MODELS = [m.strip() for m in os.getenv("OCR_PRELOAD_MODELS", "").split(",") if m.strip()]
+
+# Split each game into chunks of this many seconds, OCR'd by separate
+# subtasks across workers (0: one download and OCR task for the whole game).
+PIPELINE_CHUNK_SECONDS = float(os.getenv("PIPELINE_CHUNK_SECONDS", "0"))
+
+def is_prefork(worker):
+    pool = getattr(worker, "pool_cls", None) or celery_app.conf.worker_pool
+    return "prefork" in (pool if isinstance(pool, str) else pool.__module__)
+
+_preloaded = False
+
+@worker_process_init.connect
+def preload_ocr_models(**kwargs):
+    global _preloaded
+    if OCR_PRELOAD_MODELS and not _preloaded:
+        _preloaded = True
+        # Under the engine's key, so the first job finds them loaded
+        preload_models(OCR_PRELOAD_MODELS, workers=OCR_WORKERS)
+        print(f"🧠 OCR models ready: {registry.stats() if OCR_WORKERS == 1 else f'{OCR_WORKERS} OCR processes'}")
+
+@worker_init.connect
+def check_downloads_volume(**kwargs):
+    # Stages of one job run on different workers and pass paths under downloads/
+    try:
+        check_shared_downloads()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+@worker_init.connect
+def preload_in_worker(sender=None, **kwargs):
+    # Solo, thread and green pools run tasks in the worker process itself,
+    # where worker_process_init may never fire (prefork children preload there)
+    if not is_prefork(sender):
+        preload_ocr_models()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def release_ocr_pools(**kwargs):
+    shutdown_pools()
+    smtp_pool.close()
+    close_logs()
+    metrics.flush()
+
+@task_failure.connect
+def release_failed_job(task_id=None, args=None, **kwargs):
+    # A failed stage ends its job: free the scheduler's slots so identical
+    # requests start afresh (a successful job is released by its email stage),
+    # and unpin its cached video if OCR never got to release it
+    for arg in args or ():
+        if isinstance(arg, dict) and arg.get("job_id"):
+            get_scheduler().release(arg["job_id"])
+            release_video(arg)
+            return
+
+@celery_app.task(name="run_full_pipeline", bind=True)
+def run_pipeline_task(self, youtube_url, brands, model, email, timestamp, ingest_profile=None, start=None, end=None,
+                      stream=True):
+    print(f"📦 New task started: {youtube_url=} {brands=} {email=} {ingest_profile=} {start=} {end=}")
+    ingest_profile = ingest_profile or DEFAULT_INGEST_PROFILE
+    try:
+        # Progress is published under this task's id, which the stage chain
+        # inherits, so /result/<task_id> can report it.
+        job = prepare_job(youtube_url, brands, model, email, ingest_profile, start, end,
+                          stream=stream, job_id=self.request.id)
+        log("[0/6] Task received. Checking cache...", job["log_file"])
+        workflow = pipeline_workflow(job)
+    except Exception as e:
+        print(f"❌ Pipeline failed: {e}")
+        get_scheduler().release(self.request.id)
+        return {"status": "error", "message": str(e)}
+    return start_workflow(self, workflow)
+
+@celery_app.task(name="run_live_pipeline", bind=True)
+def run_live_task(self, source, brands, model, email):
+    print(f"📡 New live task started: {source=} {brands=} {email=}")
+    try:
+        job = prepare_live_job(source, brands, model, email, job_id=self.request.id)
+        log("[0/6] Live task received.", job["log_file"])
+        workflow = pipeline_workflow(job)
+    except Exception as e:
+        print(f"❌ Pipeline failed: {e}")
+        get_scheduler().release(self.request.id)
+        return {"status": "error", "message": str(e)}
+    return start_workflow(self, workflow)
+
+def start_workflow(task, workflow):
+    """Run a job's stage chain in place of `task`, the job's entry task."""
+    if task.request.is_eager:
+        # An eager chain joins its chord in-process, which Celery otherwise
+        # refuses inside a task; its failures propagate here without the
+        # task_failure signal.
+        try:
+            with allow_join_result():
+                return workflow.apply().get()
+        except Exception:
+            get_scheduler().release(task.request.id)
+            VideoCache().unpin_holder(task.request.id)
+            raise
+    # The chain replaces this task, so its result is the email stage's.
+    return task.replace(workflow)
+
+def pipeline_workflow(job):
+    """
+    The job as a chain of stage tasks, each routed to its own queue:
+    download, extract (without streaming), OCR, count, track, visuals,
+    report and email, each passing the job on to the next. A chunked job
+    maps download + OCR over its chunks and merges them in a chord instead;
+    a job with cached OCR results starts at counting, and a live job with
+    live ingest.
+    """
+    chunks = [] if job.get("live_source") or has_ocr_results(job["ocr_output_dir"]) \
+        or PIPELINE_CHUNK_SECONDS <= 0 else plan_chunks(job, PIPELINE_CHUNK_SECONDS)
+    stages = plan_stages(job, chunks=max(len(chunks), 1))
+
+    if "merge" in stages:
+        # Map: one download-range + OCR subtask per chunk; reduce: merge the
+        # chunk stores in order. The rest of the chain takes the merged job.
+        log(f"🧩 Splitting into {len(chunks)} chunks of up to {PIPELINE_CHUNK_SECONDS:g}s", job["log_file"])
+        rest = stages[stages.index("merge") + 1:]
+        return chain(chord([ocr_chunk_task.s(job, chunk) for chunk in chunks], merge_chunks_task.s(job)),
+                     *[STAGE_TASKS[stage].s() for stage in rest])
+    if "ocr" not in stages and "live" not in stages:
+        log("🔁 Cached OCR results found. Skipping download and OCR.", job["log_file"])
+    first, rest = stages[0], stages[1:]
+    return chain(STAGE_TASKS[first].s(job), *[STAGE_TASKS[stage].s() for stage in rest])
+
+@celery_app.task(name="download_video")
+def download_task(job):
+    return download_stage(job)
+
+@celery_app.task(name="extract_frames")
+def extract_task(job):
+    return extract_stage(job)
+
+@celery_app.task(name="run_ocr")
+def ocr_task(job):
+    return ocr_stage(job)
+
+@celery_app.task(name="ocr_chunk")
+def ocr_chunk_task(job, chunk):
+    return ocr_chunk(job, chunk)
+
+@celery_app.task(name="merge_chunks")
+def merge_chunks_task(chunk_results, job):
+    return merge_chunks(job, chunk_results)
+
+@celery_app.task(name="live_ingest")
+def live_task(job):
+    return live_stage(job)
+
+@celery_app.task(name="count_brands")
+def count_task(job):
+    return count_stage(job)
+
+@celery_app.task(name="track_brands")
+def track_task(job):
+    return track_stage(job)
+
+@celery_app.task(name="generate_visuals")
+def visuals_task(job):
+    return visuals_stage(job)
+
+@celery_app.task(name="generate_report")
+def report_task(job):
+    return report_stage(job)
+
+@celery_app.task(name="send_report", bind=True, max_retries=EMAIL_MAX_RETRIES)
+def email_task(self, job):
+    # Runs on the light email queue over the worker's pooled SMTP session.
+    # Transient failures are redelivered with exponential backoff; after the
+    # last retry the job still succeeds, with the report left un-emailed.
+    try:
+        return email_stage(job, raise_transient=self.request.retries < self.max_retries)
+    except Exception as e:
+        if not is_transient(e):
+            raise
+        countdown = retry_delay(self.request.retries)
+        JobProgress(job.get("job_id")).finish("email", status="retrying",
+                                              message=f"{e} (retrying in {countdown:g}s)")
+        if self.request.is_eager:
+            # Eager retries are re-raised when eager tasks propagate errors:
+            # wait out the backoff and redeliver in-process instead.
+            time.sleep(countdown)
+            return email_task.apply(args=(job,), retries=self.request.retries + 1).get()
+        raise self.retry(exc=e, countdown=countdown)
+
+STAGE_TASKS = {
+    "download": download_task,
+    "extract": extract_task,
+    "ocr": ocr_task,
+    "live": live_task,
+    "count": count_task,
+    "track": track_task,
+    "visuals": visuals_task,
+    "report": report_task,
+    "email": email_task,
+}